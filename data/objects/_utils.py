@@ -19,3 +19,42 @@ def round_value(number, ndigits=6):
     if number == -math.inf or number == math.inf:
         return number
     return round(number, ndigits)
+
+
+def build_alias_table(probabilities):
+    """
+    Build a Walker alias table for sampling from a discrete distribution.
+
+    Parameters
+    ----------
+    probabilities : list
+        The probability of each outcome. They should sum to 1.
+
+    Returns
+    -------
+    threshold : list
+        The probability of keeping each column's own outcome.
+    alias : list
+        The outcome that takes the remainder of each column.
+
+    Notes
+    -----
+    A draw picks a uniform column `i` and returns `i` if another uniform
+    variate is below `threshold[i]`, otherwise `alias[i]`, which is O(1).
+    """
+    n = len(probabilities)
+    scaled = [p * n for p in probabilities]
+    threshold = [1.] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        i = small.pop()
+        j = large[-1]
+        threshold[i] = scaled[i]
+        alias[i] = j
+        scaled[j] -= 1 - scaled[i]
+        if scaled[j] < 1:
+            small.append(large.pop())
+    # Anything left over is only off from 1 by rounding errors
+    return threshold, alias
@@ -1,5 +1,9 @@
+import bisect
+import itertools
 import random
 
+import numpy as np
+
 from ._utils import round_value
 
 
@@ -13,6 +17,185 @@ class Category:
         return self.name
 
 
+class CompiledDeck:
+    """
+    Weighted spawn cards sorted by cost for fast card selection.
+
+    The card properties are stored as NumPy arrays indexed by the position of
+    the card in the deck, with the internal names kept separately, so that the
+    population loops only deal with numbers. The cards are kept in ascending
+    cost order with their weights stored in a Fenwick tree, so that all the
+    cards that fit in a credit budget are a prefix of the deck. Selecting a
+    card is then a bisection on the costs followed by a search of the
+    cumulative weights, both of which are O(log n).
+
+    Cards can be removed from the selection, e.g., when they reach their spawn
+    limit, by updating a copy of the tree with `new_tree` and `remove`, so the
+    same deck can be shared by any number of populations.
+    """
+    def __init__(self, weighted_selection, is_sacrifice_enabled=False):
+        """
+        Compile a weighted selection of cards.
+
+        Parameters
+        ----------
+        weighted_selection : list
+            A list of tuples of cards and their weights, as returned by
+            `DirectorCardCategorySelection.generate_card_weighted_selection`.
+            The cards need the `_name`, `cost`, `limit`, `sacrifice_weight`,
+            and `skip_with_sacrifice` attributes, and optionally an `index`
+            for their position in the output, which is otherwise the position
+            in the selection.
+        is_sacrifice_enabled : bool, default False
+            Whether the Artifact of Sacrifice is enabled, in which case some
+            cards are paid for but don't spawn.
+
+        Returns
+        -------
+        None
+        """
+        indexed_selection = [(getattr(card, 'index', i), card, weight)
+                             for i, (card, weight) in enumerate(weighted_selection)]
+        # The sort is stable, so cards of the same cost keep their order
+        indexed_selection.sort(key=lambda x: x[1].cost)
+        cards = [card for _, card, _ in indexed_selection]
+        self.names = [card._name for card in cards]
+        self.indices = np.array([index for index, _, _ in indexed_selection], dtype=np.intp)
+        self.weights = np.array([weight for _, _, weight in indexed_selection], dtype=np.float64)
+        self.costs = np.array([card.cost for card in cards], dtype=np.int64)
+        self.limits = np.array([card.limit if card.limit > 0 else np.inf for card in cards],
+                               dtype=np.float64)
+        self.sacrifice_weights = np.array([card.sacrifice_weight for card in cards], dtype=np.float64)
+        self.skips = np.array([is_sacrifice_enabled and card.skip_with_sacrifice for card in cards],
+                              dtype=bool)
+        # Plain copies for the scalar loops, where NumPy scalars are slow
+        self._costs = self.costs.tolist()
+        self._weights = self.weights.tolist()
+        self._tree = [0.] * (len(cards) + 1)
+        for i, weight in enumerate(self._weights):
+            CompiledDeck._update(self._tree, i, weight)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _update(tree, index, delta):
+        index += 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    @staticmethod
+    def _prefix_sum(tree, count):
+        total = 0.
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+    def new_tree(self):
+        """
+        Create a fresh copy of the cumulative weights for a new population.
+
+        Returns
+        -------
+        list
+            The Fenwick tree of the card weights.
+        """
+        return self._tree.copy()
+
+    def remove(self, tree, index):
+        """
+        Exclude a card from any future selection.
+
+        Parameters
+        ----------
+        tree : list
+            The cumulative weights of the current population, as returned by
+            `new_tree`. This is modified in place.
+        index : int
+            The position of the card in the deck. It should not have been
+            removed before.
+
+        Returns
+        -------
+        None
+        """
+        CompiledDeck._update(tree, index, -float(self.weights[index]))
+
+    def total_weight(self, tree, max_cost):
+        """
+        Sum the weights of the cards that fit in the credit budget.
+
+        Parameters
+        ----------
+        tree : list
+            The cumulative weights of the current population, as returned by
+            `new_tree`.
+        max_cost : int
+            Cards more expensive than this are excluded.
+
+        Returns
+        -------
+        float
+        """
+        return CompiledDeck._prefix_sum(tree, bisect.bisect_right(self._costs, max_cost))
+
+    def select(self, tree, max_cost):
+        """
+        Select a random card that fits in the credit budget.
+
+        Parameters
+        ----------
+        tree : list
+            The cumulative weights of the current population, as returned by
+            `new_tree`.
+        max_cost : int
+            Cards more expensive than this cannot be selected.
+
+        Returns
+        -------
+        int
+            The position of the selected card in the deck, or -1 if no card can
+            be selected.
+        """
+        count = bisect.bisect_right(self._costs, max_cost)
+        if not count:
+            return -1
+        total = CompiledDeck._prefix_sum(tree, count)
+        if total <= 0:
+            return -1
+        value = random.random() * total
+        # Descend the tree to find the first card whose cumulative weight
+        # exceeds the value
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            next_position = position + step
+            if next_position < len(tree) and tree[next_position] <= value:
+                position = next_position
+                value -= tree[next_position]
+            step >>= 1
+        # Float residue in the tree can carry the search past the last card
+        # that fits, or onto a removed card, so step back to one that remains
+        position = min(position, count - 1)
+        while position >= 0 and not self._is_selectable(tree, position):
+            position -= 1
+        return position
+
+    def _is_selectable(self, tree, index):
+        """Whether a card hasn't been removed, i.e., it keeps its weight in the tree."""
+        # The weight of a card is its node less the nodes that it covers
+        node = index + 1
+        weight = tree[node]
+        parent = node - (node & -node)
+        node -= 1
+        while node > parent:
+            weight -= tree[node]
+            node -= node & -node
+        return weight > .5 * self._weights[index]
+
+
 class DirectorCardCategorySelection:
     SCRIPT = -96972536530497900
 
@@ -71,7 +254,8 @@ class DirectorCardCategorySelection:
         """
         self.categories.append(Category(name, weight, cards))
 
-    def generate_card_weighted_selection(self, stages_cleared, expansions, is_sacrifice_enabled=False):
+    def generate_card_weighted_selection(self, stages_cleared, expansions, is_sacrifice_enabled=False,
+                                         compiled=False):
         """
         Generate all available interactable spawn cards for the scene.
 
@@ -86,11 +270,14 @@ class DirectorCardCategorySelection:
         is_sacrifice_enabled : bool, default False
             Whether the Artifact of Sacrifice is enabled. This can affect what
             interactables can spawn.
+        compiled : bool, default False
+            Whether to return the selection as a `CompiledDeck`.
 
         Returns
         -------
-        weighted_selections : list
-            The list of available cards.
+        weighted_selections : list or CompiledDeck
+            The list of available cards with their weights, or the compiled
+            deck if `compiled` is set.
 
         Notes
         -----
@@ -111,7 +298,9 @@ class DirectorCardCategorySelection:
                         if is_sacrifice_enabled:
                             weight *= card.sacrifice_weight
                         weighted_selections.append((card, weight))
-        return weighted_selections   
+        if compiled:
+            return CompiledDeck(weighted_selections, is_sacrifice_enabled)
+        return weighted_selections
 
     def is_available(self, stages_cleared):
         """
@@ -132,6 +321,19 @@ class DirectorCardCategorySelection:
         """
         return True
 
+    def get_stage_thresholds(self):
+        """
+        Find the stages cleared values at which the available cards change.
+
+        Returns
+        -------
+        set
+            The stages cleared values that enable or disable this DCCS or any
+            of its cards. Any two values of stages cleared with the same
+            thresholds reached result in the same available cards.
+        """
+        return {card.min_stages_cleared for category in self.categories for card in category.cards}
+
     def get_category_index(self, name):
         """
         Find a category index by its name.
@@ -186,6 +388,20 @@ class FamilyDirectorCardCategorySelection(DirectorCardCategorySelection):
         """
         return self.min_stages_cleared <= stages_cleared < self.max_stages_cleared
 
+    def get_stage_thresholds(self):
+        """
+        Find the stages cleared values at which the available cards change.
+
+        Returns
+        -------
+        set
+            The stages cleared values that enable or disable this DCCS or any
+            of its cards.
+        """
+        thresholds = super().get_stage_thresholds()
+        thresholds.update((self.min_stages_cleared, self.max_stages_cleared))
+        return thresholds
+
 
 class ConditionalPoolEntry:
     def __init__(self, data):
@@ -264,9 +480,27 @@ class DccsPool:
             'categories': [DccsCategory.parse(category, ids) for category in asset['poolCategories']],
         }
 
-    def generate_weighted_selection(self, expansions, stages_cleared):
+    def get_stage_thresholds(self):
         """
-        Select a DCCS object from the available ones.
+        Find the stages cleared values at which the available cards change.
+
+        Returns
+        -------
+        set
+            The stages cleared values that enable or disable any DCCS in the
+            pool or any of their cards.
+        """
+        thresholds = set()
+        for category in self.categories:
+            for pool_entry in itertools.chain(category.always_included,
+                                              category.included_conditions_met,
+                                              category.included_conditions_not_met):
+                thresholds.update(pool_entry.dccs.get_stage_thresholds())
+        return thresholds
+
+    def get_weighted_selection(self, expansions, stages_cleared):
+        """
+        Find the available DCCS objects and their selection weights.
 
         Parameters
         ----------
@@ -278,12 +512,10 @@ class DccsPool:
 
         Returns
         -------
-        weighted_selection : DirectorCardCategorySelection
-            The selected object
-
-        Notes
-        -----
-        An implementation of `RoR2.DccsPool.GenerateWeightedSelection`.
+        values : list
+            The available DirectorCardCategorySelection objects.
+        weights : list
+            The selection weight of each one.
         """
         values = []
         weights = []
@@ -304,7 +536,8 @@ class DccsPool:
             if total_weight:
                 modifier = category.weight / total_weight
                 for pool_entry in category.always_included:
-                    weighted_selection.add_choice(pool_entry.dccs, pool_entry.weight * modifier)
+                    values.append(pool_entry.dccs)
+                    weights.append(pool_entry.weight * modifier)
             conditions_met = False
             for pool_entry in category.included_conditions_met:
                 are_conditions_met = all(dlc in expansions for dlc in pool_entry.required_dlc)
@@ -316,6 +549,30 @@ class DccsPool:
                 for pool_entry in category.included_conditions_not_met:
                     values.append(pool_entry.dccs)
                     weights.append(pool_entry.weight * modifier)
+        return values, weights
+
+    def generate_weighted_selection(self, expansions, stages_cleared):
+        """
+        Select a DCCS object from the available ones.
+
+        Parameters
+        ----------
+        expansions : set
+            The expansions enabled, which affects which selections are available.
+        stages_cleared : int
+            The number of stages cleared, which also affects which selections
+            are available.
+
+        Returns
+        -------
+        weighted_selection : DirectorCardCategorySelection
+            The selected object
+
+        Notes
+        -----
+        An implementation of `RoR2.DccsPool.GenerateWeightedSelection`.
+        """
+        values, weights = self.get_weighted_selection(expansions, stages_cleared)
         return random.choices(values, weights)[0]
 
 
@@ -347,18 +604,92 @@ class DCCSBlender:
         weighted_selection = DCCSBlender.generate_weighted_category_selections(
             dccs_category, expansions, stages_cleared
         )
-        selected_dccs = []
-        used_expansions = set()
+        selected_entries = []
         content_num = 0
         while content_num < DCCSBlender.CONTENT_MIX_LIMIT and weighted_selection:
             index = random.choices(range(len(weighted_selection)),
                                    weights=[w for _, w in weighted_selection])[0]
-            pool_entry = weighted_selection[index][0]
+            selected_entries.append(weighted_selection[index][0])
+            weighted_selection.pop(index)
+            content_num += 1
+        return DCCSBlender.blend(dccs_category, selected_entries, stages_cleared)
+
+    def get_blended_dccs_outcomes(dccs_category, expansions, stages_cleared):
+        """
+        Enumerate all possible blends of the selected category in the DccsPool.
+
+        Parameters
+        ----------
+        dccs_category : DccsCategory
+            The selected DCCS category for the current pool.
+        expansions
+            The expansions enabled, which affects which selections are available.
+        stages_cleared : int
+            The number of stages cleared, which also affects which selections
+            are available.
+
+        Returns
+        -------
+        outcomes : list
+            A list of tuples of each distinct blended DCCS and its probability.
+            The probabilities sum to one.
+
+        Notes
+        -----
+        The pool entries are drawn without replacement, so the same entries
+        drawn in a different order are a single outcome. The blended DCCS of an
+        outcome always merges its entries in the order they are listed in the
+        category, which only affects the order of the cards and not the
+        probability of spawning them.
+        """
+        weighted_selection = DCCSBlender.generate_weighted_category_selections(
+            dccs_category, expansions, stages_cleared
+        )
+        probabilities = {}
+
+        def enumerate_draws(drawn, remaining, probability):
+            total = sum(weight for _, weight in remaining)
+            if len(drawn) == DCCSBlender.CONTENT_MIX_LIMIT or not remaining or total <= 0:
+                key = tuple(sorted(drawn))
+                probabilities[key] = probabilities.get(key, 0) + probability
+                return
+            for i, (index, weight) in enumerate(remaining):
+                if weight > 0:
+                    enumerate_draws(
+                        drawn + [index], remaining[:i] + remaining[i+1:], probability * weight / total
+                    )
+
+        enumerate_draws([], [(i, weight) for i, (_, weight) in enumerate(weighted_selection)], 1.)
+        outcomes = []
+        for indices, probability in probabilities.items():
+            selected_entries = [weighted_selection[i][0] for i in indices]
+            outcomes.append((DCCSBlender.blend(dccs_category, selected_entries, stages_cleared), probability))
+        return outcomes
+
+    def blend(dccs_category, selected_entries, stages_cleared):
+        """
+        Blend the selected pool entries with the ones always included.
+
+        Parameters
+        ----------
+        dccs_category : DccsCategory
+            The selected DCCS category for the current pool.
+        selected_entries : list
+            The pool entries chosen to be blended in.
+        stages_cleared : int
+            The number of stages cleared, which affects which of the always
+            included entries are available.
+
+        Returns
+        -------
+        blended_dccs : DirectorCardCategorySelection
+        """
+        selected_dccs = []
+        used_expansions = set()
+        for pool_entry in selected_entries:
             selected_dccs.append((pool_entry.dccs, pool_entry.weight))
             if pool_entry is ConditionalPoolEntry:
                 used_expansions.union(pool_entry.required_dlc)
-            weighted_selection.pop(index)
-            content_num += 1
         for pool_entry in dccs_category.always_included:
             if pool_entry.dccs.is_available(stages_cleared):
                 selected_dccs.append((pool_entry.dccs, pool_entry.weight))
@@ -408,7 +739,7 @@ class DCCSBlender:
                     weighted_selection.append((pool_entry, pool_entry.weight))
         if not has_selected_any_conditional_entries:
             for pool_entry in dccs_category.included_conditions_not_met:
-                if pool_entry.is_available(stages_cleared):
+                if pool_entry.dccs.is_available(stages_cleared):
                     weighted_selection.append((pool_entry, pool_entry.weight))
         return weighted_selection
 
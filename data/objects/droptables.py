@@ -1,6 +1,8 @@
 import random
 
-from ._utils import round_value
+import numpy as np
+
+from ._utils import build_alias_table, round_value
 from .items import EquipmentDef, ItemDef
 
 
@@ -37,6 +39,102 @@ def _filter_tier_items(drop_table, tier_droplists):
     return items, weights
 
 
+class DropSampler:
+    """
+    A droptable compiled into an alias table over its pickups.
+
+    The tier weights are folded into the probability of each pickup, so that a
+    drop is a single uniform variate and an array lookup. Calling the sampler
+    returns a single drop, using a variate of the `random` module.
+    """
+    def __init__(self, pickups, weights=None):
+        """
+        Compile a distribution over pickups.
+
+        Parameters
+        ----------
+        pickups : list
+            The items or equipment that can drop.
+        weights : list, optional
+            The selection weight of each pickup. By default they are uniform.
+
+        Returns
+        -------
+        None
+        """
+        self.pickups = list(pickups)
+        weights = np.ones(len(self.pickups)) if weights is None else np.array(weights, dtype=np.float64)
+        self.probabilities = weights / weights.sum()
+        threshold, alias = build_alias_table(self.probabilities.tolist())
+        self._threshold = np.array(threshold)
+        self._alias = np.array(alias, dtype=np.int64)
+        # The alias table maps straight to the pickups for single drops
+        self._threshold_list = threshold
+        self._alias_pickups = [self.pickups[i] for i in alias]
+
+    def __repr__(self):
+        return f'DropSampler({len(self.pickups)} pickups)'
+
+    def __len__(self):
+        return len(self.pickups)
+
+    def __call__(self):
+        u = random.random() * len(self.pickups)
+        i = min(int(u), len(self.pickups) - 1)
+        return self.pickups[i] if u - i < self._threshold_list[i] else self._alias_pickups[i]
+
+    @classmethod
+    def from_tiers(cls, items, weights, split_tier_weight=False):
+        """
+        Compile the tiers of a droptable.
+
+        Parameters
+        ----------
+        items : list
+            A list of lists of the pickups of each tier.
+        weights : list
+            The selection weight of each tier.
+        split_tier_weight : bool, optional
+            Whether the tier weight is shared among its pickups, i.e., a tier is
+            selected first and then one of its pickups uniformly. Otherwise, each
+            pickup has the weight of its tier.
+
+        Returns
+        -------
+        DropSampler
+        """
+        pickups = []
+        pickup_weights = []
+        for tier_items, weight in zip(items, weights):
+            pickups.extend(tier_items)
+            weight = weight / len(tier_items) if split_tier_weight else weight
+            pickup_weights.extend([weight] * len(tier_items))
+        return cls(pickups, pickup_weights)
+
+    def draw(self, size, rng=None):
+        """
+        Draw many drops at once.
+
+        Parameters
+        ----------
+        size : int or tuple
+            The number or shape of the drops.
+        rng : numpy.random.Generator, optional
+            The source of randomness. By default it's seeded from the `random`
+            module.
+
+        Returns
+        -------
+        array
+            The index of each drop in `pickups`.
+        """
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+        u = rng.random(size) * len(self.pickups)
+        i = np.minimum(u.astype(np.int64), len(self.pickups) - 1)
+        return np.where(u - i < self._threshold[i], i, self._alias[i])
+
+
 class PickupDropTable:
     SCRIPT = None
 
@@ -54,9 +152,12 @@ class PickupDropTable:
             'can_be_replaced': bool(asset['canDropBeReplaced']),
         }
 
-    def generate_loot_drop_action(self, tier_droplists):
+    def compile_sampler(self, tier_droplists):
         raise NotImplementedError
 
+    def generate_loot_drop_action(self, tier_droplists):
+        return self.compile_sampler(tier_droplists)
+
 
 class ArenaMonsterItemDropTable(PickupDropTable):
     SCRIPT = 6355564085484888252
@@ -85,9 +186,9 @@ class ArenaMonsterItemDropTable(PickupDropTable):
         })
         return data
 
-    def generate_loot_drop_action(self, tier_droplists):
+    def compile_sampler(self, tier_droplists):
         items, weights = _filter_tier_items(self, tier_droplists)
-        return lambda: random.choice(random.choices(items, weights)[0])
+        return DropSampler.from_tiers(items, weights, split_tier_weight=True)
 
     
 class BasicPickupDropTable(PickupDropTable):
@@ -117,16 +218,14 @@ class BasicPickupDropTable(PickupDropTable):
         })
         return data
 
-    def generate_loot_drop_action(self, tier_droplists):
+    def compile_sampler(self, tier_droplists):
         items, weights = _filter_tier_items(self, tier_droplists)
         # The way an item is chosen in the game is defined in
         # `RoR2.BasicPickupDropTable.GenerateWeightedSelection`, which adds all
         # items in a flat list, with each item of a tier having a weight
         # "<tier>Weight". This creates an obvious bias towards tiers that have
         # more items, which we recreate here.
-        total = sum(map(len, items))
-        weights = [w * len(i) / total for i, w in zip(items, weights)]
-        return lambda: random.choice(random.choices(items, weights)[0])
+        return DropSampler.from_tiers(items, weights)
 
 
 class DoppelgangerDropTable(PickupDropTable):
@@ -156,9 +255,9 @@ class DoppelgangerDropTable(PickupDropTable):
         })
         return data
 
-    def generate_loot_drop_action(self, tier_droplists):
+    def compile_sampler(self, tier_droplists):
         items, weights = _filter_tier_items(self, tier_droplists)
-        return lambda: random.choice(random.choices(items, weights)[0])
+        return DropSampler.from_tiers(items, weights, split_tier_weight=True)
 
 
 class ExplicitPickupDropTable(PickupDropTable):
@@ -185,9 +284,9 @@ class ExplicitPickupDropTable(PickupDropTable):
         })
         return data
 
-    def generate_loot_drop_action(self, tier_droplists):
-        items, weights = zip(self.entries)
-        return lambda: random.choice(random.choices(items, weights)[0])
+    def compile_sampler(self, tier_droplists):
+        items, weights = zip(*self.entries)
+        return DropSampler(items, weights)
 
 
 class FreeChestDropTable(PickupDropTable):
@@ -216,6 +315,10 @@ class FreeChestDropTable(PickupDropTable):
     def bind_inventory(self, inventory):
         self.inventory = inventory
 
+    def compile_sampler(self, tier_droplists):
+        # Unused, as the weights depend on the inventory
+        return
+
     def generate_loot_drop_action(self, tier_droplists):
         # Unused
         return
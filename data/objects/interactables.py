@@ -1,7 +1,7 @@
 import random
 
 from ._utils import round_value
-from .droptables import _filter_tier_items
+from .droptables import DropSampler, _filter_tier_items
 
 
 _TRIPLE_SHOP_HIDDEN_CHANCE = .2
@@ -91,7 +91,7 @@ class ChestBehavior:
                 raise ValueError("The Lunar Coin isn't implemented.")
             else:
                 items, weights = _filter_tier_items(isc.drop_table, tier_droplists)
-                drop = lambda: random.choice(random.choices(items, weights)[0])
+                drop = DropSampler.from_tiers(items, weights, split_tier_weight=True)
             max_drops = 10
             return lambda: [drop() for _ in range(max_drops)]
 
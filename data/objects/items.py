@@ -1,6 +1,17 @@
 from ._utils import round_value
 
 
+def _get_loaded(name, attribute):
+    """
+    Get the loaded item or equipment of an internal name.
+
+    This is used for unpickling, so that the same object is shared, e.g., when
+    sent to another process.
+    """
+    import data_loader
+    return getattr(getattr(data_loader, attribute), name)
+
+
 class ItemTierDef:
     SCRIPT = 4020630569963760157
 
@@ -32,6 +43,9 @@ class ItemDef:
     def __repr__(self):
         return self.name
 
+    def __reduce__(self):
+        return _get_loaded, (self._name, 'Items')
+
     @staticmethod
     def parse(asset, token_names):
         return {
@@ -56,6 +70,9 @@ class EquipmentDef:
     def __repr__(self):
         return self.name
 
+    def __reduce__(self):
+        return _get_loaded, (self._name, 'Equipment')
+
     @staticmethod
     def parse(asset, token_names):
         return {
@@ -25,6 +25,8 @@ class Items:
         self._items = []
         for item_data in data:
             item = ItemDef(item_data)
+            # A dense id for array-backed storage, e.g., the inventory
+            item.index = len(self._items)
             self._items.append(item)
             setattr(self, item._name, item)
 
@@ -34,6 +36,7 @@ class Equipment:
         self._items = []
         for item_data in data:
             item = EquipmentDef(item_data)
+            item.index = len(self._items)
             self._items.append(item)
             setattr(self, item._name, item)
 
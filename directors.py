@@ -1,11 +1,36 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import bisect
+import itertools
+import math
 import random
+import time
 import warnings
 
 import numpy as np
 
 from constants import Expansion, ALL_EXPANSIONS, IT_STAGES
+from data.objects._utils import build_alias_table
 from data.objects.dccs import DirectorCardCategorySelection, DCCSBlender
 from data_loader import scenes, voidseed, simulacrum
+from sample_store import MAX_COUNT, SampleStore, create_store
+
+
+# The number of populations advanced together by the vectorised engine. This
+# only bounds the size of the temporary arrays and doesn't affect the result.
+BATCH_SIZE = 2**14
+# The standard score of the confidence intervals for adaptive stopping
+CONFIDENCE_Z = 1.96
+# The number of seeded samples of `collect_statistics` each director keeps
+STATISTICS_CACHE_SIZE = 16
+# The director attributes that `compare_statistics` configurations can change
+COMPARABLE_SETTINGS = (
+    'num_players',
+    'is_command_enabled',
+    'is_sacrifice_enabled',
+    'is_bonus_credits_available',
+    'is_log_available',
+)
 
 
 class IndexedDirectorCard:
@@ -28,37 +53,1094 @@ class IndexedDirectorCard:
         return self.card.is_available(stages_cleared, expansions)
 
 
+class SpawnStatistics:
+    """Sufficient statistics of interactable spawn counts over many populations."""
+    def __init__(self, item_num, distributions=False):
+        """
+        Create an empty set of statistics.
+
+        Parameters
+        ----------
+        item_num : int
+            The total number of interactables.
+        distributions : bool, optional
+            Whether to also count the full distribution of the spawn counts of
+            each interactable and of each pair of interactables.
+
+        Returns
+        -------
+        None
+        """
+        self.iterations = 0
+        self.sums = np.zeros(item_num, dtype=np.int64)
+        self.sums_sq = np.zeros(item_num, dtype=np.int64)
+        self.nonzero = np.zeros(item_num, dtype=np.int64)
+        self.distributions = distributions
+        if distributions:
+            # The number of populations with each spawn count per interactable,
+            # which grows as higher counts are seen.
+            self.histograms = np.zeros((item_num, 1), dtype=np.int64)
+            # Only the populations where both interactables of a pair spawn are
+            # counted here, as the rest follow from the histograms. This keeps
+            # the table sparse, since most pairs rarely spawn together.
+            self.pairs = {}
+
+    def _grow_histograms(self, width):
+        """Widen the histograms to fit spawn counts up to `width - 1`."""
+        if width > self.histograms.shape[1]:
+            extra = np.zeros((self.histograms.shape[0], width - self.histograms.shape[1]), dtype=np.int64)
+            self.histograms = np.hstack([self.histograms, extra])
+
+    def update(self, item_counter):
+        """
+        Add a block of populations.
+
+        Parameters
+        ----------
+        item_counter : array
+            Spawn counter for each interactable for each population.
+
+        Returns
+        -------
+        None
+        """
+        counts = item_counter.astype(np.int64, copy=False)
+        self.iterations += counts.shape[0]
+        self.sums += counts.sum(axis=0)
+        self.sums_sq += (counts * counts).sum(axis=0)
+        self.nonzero += np.count_nonzero(counts, axis=0)
+        if self.distributions and counts.size:
+            self._update_distributions(counts)
+
+    def _update_distributions(self, counts):
+        """
+        Add a block of populations to the histograms and the pair table.
+
+        Parameters
+        ----------
+        counts : array
+            Spawn counter for each interactable for each population.
+
+        Returns
+        -------
+        None
+        """
+        item_num = counts.shape[1]
+        width = int(counts.max()) + 1
+        self._grow_histograms(width)
+        # Offsetting each column makes a single bincount cover all of them
+        offsets = np.arange(item_num) * width
+        histograms = np.bincount((counts + offsets).ravel(), minlength=item_num * width)
+        self.histograms[:, :width] += histograms.reshape(item_num, width)
+        spawned = counts > 0
+        active = np.flatnonzero(spawned.any(axis=0))
+        for a, i in enumerate(active):
+            for j in active[a + 1:]:
+                both = spawned[:, i] & spawned[:, j]
+                if not both.any():
+                    continue
+                codes = counts[both, i] * width + counts[both, j]
+                joint = np.bincount(codes)
+                table = self.pairs.setdefault((int(i), int(j)), {})
+                for code in np.flatnonzero(joint):
+                    key = divmod(int(code), width)
+                    table[key] = table.get(key, 0) + int(joint[code])
+
+    def merge(self, other):
+        """
+        Add the statistics of another set of populations.
+
+        Parameters
+        ----------
+        other : SpawnStatistics
+            The statistics to merge into this one.
+
+        Returns
+        -------
+        None
+        """
+        self.iterations += other.iterations
+        self.sums += other.sums
+        self.sums_sq += other.sums_sq
+        self.nonzero += other.nonzero
+        if self.distributions:
+            self._grow_histograms(other.histograms.shape[1])
+            self.histograms[:, :other.histograms.shape[1]] += other.histograms
+            for pair, other_table in other.pairs.items():
+                table = self.pairs.setdefault(pair, {})
+                for key, count in other_table.items():
+                    table[key] = table.get(key, 0) + count
+
+    def summarise(self):
+        """
+        Compute the statistics of each interactable.
+
+        Returns
+        -------
+        mean, std, once : array
+            The mean, standard deviation, and probability to spawn at least
+            once of each interactable.
+        """
+        iterations = max(self.iterations, 1)
+        mean = self.sums / iterations
+        std = np.sqrt(np.maximum(self.sums_sq / iterations - mean**2, 0))
+        once = self.nonzero / iterations
+        return mean, std, once
+
+    def relative_errors(self, z=CONFIDENCE_Z):
+        """
+        Compute the relative half-width of the confidence intervals.
+
+        Parameters
+        ----------
+        z : float, optional
+            The standard score of the confidence level. By default this is for
+            a 95% confidence interval.
+
+        Returns
+        -------
+        mean_error, once_error : array
+            The half-width of the confidence interval of the mean and of the
+            probability to spawn at least once, relative to the estimate. It is
+            infinite for any interactable that hasn't spawned yet.
+        """
+        mean, std, once = self.summarise()
+        iterations = max(self.iterations, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_error = np.where(mean > 0, z * std / np.sqrt(iterations) / mean, np.inf)
+            once_error = np.where(
+                once > 0, z * np.sqrt(once * (1 - once) / iterations) / once, np.inf
+            )
+        return mean_error, once_error
+
+    def summarise_distributions(self, order):
+        """
+        Arrange the spawn count distributions by output position.
+
+        Parameters
+        ----------
+        order : list
+            The index of the interactable at each output position.
+
+        Returns
+        -------
+        dict
+            - 'iterations': The number of populations.
+            - 'histograms': An array for each interactable with the number of
+                populations it spawned 0, 1, 2, etc. times.
+            - 'pairs': For each pair of positions `(a, b)` with `a < b` that
+                have spawned together, a dictionary with the number of
+                populations for each pair of counts `(count_a, count_b)`, both
+                of which are at least 1. The full joint table can be built with
+                `joint_counts`.
+        """
+        position = {index: a for a, index in enumerate(order)}
+        histograms = []
+        for index in order:
+            histogram = np.trim_zeros(self.histograms[index], 'b').copy()
+            histograms.append(histogram if histogram.size else np.zeros(1, dtype=np.int64))
+        pairs = {}
+        for (i, j), table in self.pairs.items():
+            a, b = position[i], position[j]
+            if a < b:
+                pairs[a, b] = dict(table)
+            else:
+                pairs[b, a] = {(count_j, count_i): n for (count_i, count_j), n in table.items()}
+        return {'iterations': self.iterations, 'histograms': histograms, 'pairs': pairs}
+
+
+class Instrumentation:
+    """Records of how a director spends its time and credits."""
+    def __init__(self):
+        """
+        Create empty records.
+
+        Returns
+        -------
+        None
+        """
+        self.draws = []
+        self.rejected_draws = []
+        self.unspent_credits = []
+        self.category_spend = {}
+        self.timings = {}
+        self.calls = {}
+
+    def record_time(self, phase, seconds):
+        """
+        Add the time of a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase, e.g., 'blending'.
+        seconds : float
+            The wall-clock time spent.
+
+        Returns
+        -------
+        None
+        """
+        self.timings[phase] = self.timings.get(phase, 0.) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def record_population(self, draws, rejected_draws, unspent_credits, category_spend):
+        """
+        Add the spending of a population.
+
+        Parameters
+        ----------
+        draws : int
+            The number of accepted card draws.
+        rejected_draws : int
+            The number of draws of cards that had reached their spawn limit.
+        unspent_credits : int
+            The credits left at the end of the population.
+        category_spend : dict
+            The credits spent on each category.
+
+        Returns
+        -------
+        None
+        """
+        self.draws.append(draws)
+        self.rejected_draws.append(rejected_draws)
+        self.unspent_credits.append(unspent_credits)
+        for category, credits in category_spend.items():
+            self.category_spend[category] = self.category_spend.get(category, 0) + credits
+
+    def summarise(self):
+        """
+        Average the records over all populations.
+
+        Returns
+        -------
+        dict
+            The number of 'populations', the mean 'draws', 'rejected_draws',
+            and 'unspent_credits' per population, the mean 'category_spend'
+            per population for each category, and the total 'timings' and
+            'calls' of each phase.
+        """
+        populations = len(self.draws)
+        n = max(populations, 1)
+        return {
+            'populations': populations,
+            'draws': sum(self.draws) / n,
+            'rejected_draws': sum(self.rejected_draws) / n,
+            'unspent_credits': sum(self.unspent_credits) / n,
+            'category_spend': {category: credits / n for category, credits in self.category_spend.items()},
+            'timings': dict(self.timings),
+            'calls': dict(self.calls),
+        }
+
+
+class DrawTrace:
+    """
+    The card draws of many populations of the same deck.
+
+    For every step of every population, this keeps the drawn card and the set
+    of cards that could be drawn, so that the populations can be reweighted by
+    their likelihood under different card weights.
+    """
+    def __init__(self, interactables, deck, item_counter, rows, choices, eligible,
+                 is_sacrifice_enabled=False):
+        """
+        Store the draws of a baseline run.
+
+        Parameters
+        ----------
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        deck : CompiledDeck
+            The spawn cards of the baseline.
+        item_counter : array
+            The spawn counts of each population.
+        rows : array
+            The population of each step.
+        choices : array
+            The deck position of the card drawn in each step.
+        eligible : array
+            The cards that could be drawn in each step, packed along the deck
+            with `numpy.packbits`.
+        is_sacrifice_enabled : bool, optional
+            Whether the Artifact of Sacrifice was enabled for the draws.
+
+        Returns
+        -------
+        None
+        """
+        self.interactables = interactables
+        self.deck = deck
+        self.item_counter = item_counter
+        self.rows = rows
+        self.choices = choices
+        self.eligible = eligible
+        self.is_sacrifice_enabled = is_sacrifice_enabled
+        category_of = {card.index: category.name for category in interactables.categories
+                       for card in category.cards}
+        raw_weight_of = {card.index: card.weight for category in interactables.categories
+                         for card in category.cards}
+        self.categories = [category_of[index] for index in deck.indices.tolist()]
+        self.raw_weights = np.array([raw_weight_of[index] for index in deck.indices.tolist()],
+                                    dtype=np.float64)
+        self.log_likelihood = self._log_likelihood(deck.weights)
+
+    @property
+    def iterations(self):
+        """The number of populations."""
+        return self.item_counter.shape[0]
+
+    def _log_likelihood(self, weights):
+        """
+        Compute the log-likelihood of every population under some card weights.
+
+        Parameters
+        ----------
+        weights : array
+            The weight of each card of the deck.
+
+        Returns
+        -------
+        array
+            The log-likelihood of each population, which is minus infinity for
+            any population that is impossible with these weights.
+        """
+        log_likelihood = np.zeros(self.iterations)
+        for i in range(0, len(self.rows), BATCH_SIZE):
+            eligible = np.unpackbits(self.eligible[i:i+BATCH_SIZE], axis=1, count=len(self.deck))
+            total = eligible @ weights
+            chosen = weights[self.choices[i:i+BATCH_SIZE]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(total > 0, np.log(chosen) - np.log(total), -np.inf)
+            log_likelihood += np.bincount(self.rows[i:i+BATCH_SIZE], weights=step,
+                                          minlength=self.iterations)
+        return log_likelihood
+
+    def get_weights(self, card_weights=None, category_weights=None):
+        """
+        Recompute the deck weights after changing some card or category weights.
+
+        The weights are normalised within each category in the same way as
+        `DirectorCardCategorySelection.generate_card_weighted_selection`.
+
+        Parameters
+        ----------
+        card_weights : dict, optional
+            The new selection weight of any card, by internal name.
+        category_weights : dict, optional
+            The new selection weight of any category, by name.
+
+        Returns
+        -------
+        array
+            The weight of each card of the deck.
+
+        Raises
+        ------
+        ValueError
+            If a card or category is not in the deck.
+        """
+        card_weights = card_weights or {}
+        category_weights = category_weights or {}
+        unknown = (set(card_weights) - set(self.deck.names)) | (set(category_weights) - set(self.categories))
+        if unknown:
+            raise ValueError(f'Not in the deck: {sorted(unknown)}.')
+        raw_weights = np.array([card_weights.get(name, weight) for name, weight
+                                in zip(self.deck.names, self.raw_weights)], dtype=np.float64)
+        weights = np.zeros(len(self.deck))
+        for category in self.interactables.categories:
+            positions = [i for i, name in enumerate(self.categories) if name == category.name]
+            total = raw_weights[positions].sum()
+            if positions and total > 0:
+                weight = category_weights.get(category.name, category.weight)
+                weights[positions] = raw_weights[positions] * weight / total
+        if self.is_sacrifice_enabled:
+            weights *= self.deck.sacrifice_weights
+        return weights
+
+
+def joint_counts(distributions, a, b):
+    """
+    Build the full table of joint spawn counts of two interactables.
+
+    Parameters
+    ----------
+    distributions : dict
+        The count distributions, as returned by `collect_statistics`.
+    a, b : int
+        The positions of the two interactables in the list of results.
+
+    Returns
+    -------
+    array
+        The number of populations in which the first interactable spawned as
+        many times as the row and the second one as the column.
+
+    Raises
+    ------
+    ValueError
+        If the two positions are the same.
+
+    Examples
+    --------
+    The chance of at least two Multishop Terminals and a Scrapper, if they are
+    at positions 3 and 21, is
+
+    >>> table = joint_counts(distributions, 3, 21)
+    >>> table[2:, 1:].sum() / distributions['iterations']
+    """
+    if a == b:
+        raise ValueError('The joint counts need two different interactables.')
+    hist_a = distributions['histograms'][a]
+    hist_b = distributions['histograms'][b]
+    table = np.zeros((len(hist_a), len(hist_b)), dtype=np.int64)
+    for (count_a, count_b), n in distributions['pairs'].get((min(a, b), max(a, b)), {}).items():
+        if a > b:
+            count_a, count_b = count_b, count_a
+        table[count_a, count_b] = n
+    # The populations where only one of the two spawned are the rest of each
+    # marginal count.
+    table[1:, 0] = hist_a[1:] - table[1:, 1:].sum(axis=1)
+    table[0, 1:] = hist_b[1:] - table[1:, 1:].sum(axis=0)
+    table[0, 0] = distributions['iterations'] - table.sum()
+    return table
+
+
+def _collect_partial_statistics(director, interactable_credit, deck, item_num,
+                                iterations, vectorized, rng, distributions=False):
+    """
+    Populate a number of iterations and reduce them to sufficient statistics.
+
+    The populations are generated in blocks of `BATCH_SIZE`, which are folded
+    into running sums, so the memory used doesn't depend on `iterations`.
+    """
+    statistics = SpawnStatistics(item_num, distributions)
+    item_counter = np.zeros((min(BATCH_SIZE, iterations), item_num), dtype=np.int32)
+    for i in range(0, iterations, BATCH_SIZE):
+        block = item_counter[:min(BATCH_SIZE, iterations - i)]
+        block.fill(0)
+        director._populate_block(interactable_credit, deck, block, rng, vectorized)
+        statistics.update(block)
+    return statistics
+
+
+def _collect_worker_statistics(director, interactable_credit, deck, item_num,
+                               iterations, vectorized, seed_sequence, distributions=False):
+    """
+    Collect the statistics of a shard with the worker's own seed stream.
+
+    This is run by every worker process, so it has to be importable.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    # The scalar engine draws from the `random` module
+    random.seed(int(seed_sequence.generate_state(1)[0]))
+    return _collect_partial_statistics(
+        director, interactable_credit, deck, item_num, iterations, vectorized, rng, distributions
+    )
+
+
+def _collect_sharded_statistics(director, interactable_credit, deck, item_num,
+                                iterations, vectorized, seed_sequences, executor=None,
+                                distributions=False):
+    """
+    Split the iterations evenly over a process pool and merge the results.
+
+    There is one worker for each seed sequence. If no executor is given, a new
+    process pool is created just for this call.
+    """
+    workers = len(seed_sequences)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return _collect_sharded_statistics(
+                director, interactable_credit, deck, item_num, iterations, vectorized,
+                seed_sequences, executor, distributions,
+            )
+    shards = [iterations // workers + (i < iterations % workers) for i in range(workers)]
+    statistics = SpawnStatistics(item_num, distributions)
+    futures = [
+        executor.submit(
+            _collect_worker_statistics, director, interactable_credit, deck, item_num,
+            shard, vectorized, seed_sequence, distributions,
+        )
+        for shard, seed_sequence in zip(shards, seed_sequences)
+    ]
+    for future in futures:
+        statistics.merge(future.result())
+    return statistics
+
+
+def _coupled_uniforms(stream, size, rows):
+    """
+    Share the random numbers of a block of populations between several calls.
+
+    Every step draws a variate for each of the `size` populations of the block,
+    whether they are still active or not, so that the k-th card draw of a
+    population always uses the k-th variate of its stream, regardless of which
+    configuration or subset of `rows` is being populated.
+
+    Parameters
+    ----------
+    stream : numpy.random.Generator
+        A generator seeded the same way for every call that shares the stream.
+    size : int
+        The number of populations in the block.
+    rows : array
+        The rows of the block being populated.
+
+    Returns
+    -------
+    callable
+        The `uniforms` argument for `_populate_batch`.
+    """
+    return lambda active: stream.random(size)[rows[active]]
+
+
+def _merge_layouts(selections):
+    """
+    Combine the interactables of several card selections into one.
+
+    Cards are matched by their category, their internal name, and how many
+    times the same card has already appeared in the category.
+
+    Parameters
+    ----------
+    selections : list
+        The DCCS with the indexed interactable cards of each selection.
+
+    Returns
+    -------
+    merged : DirectorCardCategorySelection
+        The DCCS with all interactables, indexed in order of appearance.
+    layouts : list
+        For each selection, an array with the index in `merged` of each of its
+        interactables.
+    """
+    if len(selections) == 1:
+        item_num = sum(len(category.cards) for category in selections[0].categories)
+        return selections[0], [np.arange(item_num)]
+    merged = DirectorCardCategorySelection()
+    positions = {}
+    layouts = []
+    for selection in selections:
+        item_num = sum(len(category.cards) for category in selection.categories)
+        layout = np.zeros(item_num, dtype=np.intp)
+        for category in selection.categories:
+            category_index = merged.get_category_index(category.name)
+            if category_index == -1:
+                merged.add_category(category.name, category.weight, [])
+                category_index = len(merged.categories) - 1
+            merged_cards = merged.categories[category_index].cards
+            occurrences = {}
+            for card in category.cards:
+                occurrence = occurrences.get(card._name, 0)
+                occurrences[card._name] = occurrence + 1
+                key = (category.name, card._name, occurrence)
+                if key not in positions:
+                    positions[key] = len(positions)
+                    merged_cards.append(IndexedDirectorCard(card.card, positions[key]))
+                layout[card.index] = positions[key]
+        layouts.append(layout)
+    return merged, layouts
+
+
 class BaseSceneDirector:
-    def _select_card(self, deck, max_cost):
+    # Any recording of the population internals is opt-in
+    instrumentation = None
+
+    def enable_instrumentation(self):
+        """
+        Start recording how the director spends its time and credits.
+
+        Only the single population methods, i.e., `populate_scene` and
+        `populate_camp`, are recorded. When disabled, which is the default,
+        there is no overhead.
+
+        Returns
+        -------
+        Instrumentation
+            The new records, which are also available as `instrumentation`.
+        """
+        self.instrumentation = Instrumentation()
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """
+        Stop recording how the director spends its time and credits.
+
+        Returns
+        -------
+        Instrumentation or None
+            The records so far.
+        """
+        instrumentation = self.instrumentation
+        self.instrumentation = None
+        return instrumentation
+
+    def _populate_instrumented(self, interactable_credit, interactables, deck, item_counter,
+                               respect_limits=True):
+        """
+        Populate with valid interactables and record the credit spending.
+
+        This is the same loop as `_populate_scene` or `_populate_camp`, which
+        also records the number of draws, the credits left unspent, and the
+        credits spent on each category. The game would redraw a card that has
+        reached its spawn limit, but here such cards are removed from the
+        selection instead. The number of redraws before each accepted one is
+        therefore sampled from the geometric distribution with the chance of
+        drawing any of the affordable exhausted cards.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits.
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_counter : list_like
+            An initialised list with zeroes, which will be incremented to count
+            any items spawned. This is a mutable operation.
+        respect_limits : bool, optional
+            Whether the maximum spawns per stage of each card is enforced.
+
+        Returns
+        -------
+        None
+        """
+        category_of = {card.index: category.name for category in interactables.categories
+                       for card in category.cards}
+        tree = deck.new_tree()
+        costs = deck.costs.tolist()
+        weights = deck.weights.tolist()
+        card_limits = deck.limits.tolist() if respect_limits else [np.inf] * len(deck)
+        skips = deck.skips.tolist()
+        indices = deck.indices.tolist()
+        categories = [category_of[index] for index in indices]
+        exhausted = []
+        draws = 0
+        rejected_draws = 0
+        category_spend = {}
+        while interactable_credit > 0:
+            index = self._select_card(deck, tree, interactable_credit)
+            if index < 0:
+                break
+            exhausted_weight = sum(weights[i] for i in exhausted if costs[i] <= interactable_credit)
+            if exhausted_weight:
+                rejection = exhausted_weight / (exhausted_weight + deck.total_weight(tree, interactable_credit))
+                rejected_draws += int(math.log(1 - random.random()) / math.log(rejection))
+            draws += 1
+            if card_limits[index] > 0:
+                card_limits[index] -= 1
+                if card_limits[index] <= 0:
+                    deck.remove(tree, index)
+                    exhausted.append(index)
+                interactable_credit -= costs[index]
+                category_spend[categories[index]] = category_spend.get(categories[index], 0) + costs[index]
+                if not skips[index]:
+                    item_counter[indices[index]] += 1
+        self.instrumentation.record_population(draws, rejected_draws, interactable_credit, category_spend)
+
+    def _select_card(self, deck, tree, max_cost):
         """
         Select a random interactable from the list of available spawn cards.
         
         Parameters
         ----------
-        deck : list
-            List of the available spawn cards.
-        msx_cost : int
+        deck : CompiledDeck
+            The available spawn cards.
+        tree : list
+            The cumulative weights of the cards that can still be selected for
+            the current population.
+        max_cost : int
             The remaining scene credits, as cards more expensive than this
             cannot be selected.
 
         Returns
         -------
-        IndexedDirectorCard
-            The selected card.
+        int
+            The position of the selected card in the deck, or -1 if none can
+            be selected.
 
         Notes
         -----
         An implementation of `RoR2.SceneDirector.SelectCard()`.
         """
-        values = []
-        weights = []
-        for card, weight in deck:
-            if card.cost <= max_cost:
-                values.append(card)
-                weights.append(weight)
-        if not values:
+        return deck.select(tree, max_cost)
+
+    def _populate_batch(self, interactable_credit, deck, item_counter, rng, respect_limits=True,
+                        uniforms=None, proposal=None, log_likelihood=None, trace=None):
+        """
+        Populate many scenes at once in lockstep.
+
+        Every row of `item_counter` is an independent population. All the rows
+        that still have credits left draw a card in the same vectorised step,
+        which is equivalent to running the single population loop for each
+        row separately.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for each population.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_counter : array
+            An initialised 2D array with zeroes of shape (populations, items),
+            which will be incremented to count any items spawned according to
+            their index. This is a mutable operation.
+        rng : numpy.random.Generator
+            The random number generator for the card draws.
+        respect_limits : bool, optional
+            Whether the maximum spawns per stage of each card is enforced.
+        uniforms : callable, optional
+            Given the indices of the rows that draw a card in a step, it
+            returns a uniform variate for each of them. This allows several
+            calls to share their random numbers. By default they are drawn from
+            `rng`.
+        proposal : array, optional
+            Alternative weights of the cards to draw from instead, for
+            importance sampling. A card must have a positive proposal weight if
+            and only if it has a positive weight.
+        log_likelihood : array, optional
+            The log-likelihood ratio of each population under the deck weights
+            over the `proposal` weights, which is incremented for every draw.
+            It is required with a `proposal`. This is a mutable operation.
+        trace : list, optional
+            If given, a tuple for each step is appended to it, with the active
+            rows, the position of the card each of them drew, and a boolean
+            array of the cards each of them could draw.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        In the single population loop a card that has reached its limit is
+        drawn again without paying for it, which is the same as drawing only
+        from the cards that haven't reached their limit. The latter is what is
+        done here, which also means a population ends when all affordable cards
+        are exhausted instead of looping forever.
+        """
+        if not len(deck) or interactable_credit <= 0:
             return
-        return random.choices(values, weights)[0]
+        weights = deck.weights
+        costs = deck.costs
+        indices = deck.indices
+        is_counted = np.logical_not(deck.skips).astype(item_counter.dtype)
+        populations = item_counter.shape[0]
+        credits = np.full(populations, interactable_credit, dtype=np.int64)
+        if respect_limits:
+            remaining = np.tile(deck.limits, (populations, 1))
+        active = np.arange(populations)
+        while active.size:
+            available = costs <= credits[active, None]
+            if respect_limits:
+                available &= remaining[active] > 0
+            if proposal is None:
+                cumulative = np.cumsum(weights * available, axis=1)
+            else:
+                cumulative = np.cumsum(proposal * available, axis=1)
+                target_total = (weights * available).sum(axis=1)
+            total = cumulative[:, -1]
+            has_choice = total > 0
+            if not has_choice.all():
+                active = active[has_choice]
+                cumulative = cumulative[has_choice]
+                total = total[has_choice]
+                if proposal is not None:
+                    target_total = target_total[has_choice]
+            if not active.size:
+                break
+            # Inverse transform sampling on the cumulative weights of each row
+            threshold = (uniforms(active) if uniforms else rng.random(active.size)) * total
+            choice = (cumulative <= threshold[:, None]).sum(axis=1)
+            np.minimum(choice, len(deck) - 1, out=choice)
+            if proposal is not None:
+                log_likelihood[active] += (
+                    np.log(weights[choice] / target_total) - np.log(proposal[choice] / total)
+                )
+            if trace is not None:
+                trace.append((active.copy(), choice, available[has_choice] & (weights > 0)))
+            credits[active] -= costs[choice]
+            if respect_limits:
+                remaining[active, choice] -= 1
+            item_counter[active, indices[choice]] += is_counted[choice]
+            active = active[credits[active] > 0]
+
+    def _solve_exact(self, interactable_credit, deck, item_num, respect_limits=True):
+        """
+        Compute the exact spawn distribution moments for a deck.
+
+        A population is a Markov chain whose state is the remaining credits and
+        the remaining spawns of every card with a limit. The expected value of
+        the counts, their squares, and the probability of never spawning each
+        card are linear in the values of the next states, so they are solved
+        with dynamic programming in order of increasing credits.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the population.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_num : int
+            The total number of interactables.
+        respect_limits : bool, optional
+            Whether the maximum spawns per stage of each card is enforced.
+
+        Returns
+        -------
+        mean : array
+            The expected number of spawns of each interactable.
+        square : array
+            The expected squared number of spawns of each interactable.
+        never : array
+            The probability each interactable never spawns.
+
+        Raises
+        ------
+        ValueError
+            If a free card has no spawn limit, as the population would never
+            run out of credits.
+        """
+        credit = max(interactable_credit, 0)
+        num_cards = len(deck)
+        if not num_cards or not credit:
+            return np.zeros(item_num), np.zeros(item_num), np.ones(item_num)
+        costs = deck.costs
+        weights = deck.weights
+        delta = np.zeros((num_cards, item_num))
+        counted = np.flatnonzero(~deck.skips)
+        delta[counted, deck.indices[counted]] = 1
+        limited = [i for i in range(num_cards) if respect_limits and deck.limits[i] < np.inf]
+        is_unlimited = np.ones(num_cards, dtype=bool)
+        is_unlimited[limited] = False
+        if np.any(is_unlimited & (costs == 0) & (weights > 0)):
+            raise ValueError('A free card without a spawn limit can be selected forever.')
+        affordable = np.searchsorted(costs, np.arange(credit + 1), side='right')
+        limit_states = itertools.product(*(range(int(deck.limits[i]) + 1) for i in limited))
+        # Spending a limited card always lowers the remaining total, so the
+        # tables it depends on will already have been solved.
+        tables = {}
+        for state in sorted(limit_states, key=sum):
+            mean = np.zeros((credit + 1, item_num))
+            square = np.zeros((credit + 1, item_num))
+            never = np.ones((credit + 1, item_num))
+            is_available = is_unlimited.copy()
+            next_tables = []
+            for j, i in enumerate(limited):
+                if state[j] > 0:
+                    is_available[i] = True
+                    next_state = state[:j] + (state[j] - 1,) + state[j+1:]
+                    next_tables.append((i, tables[next_state]))
+            for c in range(1, credit + 1):
+                candidates = np.flatnonzero(is_available[:affordable[c]] & (weights[:affordable[c]] > 0))
+                if not candidates.size:
+                    continue
+                p = weights[candidates] / weights[candidates].sum()
+                next_credits = c - costs[candidates]
+                next_mean = mean[next_credits]
+                next_square = square[next_credits]
+                next_never = never[next_credits]
+                for i, (limited_mean, limited_square, limited_never) in next_tables:
+                    position = np.searchsorted(candidates, i)
+                    if position < candidates.size and candidates[position] == i:
+                        next_mean[position] = limited_mean[c - costs[i]]
+                        next_square[position] = limited_square[c - costs[i]]
+                        next_never[position] = limited_never[c - costs[i]]
+                step = delta[candidates]
+                mean[c] = p @ (next_mean + step)
+                square[c] = p @ (next_square + 2 * step * next_mean + step)
+                never[c] = p @ (next_never * (1 - step))
+            tables[state] = (mean, square, never)
+        mean, square, never = tables[tuple(int(deck.limits[i]) for i in limited)]
+        return mean[credit], square[credit], never[credit]
+
+    def _collect_statistics(self, interactable_credit, interactables, deck, item_num, iterations,
+                            print_result, vectorized, workers, seed_sequence, rng, target_rel_error,
+                            max_iterations, targets, distributions):
+        """
+        Gather interactable spawn statistics for a prepared deck.
+
+        This is the shared implementation of `collect_statistics`, whose
+        documentation covers the parameters. The `seed_sequence` is the master
+        seed sequence and `rng` the generator already derived from it.
+        """
+        sample = self._sample_statistics(
+            interactable_credit, interactables, deck, item_num, iterations, vectorized, workers,
+            seed_sequence, rng, target_rel_error, max_iterations, targets, distributions,
+        )
+        return self._report_sample(interactables, *sample, print_result)
+
+    def _sample_statistics(self, interactable_credit, interactables, deck, item_num, iterations,
+                           vectorized, workers, seed_sequence, rng, target_rel_error,
+                           max_iterations, targets, distributions):
+        """
+        Sample the spawn statistics for a prepared deck.
+
+        The parameters are the same as for `_collect_statistics`.
+
+        Returns
+        -------
+        statistics : SpawnStatistics
+            The accumulated spawn counts.
+        precision : dict or None
+            The achieved precision, as returned by `collect_statistics`, if
+            `target_rel_error` is set.
+        worst : float or None
+            The largest relative error of any tracked interactable, if
+            `target_rel_error` is set.
+        """
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            def collect(block_size):
+                if executor:
+                    return _collect_sharded_statistics(
+                        self, interactable_credit, deck, item_num, block_size, vectorized,
+                        seed_sequence.spawn(workers), executor, distributions,
+                    )
+                return _collect_partial_statistics(
+                    self, interactable_credit, deck, item_num, block_size, vectorized, rng,
+                    distributions,
+                )
+
+            if target_rel_error is None:
+                return collect(iterations), None, None
+            tracked = self._get_tracked_cards(interactable_credit, interactables, deck, targets)
+            statistics = SpawnStatistics(item_num, distributions)
+            converged = False
+            # Each block is `iterations` long, until the target or the cap is reached
+            while not converged and (max_iterations is None or statistics.iterations < max_iterations):
+                block_size = iterations
+                if max_iterations is not None:
+                    block_size = min(block_size, max_iterations - statistics.iterations)
+                statistics.merge(collect(block_size))
+                mean_error, once_error = statistics.relative_errors()
+                converged = bool(
+                    np.all(mean_error[tracked] <= target_rel_error) and
+                    np.all(once_error[tracked] <= target_rel_error)
+                )
+        finally:
+            if executor:
+                executor.shutdown()
+        order = [card.index for category in interactables.categories for card in category.cards]
+        precision = {
+            'iterations': statistics.iterations,
+            'converged': converged,
+            'mean_error': mean_error[order].tolist(),
+            'once_error': once_error[order].tolist(),
+        }
+        worst = max(max(mean_error[tracked], default=0), max(once_error[tracked], default=0))
+        return statistics, precision, worst
+
+    def _report_sample(self, interactables, statistics, precision, worst, print_result):
+        """
+        Print or return sampled spawn statistics.
+
+        Parameters
+        ----------
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        statistics, precision, worst
+            The sample, as returned by `_sample_statistics`.
+        print_result : bool
+            Whether to print or return the result.
+
+        Returns
+        -------
+        None, list, tuple
+            The same as `collect_statistics`.
+        """
+        out = self._process_statistics(interactables, statistics, print_result)
+        distributions = None
+        if statistics.distributions:
+            distributions = self._process_distributions(interactables, statistics, print_result)
+        if precision is not None:
+            if print_result:
+                status = 'Converged' if precision['converged'] else 'Stopped without converging'
+                print(f'\n{status} after {precision["iterations"]} iterations with a relative error of at most {worst:.2%}.')
+            else:
+                precision = {**precision, 'mean_error': list(precision['mean_error']),
+                             'once_error': list(precision['once_error'])}
+        if print_result:
+            return
+        extra = tuple(x for x in (precision, distributions) if x is not None)
+        return (out, *extra) if extra else out
+
+    def _process_distributions(self, interactables, statistics, print_result):
+        """
+        Print or return the spawn count distributions.
+
+        Parameters
+        ----------
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        statistics : SpawnStatistics
+            The accumulated spawn counts, including their distributions.
+        print_result : bool
+            Whether to print or return the result.
+
+        Returns
+        -------
+        out : None or dict
+            The distributions as described in
+            `SpawnStatistics.summarise_distributions`.
+        """
+        order = [card.index for category in interactables.categories for card in category.cards]
+        distributions = statistics.summarise_distributions(order)
+        if print_result:
+            iterations = max(distributions['iterations'], 1)
+            names = [card.name for category in interactables.categories for card in category.cards]
+            print('\n---Spawn count distributions---')
+            for name, histogram in zip(names, distributions['histograms']):
+                if histogram.size > 1:
+                    shares = ', '.join(f'{count}: {n / iterations:.1%}' for count, n in enumerate(histogram) if n)
+                    print(f'{name}: {shares}')
+            return
+        return distributions
+
+    def _get_tracked_cards(self, interactable_credit, interactables, deck, targets=None):
+        """
+        Find the interactables whose precision decides when to stop sampling.
+
+        Interactables that can never spawn are excluded, as their estimates
+        will always be zero.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the population.
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        deck : CompiledDeck
+            The available spawn cards.
+        targets : iterable, optional
+            The internal names of the interactables to track. By default all of
+            them are tracked.
+
+        Returns
+        -------
+        array
+            The indices of the tracked interactables.
+
+        Raises
+        ------
+        ValueError
+            If a target is not one of the interactables.
+        """
+        if targets is not None:
+            targets = set(targets)
+            names = {card._name for category in interactables.categories for card in category.cards}
+            unknown = targets - names
+            if unknown:
+                raise ValueError(f'Unknown interactables: {sorted(unknown)}.')
+        tracked = set()
+        for name, index, weight, cost, skip in zip(deck.names, deck.indices, deck.weights, deck.costs,
+                                                   deck.skips):
+            if weight > 0 and cost <= interactable_credit and not skip:
+                if targets is None or name in targets:
+                    tracked.add(int(index))
+        return np.array(sorted(tracked), dtype=np.intp)
 
     def _process_generated_interactables(self, interactables, item_counter, print_result):
         """
@@ -95,7 +1177,7 @@ class BaseSceneDirector:
                     out.extend([card._name] * count)
         return out
 
-    def _process_statistics(sef, interactables, item_counter, print_result):
+    def _process_statistics(self, interactables, statistics, print_result):
         """
         Print or return the interactable spawn statistics.
 
@@ -103,8 +1185,31 @@ class BaseSceneDirector:
         ----------
         interactables : DirectorCardCategorySelection
             The DCCS with the interactable categories and their items.
-        item_counter : array
-            Spawn counter for each available interactable for each iteration.
+        statistics : SpawnStatistics
+            The accumulated spawn counts of each available interactable.
+        print_result : bool
+            Whether to print or return the result.
+
+        Returns
+        -------
+        out : None or list
+            A list of with info about each interactable in tuples. This is the
+            name of the interactable, the mean value, its standard deviation,
+            and the probability the item will spawn at least once.
+        """
+        return self._report_statistics(interactables, *statistics.summarise(), print_result)
+
+    def _report_statistics(self, interactables, mean, std, once, print_result):
+        """
+        Print or return the interactable spawn statistics.
+
+        Parameters
+        ----------
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        mean, std, once : array
+            The mean, standard deviation, and probability to spawn at least once
+            of each interactable.
         print_result : bool
             Whether to print or return the result.
 
@@ -115,9 +1220,6 @@ class BaseSceneDirector:
             name of the interactable, the mean value, its standard deviation,
             and the probability the item will spawn at least once.
         """
-        mean = item_counter.mean(axis=0)
-        std = item_counter.std(axis=0)
-        once = (item_counter > 0).mean(axis=0)
         if print_result:
             result = []
             for category in interactables.categories:
@@ -184,15 +1286,23 @@ class SceneDirector(BaseSceneDirector):
         self._scene_data = scenes[scene_name]
         if self._scene_data.required_dlc and self._scene_data.required_dlc not in expansions:
             warnings.warn('The current scene requires the DLC, which will now be enabled.')
-            expansions.add(required_dlc)
+            expansions.add(self._scene_data.required_dlc)
         self._expansions = expansions
         self.num_players = num_players
         self.is_command_enabled = is_command_enabled
         self.is_sacrifice_enabled = is_sacrifice_enabled
         self.is_bonus_credits_available = is_bonus_credits_available
         self.is_log_available = is_log_available
+        # The compiled blend outcomes for every scene configuration seen so far
+        self._outcome_cache = {}
+        # The sorted stage thresholds of each scene seen so far
+        self._stage_thresholds = {}
+        # The most recent seeded samples by deck signature and options
+        self._statistics_cache = OrderedDict()
+        # The exact statistics for every deck signature seen so far
+        self._exact_statistics_cache = {}
 
-    def _start(self, stages_cleared):
+    def _start(self, stages_cleared, rng=None):
         """
         Prepare variables before populating the scene.
 
@@ -201,6 +1311,9 @@ class SceneDirector(BaseSceneDirector):
         stages_cleared : int
             The number of stages cleared. It should really be zero or a positive
             integer, but negative values will behave like a zero.
+        rng : numpy.random.Generator, optional
+            The random number generator for selecting the blend outcome. By
+            default the `random` module is used.
 
         Returns
         -------
@@ -210,32 +1323,48 @@ class SceneDirector(BaseSceneDirector):
             The DCCS with the interactable categories and their items available
             based on whether the Artifact of Command/Sacrifice or the DLC are
             enabled.
-        deck : list
-            List of the filtered weighted spawn cards.
+        deck : CompiledDeck
+            The filtered weighted spawn cards.
         item_num : int
             The total number of interactables in `interactables`.
         """
-        stage_info = self._scene_data.stage_info
-        if stage_info:
-            interactable_credit = int(stage_info.interactable_credits * (.5 + self.num_players * .5))
-            if self.is_bonus_credits_available:
-                interactable_credit += stage_info.bonus_credits
-            if self._scene_name in IT_STAGES:
-                interactable_credit = simulacrum.interactable_credits
-            if self.is_sacrifice_enabled:
-                interactable_credit //= 2
+        interactable_credit = self._get_interactable_credit()
+        outcomes, probabilities = self._get_blend_outcomes(stages_cleared)
+        if len(outcomes) == 1:
+            index = 0
+        elif rng is not None:
+            index = rng.choice(len(outcomes), p=probabilities)
         else:
-            interactable_credit = 0
-        interactables = self._generate_interactable_card_selection(stages_cleared)
-        deck = interactables.generate_card_weighted_selection(
-            stages_cleared, self._expansions, self.is_sacrifice_enabled
-        )
-        item_num = sum(len(category.cards) for category in interactables.categories)
+            index = random.choices(range(len(outcomes)), probabilities)[0]
+        interactables, deck, item_num = outcomes[index]
         return interactable_credit, interactables, deck, item_num
-        
-    def _generate_interactable_card_selection(self, stages_cleared):
+
+    def _get_interactable_credit(self):
         """
-        Generate all valid interactable cards.
+        Calculate the interactable credits for the scene.
+
+        Returns
+        -------
+        int
+        """
+        stage_info = self._scene_data.stage_info
+        if not stage_info:
+            return 0
+        interactable_credit = int(stage_info.interactable_credits * (.5 + self.num_players * .5))
+        if self.is_bonus_credits_available:
+            interactable_credit += stage_info.bonus_credits
+        if self._scene_name in IT_STAGES:
+            interactable_credit = simulacrum.interactable_credits
+        if self.is_sacrifice_enabled:
+            interactable_credit //= 2
+        return interactable_credit
+
+    def _get_blend_outcomes(self, stages_cleared):
+        """
+        Compile every possible interactable selection for the scene.
+
+        The result is cached for the current scene configuration, so only the
+        first call for each one does any work.
 
         Parameters
         ----------
@@ -244,21 +1373,132 @@ class SceneDirector(BaseSceneDirector):
 
         Returns
         -------
-        categories : list
-            The list of available categories.
+        outcomes : list
+            A tuple for each distinct blend outcome, which holds the DCCS with
+            the interactable categories and their items, the compiled deck, and
+            the total number of interactables.
+        probabilities : list
+            The probability of each outcome.
+        """
+        key = self._get_outcome_key(stages_cleared)
+        if key not in self._outcome_cache:
+            instrumentation = self.instrumentation
+            if instrumentation:
+                start = time.perf_counter()
+            selections = self._generate_interactable_card_selections(stages_cleared)
+            if instrumentation:
+                instrumentation.record_time('blending', time.perf_counter() - start)
+                start = time.perf_counter()
+            outcomes = []
+            probabilities = []
+            for interactables, probability in selections:
+                deck = interactables.generate_card_weighted_selection(
+                    stages_cleared, self._expansions, self.is_sacrifice_enabled, compiled=True
+                )
+                item_num = sum(len(category.cards) for category in interactables.categories)
+                outcomes.append((interactables, deck, item_num))
+                probabilities.append(probability)
+            if instrumentation:
+                instrumentation.record_time('deck build', time.perf_counter() - start)
+            self._outcome_cache[key] = (outcomes, probabilities)
+        return self._outcome_cache[key]
+
+    def _get_deck_signature(self, stages_cleared):
+        """
+        Map the stages cleared to a canonical deck signature.
+
+        The availability of a card only changes at its minimum stages cleared,
+        and that of a DCCS at its minimum and maximum stages cleared. All
+        values of stages cleared that have reached the same of these thresholds
+        give the same blend outcomes and decks.
+
+        Parameters
+        ----------
+        stages_cleared : int
+            The number of stages cleared.
+
+        Returns
+        -------
+        int
+            The number of thresholds reached.
+        """
+        thresholds = self._stage_thresholds.get(self._scene_name)
+        if thresholds is None:
+            stage_info = self._scene_data.stage_info
+            thresholds = []
+            if stage_info and stage_info.interactables:
+                thresholds = sorted(stage_info.interactables.get_stage_thresholds())
+            self._stage_thresholds[self._scene_name] = thresholds
+        return bisect.bisect_right(thresholds, stages_cleared)
+
+    def _get_outcome_key(self, stages_cleared):
+        """
+        Identify the blend outcomes of the current scene configuration.
+
+        Parameters
+        ----------
+        stages_cleared : int
+            The number of stages cleared.
+
+        Returns
+        -------
+        tuple
+            A hashable key, which is the same for all equivalent values of
+            stages cleared.
+        """
+        return (
+            self._scene_name,
+            self._get_deck_signature(stages_cleared),
+            frozenset(self._expansions),
+            self.is_command_enabled,
+            self.is_sacrifice_enabled,
+            self.is_log_available,
+        )
+
+    def _generate_interactable_card_selections(self, stages_cleared):
+        """
+        Generate all valid interactable cards for every blend outcome.
+
+        Parameters
+        ----------
+        stages_cleared : int
+            The number of stages cleared.
+
+        Returns
+        -------
+        list
+            A list of tuples of the available categories for each outcome and
+            the outcome probability.
 
         Notes
         -----
         An implementation of
         `RoR2.SceneDirector.GenerateInteractableCardSelection()`.
         """
+        stage_info = self._scene_data.stage_info
+        if not stage_info or not stage_info.interactables:
+            return [(DirectorCardCategorySelection(), 1.)]
+        outcomes = DCCSBlender.get_blended_dccs_outcomes(
+            stage_info.interactables.categories[0], self._expansions, stages_cleared
+        )
+        return [(self._filter_interactable_cards(interactables), probability)
+                for interactables, probability in outcomes]
+
+    def _filter_interactable_cards(self, interactables):
+        """
+        Index the interactable cards of a blended DCCS that are allowed to spawn.
+
+        Parameters
+        ----------
+        interactables : DirectorCardCategorySelection
+            The blended DCCS.
+
+        Returns
+        -------
+        categories : DirectorCardCategorySelection
+            The available categories.
+        """
         categories = DirectorCardCategorySelection()
-        stage_info = self._scene_data.stage_info
-        if not stage_info or not stage_info.interactables:
-            return categories
-        interactables = DCCSBlender.get_blended_dccs(
-            stage_info.interactables.categories[0], self._expansions, stages_cleared
-        )
         index = 0
         for category in interactables.categories:
             cards = []
@@ -276,37 +1516,6 @@ class SceneDirector(BaseSceneDirector):
             categories.add_category(category.name, category.weight, cards)
         return categories
 
-    def _select_card(self, deck, max_cost):
-        """
-        Select a random interactable from the list of available spawn cards.
-        
-        Parameters
-        ----------
-        deck : list
-            List of the available spawn cards.
-        msx_cost : int
-            The remaining scene credits, as cards more expensive than this
-            cannot be selected.
-
-        Returns
-        -------
-        IndexedDirectorCard
-            The selected card.
-
-        Notes
-        -----
-        An implementation of `RoR2.SceneDirector.SelectCard()`.
-        """
-        values = []
-        weights = []
-        for card, weight in deck:
-            if card.cost <= max_cost:
-                values.append(card)
-                weights.append(weight)
-        if not values:
-            return
-        return random.choices(values, weights)[0]
-    
     def _populate_scene(self, interactable_credit, deck, item_counter):
         """
         Populate the scene with valid interactables.
@@ -315,8 +1524,8 @@ class SceneDirector(BaseSceneDirector):
         ----------
         interactable_credit : int
             The available credits for the scene.
-        deck : list
-            List of the available spawn cards.
+        deck : CompiledDeck
+            The available spawn cards.
         item_counter : list_like
             An initialised list with zeroes, which will be incremented to count
             any items spawned according to their index in the list. This is a
@@ -330,24 +1539,31 @@ class SceneDirector(BaseSceneDirector):
         -----
         A partial implementation of `RoR2.SceneDirector.PopulateScene()`.
         """
-        card_limits = {}
+        tree = deck.new_tree()
+        # Plain lists are much faster than NumPy arrays for single elements
+        costs = deck.costs.tolist()
+        card_limits = deck.limits.tolist()
+        skips = deck.skips.tolist()
+        indices = deck.indices.tolist()
         while interactable_credit > 0:
-            card = self._select_card(deck, interactable_credit)
-            if not card:
+            index = self._select_card(deck, tree, interactable_credit)
+            if index < 0:
                 break
-            if card not in card_limits:
-                card_limits[card] = card.limit if card.limit > 0 else np.inf
-            if card_limits[card] > 0:
-                card_limits[card] -= 1
-                interactable_credit -= card.cost
+            if card_limits[index] > 0:
+                card_limits[index] -= 1
+                # A card that reached its limit would only be drawn again to be
+                # rejected, so it's removed from the selection instead.
+                if card_limits[index] <= 0:
+                    deck.remove(tree, index)
+                interactable_credit -= costs[index]
                 # In the game's source code after paying for the card, it attempts
                 # to spawn it, but this can still fail for a few reasons. We're
                 # implementing the skip for the Artifact of Sacrifice here.
-                if not self.is_sacrifice_enabled or not card.skip_with_sacrifice:
+                if not skips[index]:
                     # Incrementing a counter for each spawned item's index is a
                     # design choice isntead of storing the literal items in a
                     # list, since this allows efficient statistical computations.
-                    item_counter[card.index] += 1
+                    item_counter[indices[index]] += 1
 
     def populate_scene(self, stages_cleared=-1, print_result=True):
         """
@@ -372,12 +1588,61 @@ class SceneDirector(BaseSceneDirector):
         """
         if stages_cleared < 0:
             stages_cleared = self._scene_data.stage_order
+        if self.instrumentation:
+            return self._populate_scene_instrumented(stages_cleared, print_result)
         interactable_credit, interactables, deck, item_num = self._start(stages_cleared)
         item_counter = [0] * item_num
         self._populate_scene(interactable_credit, deck, item_counter)
         return self._process_generated_interactables(interactables, item_counter, print_result)
 
-    def collect_statistics(self, stages_cleared=-1, iterations=10000, print_result=True):
+    def _populate_scene_instrumented(self, stages_cleared, print_result):
+        """
+        Populate the scene while recording what happens.
+
+        This is the same as `populate_scene`, except that it also records the
+        time of each phase and how the credits are spent.
+        """
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+        interactable_credit, interactables, deck, item_num = self._start(stages_cleared)
+        instrumentation.record_time('_start', time.perf_counter() - start)
+        start = time.perf_counter()
+        item_counter = [0] * item_num
+        self._populate_instrumented(interactable_credit, interactables, deck, item_counter)
+        instrumentation.record_time('population', time.perf_counter() - start)
+        return self._process_generated_interactables(interactables, item_counter, print_result)
+
+    def _populate_block(self, interactable_credit, deck, item_counter, rng, vectorized=True):
+        """
+        Populate the scene once for each row of a block of counters.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the scene.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_counter : array
+            An initialised 2D array with zeroes of shape (populations, items).
+            This is a mutable operation.
+        rng : numpy.random.Generator
+            The random number generator for the vectorised engine.
+        vectorized : bool, optional
+            Whether to use the vectorised engine or populate one at a time.
+
+        Returns
+        -------
+        None
+        """
+        if vectorized:
+            self._populate_batch(interactable_credit, deck, item_counter, rng)
+        else:
+            for counter in item_counter:
+                self._populate_scene(interactable_credit, deck, counter)
+
+    def collect_statistics(self, stages_cleared=-1, iterations=10000, print_result=True,
+                           vectorized=True, workers=1, seed=None, target_rel_error=None,
+                           max_iterations=None, targets=None, distributions=False):
         """
         Gather interactable spawn statistics.
 
@@ -393,21 +1658,684 @@ class SceneDirector(BaseSceneDirector):
             The number of times the scene interactables will be generated.
         print_result: bool, optional
             Whether to print the result or return it.
+        vectorized : bool, optional
+            Whether to advance all iterations together with NumPy arrays, which
+            is much faster for a large number of iterations. Otherwise, each
+            scene is populated one at a time.
+        workers : int, optional
+            The number of processes to split the iterations over. On platforms
+            that spawn new processes, e.g., Windows, the calling script must be
+            guarded by `if __name__ == '__main__'`.
+        seed : int, optional
+            The master seed, from which every worker derives its own independent
+            seed stream. The result is reproducible for the same seed and number
+            of workers. By default fresh entropy is used.
+        target_rel_error : float, optional
+            If set, keep sampling in blocks of `iterations` until the 95%
+            confidence interval of the mean and of the probability to spawn at
+            least once of every tracked interactable is within this fraction of
+            its estimate. By default exactly `iterations` are sampled.
+        max_iterations : int, optional
+            The maximum number of iterations when sampling until the target
+            precision. By default there is no limit.
+        targets : iterable, optional
+            The internal names of the interactables whose precision decides
+            when to stop. By default all interactables that can spawn are
+            tracked.
+        distributions : bool, optional
+            Whether to also count the full distribution of spawn counts of each
+            interactable and how often each pair of interactables spawn
+            together. These are accumulated block by block, so the memory used
+            doesn't depend on the number of iterations.
 
         Returns
         -------
-        None, list
+        None, list, tuple
             If the `print_result` argument is set to False, the generated
             interactables will be returned as a list of tuple info for each
-            interactable.
+            interactable. If `target_rel_error` is also set, a dictionary is
+            returned along with it, with the number of 'iterations', whether the
+            target was 'converged', and the achieved relative errors
+            'mean_error' and 'once_error' for each interactable in the same
+            order. If `distributions` is set, a dictionary with the
+            'iterations', the 'histograms' of the spawn counts of each
+            interactable in the same order, and the sparse 'pairs' table of
+            joint counts is returned last. Use `joint_counts` for the full
+            joint table of two interactables.
+
+        Raises
+        ------
+        ValueError
+            If any of the `targets` is not one of the interactables.
+
+        Notes
+        -----
+        If a `seed` is given, the statistics are cached by deck signature, so
+        any value of stages cleared that results in the same decks as a recent
+        call with the same options reuses its sample instead of collecting a
+        new one. Without a seed, every call collects a fresh sample. See
+        `clear_statistics_cache`.
         """
         if stages_cleared < 0:
             stages_cleared = self._scene_data.stage_order
-        interactable_credit, interactables, deck, item_num = self._start(stages_cleared)
+        key = (
+            self._get_outcome_key(stages_cleared),
+            self._get_interactable_credit(),
+            iterations,
+            vectorized,
+            workers,
+            seed,
+            target_rel_error,
+            max_iterations,
+            None if targets is None else frozenset(targets),
+            distributions,
+        )
+        if seed is not None and key in self._statistics_cache:
+            self._statistics_cache.move_to_end(key)
+            interactables, sample = self._statistics_cache[key]
+            return self._report_sample(interactables, *sample, print_result)
+        seed_sequence = np.random.SeedSequence(seed)
+        rng = np.random.default_rng(seed_sequence)
+        interactable_credit, interactables, deck, item_num = self._start(stages_cleared, rng)
+        # The scalar engine draws from the `random` module, which is only
+        # seeded for this call so the caller's stream is left untouched
+        state = random.getstate()
+        try:
+            if seed is not None:
+                random.seed(int(seed_sequence.generate_state(1)[0]))
+            sample = self._sample_statistics(
+                interactable_credit, interactables, deck, item_num, iterations, vectorized,
+                workers, seed_sequence, rng, target_rel_error, max_iterations, targets,
+                distributions,
+            )
+        finally:
+            if seed is not None:
+                random.setstate(state)
+        if seed is not None:
+            self._statistics_cache[key] = (interactables, sample)
+            if len(self._statistics_cache) > STATISTICS_CACHE_SIZE:
+                self._statistics_cache.popitem(last=False)
+        return self._report_sample(interactables, *sample, print_result)
+
+    def exact_statistics(self, stages_cleared=-1, print_result=True):
+        """
+        Compute the exact interactable spawn statistics.
+
+        This gives the same information as `collect_statistics` without any
+        sampling noise, by solving the scene population for every blend
+        outcome and mixing the results by their probabilities.
+
+        Parameters
+        ----------
+        stages_cleared : int, default -1
+            The number of stages cleared, which affects which interactables
+            will be available. Any positive integer or zero is allowed. Any
+            negative value will use the default stage value for the scene.
+        print_result: bool, optional
+            Whether to print the result or return it.
+
+        Returns
+        -------
+        None, list
+            If the `print_result` argument is set to False, the statistics will
+            be returned as a list of tuple info for each interactable, in the
+            same format as `collect_statistics`.
+
+        Notes
+        -----
+        The result is cached by deck signature, so it is only solved once for
+        all values of stages cleared that result in the same decks.
+        """
+        if stages_cleared < 0:
+            stages_cleared = self._scene_data.stage_order
+        interactable_credit = self._get_interactable_credit()
+        key = (self._get_outcome_key(stages_cleared), interactable_credit)
+        if key not in self._exact_statistics_cache:
+            self._exact_statistics_cache[key] = self._solve_blend_outcomes(interactable_credit, stages_cleared)
+        return self._report_statistics(*self._exact_statistics_cache[key], print_result)
+
+    def clear_statistics_cache(self):
+        """Discard the cached results of `collect_statistics` and `exact_statistics`."""
+        self._statistics_cache.clear()
+        self._exact_statistics_cache.clear()
+
+    def _solve_blend_outcomes(self, interactable_credit, stages_cleared):
+        """
+        Solve the exact spawn statistics mixed over all blend outcomes.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the scene.
+        stages_cleared : int
+            The number of stages cleared.
+
+        Returns
+        -------
+        interactables : DirectorCardCategorySelection
+            The merged DCCS with the interactables of every outcome.
+        mean, std, once : array
+            The statistics of each interactable in `interactables`.
+        """
+        outcomes, probabilities = self._get_blend_outcomes(stages_cleared)
+        interactables, layouts = _merge_layouts([outcome[0] for outcome in outcomes])
+        item_num = sum(len(category.cards) for category in interactables.categories)
+        mean = np.zeros(item_num)
+        square = np.zeros(item_num)
+        never = np.zeros(item_num)
+        for (_, deck, outcome_item_num), probability, layout in zip(outcomes, probabilities, layouts):
+            outcome_mean, outcome_square, outcome_never = self._solve_exact(
+                interactable_credit, deck, outcome_item_num
+            )
+            # Interactables missing from an outcome never spawn in it
+            outcome_never_all = np.ones(item_num)
+            outcome_never_all[layout] = outcome_never
+            mean[layout] += probability * outcome_mean
+            square[layout] += probability * outcome_square
+            never += probability * outcome_never_all
+        std = np.sqrt(np.maximum(square - mean**2, 0))
+        # Clear the float residue of the interactables that can never spawn
+        once = np.clip(1 - never, 0, 1)
+        once[mean == 0] = 0
+        return interactables, mean, std, once
+
+    def store_samples(self, path, stages_cleared=-1, iterations=1000000, seed=None):
+        """
+        Populate the scene many times and store every sample on disk.
+
+        Each sample is a row of uint8 spawn counts in a memory-mapped file,
+        after a header with the scene, the director settings, and the name of
+        the interactable of each column. The file can then be queried any
+        number of times with `SampleStore` without populating the scene again.
+
+        Parameters
+        ----------
+        path : str
+            The file path, which is overwritten if it exists.
+        stages_cleared : int, default -1
+            The number of stages cleared. Any negative value will use the
+            default stage value for the scene.
+        iterations : int, optional
+            The number of samples.
+        seed : int, optional
+            The seed of the random number generator. By default fresh entropy
+            is used.
+
+        Returns
+        -------
+        SampleStore
+            The stored samples.
+
+        Warns
+        -----
+        UserWarning
+            If any count is too large for a uint8 and had to be capped.
+        """
+        if stages_cleared < 0:
+            stages_cleared = self._scene_data.stage_order
+        rng = np.random.default_rng(seed)
+        interactable_credit = self._get_interactable_credit()
+        outcomes, probabilities = self._get_blend_outcomes(stages_cleared)
+        interactables, layouts = _merge_layouts([outcome[0] for outcome in outcomes])
+        cards = sorted((card for category in interactables.categories for card in category.cards),
+                       key=lambda card: card.index)
+        names = []
+        seen = {}
+        for card in cards:
+            seen[card._name] = seen.get(card._name, 0) + 1
+            names.append(card._name if seen[card._name] == 1 else f'{card._name}#{seen[card._name]}')
+        metadata = {
+            'scene': self._scene_name,
+            'stages_cleared': stages_cleared,
+            'num_players': self.num_players,
+            'expansions': sorted(self._expansions),
+            'is_command_enabled': self.is_command_enabled,
+            'is_sacrifice_enabled': self.is_sacrifice_enabled,
+            'is_bonus_credits_available': self.is_bonus_credits_available,
+            'is_log_available': self.is_log_available,
+            'interactable_credit': interactable_credit,
+            'display_names': [card.name for card in cards],
+            'seed': seed,
+        }
+        rows = create_store(path, metadata, names, iterations)
+        is_capped = False
+        for i in range(0, iterations, BATCH_SIZE):
+            size = min(BATCH_SIZE, iterations - i)
+            choice = rng.choice(len(outcomes), size, p=probabilities)
+            block = np.zeros((size, len(names)), dtype=np.int32)
+            for k, ((_, deck, item_num), layout) in enumerate(zip(outcomes, layouts)):
+                selected = np.flatnonzero(choice == k)
+                if not selected.size:
+                    continue
+                item_counter = np.zeros((selected.size, item_num), dtype=np.int32)
+                self._populate_batch(interactable_credit, deck, item_counter, rng)
+                block[selected[:, None], layout] = item_counter
+            is_capped |= bool(np.any(block > MAX_COUNT))
+            rows[i:i+size] = np.minimum(block, MAX_COUNT)
+        if isinstance(rows, np.memmap):
+            rows.flush()
+        del rows
+        if is_capped:
+            warnings.warn(f'Some spawn counts were capped to {MAX_COUNT}.')
+        return SampleStore(path)
+
+    def rare_event_statistics(self, target, stages_cleared=-1, iterations=10000, boost=None,
+                              print_result=True, seed=None):
+        """
+        Estimate the spawn statistics of a rare interactable.
+
+        The populations are drawn from a proposal in which the weight of the
+        target card is multiplied by `boost`, so that it spawns far more often.
+        Each population is then weighted by its likelihood ratio, i.e., the
+        product over all of its draws of the probability of the drawn card
+        under the actual weights over its probability under the proposal,
+        which makes the estimates unbiased. This needs a fraction of the
+        iterations of `collect_statistics` for the same precision.
+
+        Parameters
+        ----------
+        target : str
+            The internal name of the interactable.
+        stages_cleared : int, default -1
+            The number of stages cleared. Any negative value will use the
+            default stage value for the scene.
+        iterations : int, optional
+            The number of times the scene interactables will be generated.
+        boost : float, optional
+            The factor for the weight of the target card in the proposal. By
+            default it's chosen so that about one target card is drawn in each
+            population.
+        print_result : bool, optional
+            Whether to print or return the result.
+        seed : int, optional
+            The seed of the random number generator. By default fresh entropy
+            is used.
+
+        Returns
+        -------
+        None or dict
+            If the `print_result` argument is set to False, the estimated
+            'mean' number of spawns and the probability to spawn at least
+            'once' with their standard errors 'mean_se' and 'once_se', along
+            with the 'iterations', the 'boost', and the 'effective_sample_size'
+            of the likelihood ratio weights.
+
+        Raises
+        ------
+        ValueError
+            If the target is not one of the interactables or the boost is not
+            positive.
+        """
+        if stages_cleared < 0:
+            stages_cleared = self._scene_data.stage_order
+        rng = np.random.default_rng(seed)
+        interactable_credit, interactables, deck, item_num = self._start(stages_cleared, rng)
+        cards = [card for category in interactables.categories for card in category.cards
+                 if card._name == target]
+        if not cards:
+            raise ValueError(f'Unknown interactable: {target}.')
+        is_target = np.array([name == target for name in deck.names], dtype=bool)
+        if boost is None:
+            boost = self._get_default_boost(interactable_credit, deck, is_target)
+        elif boost <= 0:
+            raise ValueError('The boost must be positive.')
+        proposal = np.where(is_target, deck.weights * boost, deck.weights)
+        columns = [card.index for card in cards]
+
+        sums = np.zeros(2)
+        sums_sq = np.zeros(2)
+        likelihood_sum = 0.
+        likelihood_sum_sq = 0.
+        item_counter = np.zeros((min(BATCH_SIZE, iterations), item_num), dtype=np.int32)
+        for i in range(0, iterations, BATCH_SIZE):
+            block = item_counter[:min(BATCH_SIZE, iterations - i)]
+            block.fill(0)
+            log_likelihood = np.zeros(block.shape[0])
+            self._populate_batch(
+                interactable_credit, deck, block, rng, proposal=proposal, log_likelihood=log_likelihood
+            )
+            likelihood = np.exp(log_likelihood)
+            count = block[:, columns].sum(axis=1)
+            weighted = np.stack([likelihood * count, likelihood * (count > 0)])
+            sums += weighted.sum(axis=1)
+            sums_sq += (weighted * weighted).sum(axis=1)
+            likelihood_sum += likelihood.sum()
+            likelihood_sum_sq += (likelihood * likelihood).sum()
+
+        n = max(iterations, 1)
+        (mean, once) = sums / n
+        (mean_se, once_se) = np.sqrt(np.maximum(sums_sq / n - (sums / n)**2, 0) / n)
+        effective_sample_size = likelihood_sum**2 / likelihood_sum_sq if likelihood_sum_sq else 0.
+        if print_result:
+            print(
+                f'{cards[0].name} spawned {mean:.5f} times (SE = {mean_se:.5f}) on average. At least once {once*100:.3f}% (SE = {once_se*100:.3f}%) of the time.'
+            )
+            print(f'Boost of {boost:.3g} with an effective sample size of {effective_sample_size:.0f} out of {iterations}.')
+            return
+        return {
+            'mean': mean,
+            'mean_se': mean_se,
+            'once': once,
+            'once_se': once_se,
+            'iterations': iterations,
+            'boost': boost,
+            'effective_sample_size': effective_sample_size,
+        }
+
+    def _get_default_boost(self, interactable_credit, deck, is_target):
+        """
+        Choose a proposal boost that draws about one target card per population.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the scene.
+        deck : CompiledDeck
+            The available spawn cards.
+        is_target : array
+            Whether each card of the deck is the target.
+
+        Returns
+        -------
+        float
+            The boost, which is never less than 1.
+        """
+        affordable = deck.costs <= interactable_credit
+        total = deck.weights[affordable].sum()
+        target_weight = deck.weights[affordable & is_target].sum()
+        if not target_weight or not total:
+            return 1.
+        # The expected number of draws at the average cost of a draw
+        draws = interactable_credit * total / (deck.weights[affordable] * deck.costs[affordable]).sum()
+        if draws <= 1:
+            return 1.
+        return max((total - target_weight) / (target_weight * (draws - 1)), 1.)
+
+    def record_trace(self, stages_cleared=-1, iterations=10000, seed=None):
+        """
+        Populate the scene many times and keep every card draw for reweighting.
+
+        Parameters
+        ----------
+        stages_cleared : int, default -1
+            The number of stages cleared. Any negative value will use the
+            default stage value for the scene.
+        iterations : int, optional
+            The number of times the scene interactables will be generated.
+        seed : int, optional
+            The seed of the random number generator. By default fresh entropy
+            is used.
+
+        Returns
+        -------
+        DrawTrace
+            The spawn counts and the draws of all the populations, which can be
+            passed to `reweight_statistics`.
+
+        Notes
+        -----
+        All the populations share the same blend outcome, which is selected
+        once as with `populate_scene`.
+        """
+        if stages_cleared < 0:
+            stages_cleared = self._scene_data.stage_order
+        rng = np.random.default_rng(seed)
+        interactable_credit, interactables, deck, item_num = self._start(stages_cleared, rng)
         item_counter = np.zeros((iterations, item_num), dtype=np.int32)
-        for i in range(iterations):
-            self._populate_scene(interactable_credit, deck, item_counter[i])
-        return self._process_statistics(interactables, item_counter, print_result)
+        rows = []
+        choices = []
+        eligible = []
+        for i in range(0, iterations, BATCH_SIZE):
+            trace = []
+            self._populate_batch(interactable_credit, deck, item_counter[i:i+BATCH_SIZE], rng, trace=trace)
+            for active, choice, available in trace:
+                rows.append((active + i).astype(np.int32))
+                choices.append(choice.astype(np.int16))
+                eligible.append(np.packbits(available, axis=1))
+        width = (len(deck) + 7) // 8
+        return DrawTrace(
+            interactables,
+            deck,
+            item_counter,
+            np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32),
+            np.concatenate(choices) if choices else np.zeros(0, dtype=np.int16),
+            np.concatenate(eligible) if eligible else np.zeros((0, width), dtype=np.uint8),
+            self.is_sacrifice_enabled,
+        )
+
+    def reweight_statistics(self, trace, card_weights=None, category_weights=None, print_result=True):
+        """
+        Estimate the spawn statistics under different weights from a trace.
+
+        Instead of populating the scene again, each population of the trace is
+        weighted by its likelihood ratio, i.e., the product over all of its
+        draws of the probability of the drawn card among the cards that could
+        be drawn under the new weights over the same under the old weights.
+        The statistics are then the self-normalised weighted averages.
+
+        Parameters
+        ----------
+        trace : DrawTrace
+            The draws of a baseline run from `record_trace`.
+        card_weights : dict, optional
+            The new selection weight of any card, by internal name, before it's
+            normalised by the total weight of its category.
+        category_weights : dict, optional
+            The new selection weight of any category, by name.
+        print_result : bool, optional
+            Whether to print or return the result.
+
+        Returns
+        -------
+        out : None or list
+            If the `print_result` argument is set to False, a list with info
+            about each interactable in tuples. This is the name of the
+            interactable, the mean value, its standard deviation, and the
+            probability the item will spawn at least once.
+        effective_sample_size : float
+            The number of independent populations the weighted ones are worth.
+            This is only returned along with `out`.
+
+        Raises
+        ------
+        ValueError
+            If a card or category is not in the trace, or a card that could
+            never be drawn in the trace is given a positive weight.
+
+        Notes
+        -----
+        The estimates are only reliable as long as the effective sample size
+        is a sizeable fraction of the populations, i.e., for weights close to
+        the baseline. A population that can only continue with cards whose
+        weight becomes zero has no counterpart in the trace, so removing cards
+        entirely can bias the result.
+        """
+        weights = trace.get_weights(card_weights, category_weights)
+        if np.any((weights > 0) & (trace.deck.weights <= 0)):
+            raise ValueError('Cards with no weight in the trace cannot be given a positive weight.')
+        log_ratio = trace._log_likelihood(weights) - trace.log_likelihood
+        if np.isfinite(log_ratio).any():
+            likelihood = np.exp(log_ratio - log_ratio[np.isfinite(log_ratio)].max())
+        else:
+            likelihood = np.zeros(trace.iterations)
+        likelihood_sum = likelihood.sum()
+        effective_sample_size = likelihood_sum**2 / (likelihood * likelihood).sum() if likelihood_sum else 0.
+        p = likelihood / likelihood_sum if likelihood_sum else likelihood
+        counts = trace.item_counter
+        mean = p @ counts
+        std = np.sqrt(np.maximum(p @ (counts * counts.astype(np.float64)) - mean**2, 0))
+        once = p @ (counts > 0)
+        out = self._report_statistics(trace.interactables, mean, std, once, print_result)
+        if print_result:
+            print(f'\nEffective sample size of {effective_sample_size:.0f} out of {trace.iterations}.')
+            return
+        return out, effective_sample_size
+
+    def _apply_config(self, config):
+        """
+        Change the director settings.
+
+        Parameters
+        ----------
+        config : dict
+            The new values of any of the `num_players`, `is_command_enabled`,
+            `is_sacrifice_enabled`, `is_bonus_credits_available`,
+            `is_log_available` attributes, and of the set of `expansions`. A
+            `stages_cleared` key is ignored.
+
+        Returns
+        -------
+        previous : dict
+            The previous values of the changed settings, which restore them
+            when applied.
+
+        Raises
+        ------
+        ValueError
+            If any of the settings is unknown.
+        """
+        previous = {}
+        for key, value in config.items():
+            if key == 'stages_cleared':
+                continue
+            if key == 'expansions':
+                previous[key] = self._expansions
+                self.set_enabled_expansions(value)
+            elif key in COMPARABLE_SETTINGS:
+                previous[key] = getattr(self, key)
+                setattr(self, key, value)
+            else:
+                self._apply_config(previous)
+                raise ValueError(f'Unknown setting: {key}.')
+        return previous
+
+    def compare_statistics(self, configs, stages_cleared=-1, iterations=10000, print_result=True,
+                           seed=None):
+        """
+        Compare the interactable spawn statistics of several configurations.
+
+        All configurations are driven by the same random numbers, i.e., each
+        iteration uses the same variate for the blend outcome and for every
+        card draw in all of them. Their spawn counts are therefore strongly
+        correlated, so the differences are estimated with much less noise than
+        from independent samples of the same size.
+
+        Parameters
+        ----------
+        configs : list
+            A dictionary of settings for each configuration, as accepted by
+            `_apply_config`, which can also set `stages_cleared`. Any setting
+            that isn't given keeps the current value of the director. The first
+            one is the baseline to compare the rest against.
+        stages_cleared : int, default -1
+            The number of stages cleared for any configuration that doesn't set
+            its own. Any negative value will use the default stage value for
+            the scene.
+        iterations : int, optional
+            The number of times each configuration will be generated.
+        print_result : bool, optional
+            Whether to print or return the result.
+        seed : int, optional
+            The seed of the shared random streams. By default fresh entropy is
+            used.
+
+        Returns
+        -------
+        None or list
+            If the `print_result` argument is set to False, a list for each
+            configuration after the baseline, with a tuple for each
+            interactable of any configuration. This is the name of the
+            interactable, the mean difference of its spawn count from the
+            baseline and the standard error of that, and the difference of the
+            probability it will spawn at least once and its standard error.
+
+        Raises
+        ------
+        ValueError
+            If any of the settings is unknown.
+        """
+        if stages_cleared < 0:
+            stages_cleared = self._scene_data.stage_order
+        columns = {}
+        prepared = []
+        for config in configs:
+            previous = self._apply_config(config)
+            try:
+                interactable_credit = self._get_interactable_credit()
+                outcomes, probabilities = self._get_blend_outcomes(
+                    config.get('stages_cleared', stages_cleared)
+                )
+            finally:
+                self._apply_config(previous)
+            # Match the interactables of every outcome by name, numbering any
+            # repeats of a card, so all configurations share their columns.
+            column_maps = []
+            for interactables, _, item_num in outcomes:
+                column_map = np.zeros(item_num, dtype=np.intp)
+                seen = {}
+                for category in interactables.categories:
+                    for card in category.cards:
+                        seen[card._name] = seen.get(card._name, 0) + 1
+                        key = (card._name, seen[card._name])
+                        column_map[card.index] = columns.setdefault(key, len(columns))
+                column_maps.append(column_map)
+            prepared.append((interactable_credit, outcomes, np.cumsum(probabilities), column_maps))
+        names = [name if occurrence == 1 else f'{name}#{occurrence}' for name, occurrence in columns]
+
+        shape = (len(configs), len(columns))
+        diff_sums = np.zeros(shape, dtype=np.int64)
+        diff_sums_sq = np.zeros(shape, dtype=np.int64)
+        once_diff_sums = np.zeros(shape, dtype=np.int64)
+        once_diff_sums_sq = np.zeros(shape, dtype=np.int64)
+        blocks = -(-iterations // BATCH_SIZE)
+        for i, block_sequence in enumerate(np.random.SeedSequence(seed).spawn(blocks)):
+            size = min(BATCH_SIZE, iterations - i * BATCH_SIZE)
+            blend_sequence, draw_sequence = block_sequence.spawn(2)
+            blend_uniforms = np.random.default_rng(blend_sequence).random(size)
+            counts = np.zeros((len(configs), size, len(columns)), dtype=np.int64)
+            for j, (interactable_credit, outcomes, cumulative, column_maps) in enumerate(prepared):
+                choice = np.searchsorted(cumulative, blend_uniforms * cumulative[-1], side='right')
+                np.minimum(choice, len(outcomes) - 1, out=choice)
+                for k, ((_, deck, item_num), column_map) in enumerate(zip(outcomes, column_maps)):
+                    rows = np.flatnonzero(choice == k)
+                    if not rows.size:
+                        continue
+                    item_counter = np.zeros((rows.size, item_num), dtype=np.int32)
+                    stream = np.random.default_rng(draw_sequence)
+                    self._populate_batch(
+                        interactable_credit, deck, item_counter, stream,
+                        uniforms=_coupled_uniforms(stream, size, rows),
+                    )
+                    counts[j, rows[:, None], column_map] = item_counter
+            diff = counts - counts[0]
+            once_diff = (counts > 0).astype(np.int64) - (counts[0] > 0)
+            diff_sums += diff.sum(axis=1)
+            diff_sums_sq += (diff * diff).sum(axis=1)
+            once_diff_sums += once_diff.sum(axis=1)
+            once_diff_sums_sq += (once_diff * once_diff).sum(axis=1)
+
+        n = max(iterations, 1)
+        mean_diff = diff_sums / n
+        mean_diff_se = np.sqrt(np.maximum(diff_sums_sq / n - mean_diff**2, 0) / n)
+        once_diff = once_diff_sums / n
+        once_diff_se = np.sqrt(np.maximum(once_diff_sums_sq / n - once_diff**2, 0) / n)
+        if print_result:
+            result = []
+            for j, config in enumerate(configs[1:], 1):
+                string = [f'---{config}---']
+                for c, name in enumerate(names):
+                    if mean_diff[j, c] or once_diff[j, c]:
+                        string.append(
+                            f'{name}: {mean_diff[j, c]:+.3f} (SE = {mean_diff_se[j, c]:.3f}) times on average. At least once {once_diff[j, c]*100:+.1f}% (SE = {once_diff_se[j, c]*100:.1f}%).'
+                        )
+                result.append('\n'.join(string))
+            print(f'Compared to {configs[0]}:\n\n' + '\n\n'.join(result))
+            return
+        return [
+            [(name, mean_diff[j, c], mean_diff_se[j, c], once_diff[j, c], once_diff_se[j, c])
+             for c, name in enumerate(names)]
+            for j in range(1, len(configs))
+        ]
 
     def change_scene(self, scene_name):
         """
@@ -491,6 +2419,8 @@ class CampDirector(BaseSceneDirector):
         self._data = voidseed[camp_type]
         self.is_sacrifice_enabled = is_sacrifice_enabled
         self._expansions = expansions.union({Expansion.SOTV})
+        # The distribution of populations for each camp configuration
+        self._population_tables = {}
 
     def _start(self):
         """
@@ -502,16 +2432,21 @@ class CampDirector(BaseSceneDirector):
             The interactable credits for the void seed.
         interactables : DirectorCardCategorySelection
             The DCCS with the interactable categories and their items.
-        deck : list
-            List of the filtered weighted spawn cards.
+        deck : CompiledDeck
+            The filtered weighted spawn cards.
         item_num : int
             The total number of interactables in `interactables`.
         """
         interactable_credit = self._data.interactable_credits
         interactables = self._generate_interactable_card_selection()
+        instrumentation = self.instrumentation
+        if instrumentation:
+            start = time.perf_counter()
         deck = interactables.generate_card_weighted_selection(
-            0, self._expansions, self.is_sacrifice_enabled
+            0, self._expansions, self.is_sacrifice_enabled, compiled=True
         )
+        if instrumentation:
+            instrumentation.record_time('deck build', time.perf_counter() - start)
         item_num = sum(len(category.cards) for category in interactables.categories)
         return interactable_credit, interactables, deck, item_num
 
@@ -550,8 +2485,8 @@ class CampDirector(BaseSceneDirector):
         ----------
         interactable_credit : int
             The available credits for the scene.
-        deck : list
-            List of the available spawn cards.
+        deck : CompiledDeck
+            The available spawn cards.
         item_counter : list_like
             An initialised list with zeroes, which will be incremented to count
             any items spawned according to their index in the list. This is a
@@ -565,19 +2500,106 @@ class CampDirector(BaseSceneDirector):
         -----
         A partial implementation of `RoR2.CampDirector.PopulateCamp()`.
         """
+        tree = deck.new_tree()
+        # Plain lists are much faster than NumPy arrays for single elements
+        costs = deck.costs.tolist()
+        skips = deck.skips.tolist()
+        indices = deck.indices.tolist()
         while interactable_credit > 0:
-            card = self._select_card(deck, interactable_credit)
-            if not card:
+            index = self._select_card(deck, tree, interactable_credit)
+            if index < 0:
                 break
-            interactable_credit -= card.cost
+            interactable_credit -= costs[index]
             # In the game's source code after paying for the card, it attempts
             # to spawn it, but this can still fail for a few reasons. We're
             # implementing the skip for the Artifact of Sacrifice here.
-            if not self.is_sacrifice_enabled or not card.skip_with_sacrifice:
+            if not skips[index]:
                 # Incrementing a counter for each spawned item's index is a
                 # design choice isntead of storing the literal items in a
                 # list, since this allows efficient statistical computations.
-                item_counter[card.index] += 1
+                item_counter[indices[index]] += 1
+
+    def _solve_populations(self, interactable_credit, deck, item_num):
+        """
+        Enumerate every possible void seed population with its probability.
+
+        As the void seed has no spawn limits, the distribution of what spawns
+        only depends on the remaining credits, so it is built up with dynamic
+        programming from zero credits upwards.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the void seed.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_num : int
+            The total number of interactables.
+
+        Returns
+        -------
+        dict
+            The exact probability of each population, keyed by a tuple of the
+            spawn count of every interactable.
+
+        Raises
+        ------
+        ValueError
+            If a free card can be selected, as the population would never end.
+        """
+        if np.any((deck.costs <= 0) & (deck.weights > 0)):
+            raise ValueError('A free card without a spawn limit can be selected forever.')
+        costs = deck.costs.tolist()
+        weights = deck.weights.tolist()
+        skips = deck.skips.tolist()
+        indices = deck.indices.tolist()
+        empty = (0,) * item_num
+        distributions = {}
+        for credit in range(interactable_credit + 1):
+            count = bisect.bisect_right(costs, credit) if credit > 0 else 0
+            total = sum(weights[:count])
+            if total <= 0:
+                distributions[credit] = {empty: 1.}
+                continue
+            distribution = {}
+            for i in range(count):
+                if weights[i] <= 0:
+                    continue
+                p = weights[i] / total
+                for counts, q in distributions[credit - costs[i]].items():
+                    if not skips[i]:
+                        counts = list(counts)
+                        counts[indices[i]] += 1
+                        counts = tuple(counts)
+                    distribution[counts] = distribution.get(counts, 0) + p * q
+            distributions[credit] = distribution
+        return distributions[interactable_credit]
+
+    def _get_population_table(self):
+        """
+        Get the distribution of populations for the current configuration.
+
+        The table is built on first use and cached for the sacrifice setting
+        and the expansions, which are all the camp population depends on.
+
+        Returns
+        -------
+        interactables : DirectorCardCategorySelection
+            The DCCS with the interactable categories and their items.
+        populations : list
+            The spawn counts of every interactable for each population.
+        threshold, alias : list
+            The alias table of the population probabilities.
+        """
+        key = (self.is_sacrifice_enabled, frozenset(self._expansions))
+        if key not in self._population_tables:
+            interactable_credit, interactables, deck, item_num = self._start()
+            distribution = self._solve_populations(interactable_credit, deck, item_num)
+            populations = list(distribution)
+            total = sum(distribution.values())
+            threshold, alias = build_alias_table([distribution[c] / total for c in populations])
+            self._population_tables[key] = (interactables, populations, threshold, alias)
+        return self._population_tables[key]
 
     def populate_camp(self, print_result=True):
         """
@@ -593,13 +2615,71 @@ class CampDirector(BaseSceneDirector):
         None or list
             If the `print_result` argument is set to False, the list of the
             generated interactables will be returned.
+
+        Notes
+        -----
+        The exact distribution of all possible populations is computed once,
+        after which each population is a single draw from an alias table.
+        """
+        if self.instrumentation:
+            return self._populate_camp_instrumented(print_result)
+        interactables, populations, threshold, alias = self._get_population_table()
+        index = int(random.random() * len(populations))
+        if random.random() >= threshold[index]:
+            index = alias[index]
+        return self._process_generated_interactables(interactables, populations[index], print_result)
+
+    def _populate_camp_instrumented(self, print_result):
+        """
+        Populate the void seed while recording what happens.
+
+        This runs the population loop instead of drawing from the table of
+        populations, so that the time and credits of each step are recorded.
         """
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
         interactable_credit, interactables, deck, item_num = self._start()
+        instrumentation.record_time('_start', time.perf_counter() - start)
+        start = time.perf_counter()
         item_counter = [0] * item_num
-        self._populate_camp(interactable_credit, deck, item_counter)
+        # The void seed doesn't track any spawn limits
+        self._populate_instrumented(interactable_credit, interactables, deck, item_counter,
+                                    respect_limits=False)
+        instrumentation.record_time('population', time.perf_counter() - start)
         return self._process_generated_interactables(interactables, item_counter, print_result)
 
-    def collect_statistics(self, iterations=10000, print_result=True):
+    def _populate_block(self, interactable_credit, deck, item_counter, rng, vectorized=True):
+        """
+        Populate the void seed once for each row of a block of counters.
+
+        Parameters
+        ----------
+        interactable_credit : int
+            The available credits for the void seed.
+        deck : CompiledDeck
+            The available spawn cards.
+        item_counter : array
+            An initialised 2D array with zeroes of shape (populations, items).
+            This is a mutable operation.
+        rng : numpy.random.Generator
+            The random number generator for the vectorised engine.
+        vectorized : bool, optional
+            Whether to use the vectorised engine or populate one at a time.
+
+        Returns
+        -------
+        None
+        """
+        if vectorized:
+            # The void seed doesn't track any spawn limits
+            self._populate_batch(interactable_credit, deck, item_counter, rng, respect_limits=False)
+        else:
+            for counter in item_counter:
+                self._populate_camp(interactable_credit, deck, counter)
+
+    def collect_statistics(self, iterations=10000, print_result=True, vectorized=True,
+                           workers=1, seed=None, target_rel_error=None, max_iterations=None,
+                           targets=None, distributions=False):
         """
         Gather interactable spawn statistics.
 
@@ -609,16 +2689,69 @@ class CampDirector(BaseSceneDirector):
             The number of times the interactables will be generated.
         print_result: bool, optional
             Whether to print or return the result.
+        vectorized : bool, optional
+            Whether to advance all iterations together with NumPy arrays, which
+            is much faster for a large number of iterations. Otherwise, each
+            void seed is populated one at a time.
+        workers : int, optional
+            The number of processes to split the iterations over. On platforms
+            that spawn new processes, e.g., Windows, the calling script must be
+            guarded by `if __name__ == '__main__'`.
+        seed : int, optional
+            The master seed, from which every worker derives its own independent
+            seed stream. The result is reproducible for the same seed and number
+            of workers. By default fresh entropy is used.
+        target_rel_error : float, optional
+            If set, keep sampling in blocks of `iterations` until the 95%
+            confidence interval of the mean and of the probability to spawn at
+            least once of every tracked interactable is within this fraction of
+            its estimate. By default exactly `iterations` are sampled.
+        max_iterations : int, optional
+            The maximum number of iterations when sampling until the target
+            precision. By default there is no limit.
+        targets : iterable, optional
+            The internal names of the interactables whose precision decides
+            when to stop. By default all interactables that can spawn are
+            tracked.
+        distributions : bool, optional
+            Whether to also count the full distribution of spawn counts of each
+            interactable and how often each pair of interactables spawn
+            together. These are accumulated block by block, so the memory used
+            doesn't depend on the number of iterations.
 
         Returns
         -------
-        None, list
+        None, list, tuple
             If the `print_result` argument is set to False, the generated
             interactables will be returned as a list of tuple info for each
-            interactable.
+            interactable. If `target_rel_error` is also set, a dictionary is
+            returned along with it, with the number of 'iterations', whether the
+            target was 'converged', and the achieved relative errors
+            'mean_error' and 'once_error' for each interactable in the same
+            order. If `distributions` is set, a dictionary with the
+            'iterations', the 'histograms' of the spawn counts of each
+            interactable in the same order, and the sparse 'pairs' table of
+            joint counts is returned last. Use `joint_counts` for the full
+            joint table of two interactables.
+
+        Raises
+        ------
+        ValueError
+            If any of the `targets` is not one of the interactables.
         """
+        seed_sequence = np.random.SeedSequence(seed)
+        rng = np.random.default_rng(seed_sequence)
         interactable_credit, interactables, deck, item_num = self._start()
-        item_counter = np.zeros((iterations, item_num), dtype=np.int32)
-        for i in range(iterations):
-            self._populate_camp(interactable_credit, deck, item_counter[i])
-        return self._process_statistics(interactables, item_counter, print_result)
+        # See `SceneDirector.collect_statistics`
+        state = random.getstate()
+        try:
+            if seed is not None:
+                random.seed(int(seed_sequence.generate_state(1)[0]))
+            return self._collect_statistics(
+                interactable_credit, interactables, deck, item_num, iterations, print_result,
+                vectorized, workers, seed_sequence, rng, target_rel_error, max_iterations, targets,
+                distributions,
+            )
+        finally:
+            if seed is not None:
+                random.setstate(state)
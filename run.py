@@ -1,10 +1,17 @@
-from collections import Counter, defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import itertools
 import random
 
+import numpy as np
+
 from constants import SceneName, Portal, Expansion, ALL_EXPANSIONS
 from data_loader import ItemTiers, Items, Equipment, isc, droptables, scenes
 from data.objects import EquipmentDef, ItemDef
+from data.objects.droptables import DropSampler, _filter_tier_items
 from data.objects.interactables import *
+from data.objects.interactables import _TRIPLE_SHOP_HIDDEN_CHANCE
 from directors import SceneDirector, CampDirector
 
 
@@ -19,10 +26,59 @@ TRADE_REGEN_SCRAP = True
 USE_GOLD_PORTAL = False
 USE_ARTIFACT_PORTAL = False
 
+_ITEM_IDS = {item._name: item.index for item in Items._items}
+# The column of each item in the item tiers of `LootReport.consolidate_data`,
+# or -1 for untiered items
+_ITEM_TIER_COLUMNS = np.array([{
+    ItemTiers.Tier1: 0,
+    ItemTiers.Tier2: 1,
+    ItemTiers.Tier3: 2,
+    ItemTiers.BossTier: 3,
+    ItemTiers.LunarTier: 5,
+    ItemTiers.VoidTier1: 8,
+    ItemTiers.VoidTier2: 9,
+    ItemTiers.VoidTier3: 10,
+    ItemTiers.VoidBoss: 11,
+}.get(item.tier, -1) for item in Items._items], dtype=np.int64)
+# The items counted at the end of each stage by `LootReport`
+_STAGE_END_ITEM_IDS = np.array([item.index for item in (
+    Items.TreasureCache, Items.TreasureCacheVoid, Items.FreeChest, Items.RegeneratingScrap
+)])
+
 
 class LootReport:
-    """Logger for stats about spawned interactables and loot during a run."""
-    def __init__(self, tier_droplists, inventory):
+    """
+    Logger for stats about spawned interactables and loot during a run.
+
+    The consolidated stats are updated at the end of each stage, so that
+    `consolidate_data` doesn't depend on the number of stages. The interactables,
+    loot, etc. of each stage are also kept, unless the logger is lite.
+    """
+    _TERMINALS = ('iscTripleShop', 'iscTripleShopLarge', 'iscTripleShopEquipment', 'iscFreeChest')
+    _AT_LEAST_ONCE = (
+        ('iscScrapper', 'scrapper'),
+        ('iscShrineCleanse', 'cleansing_pool'),
+        ('iscVoidCamp', 'void_seed'),
+    )
+    _TOTAL = (
+        ('iscShrineBoss', 'mountain_shrine'),
+        ('iscChest1Stealthed', 'cloaked_chect'),
+        ('iscLockbox', 'rusted_lockbox'),
+        ('iscLockboxVoid', 'encrusted_lockbox'),
+        ('iscCasinoChest', 'adaptive_chest'),
+        ('iscVoidCamp', 'void_seed'),
+        ('iscVoidChest', 'void_cradle'),
+    )
+
+    # The attributes that change during a run
+    _STATE = (
+        'scenes', 'portals', 'dccs', 'interactables', 'loot', 'item_count', 'free_chest_items',
+        'card_multibuys', 'delusion_loot', 'last_portals', '_isc_counter', '_equipment_counter',
+        '_portal_count', '_free_chest_item_tiers', '_at_least_once', '_family_events', '_drones',
+        '_card_stage', '_card_multishops', '_delusion_bonus',
+    )
+
+    def __init__(self, tier_droplists, inventory, lite=False):
         """
         Create a loot logger.
         
@@ -32,6 +88,10 @@ class LootReport:
             A list of all the items available for each tier.
         inventory : Inventory
             The unified inventory of the survivors for the run.
+        lite : bool, optional
+            If True, only the consolidated stats are kept, without the lists of
+            the DCCS, interactables, loot, etc. of each stage. This is for bulk
+            simulations.
 
         Returns
         -------
@@ -39,6 +99,7 @@ class LootReport:
         """
         self._tier_droplists = tier_droplists
         self._inventory = inventory
+        self.lite = lite
         self.scenes = []
         self.portals = []
         self.dccs = []
@@ -48,6 +109,17 @@ class LootReport:
         self.free_chest_items = []
         self.card_multibuys = []
         self.delusion_loot = []
+        self.last_portals = set()
+        self._isc_counter = Counter()
+        self._equipment_counter = Counter()
+        self._portal_count = [0, 0, 0]
+        self._free_chest_item_tiers = [0, 0, 0]
+        self._at_least_once = [0] * len(self._AT_LEAST_ONCE)
+        self._family_events = 0
+        self._drones = 0
+        self._card_stage = -1
+        self._card_multishops = [0] * len(self._TERMINALS)
+        self._delusion_bonus = []
 
     def reset_data(self):
         """Reset the logger data."""
@@ -60,6 +132,45 @@ class LootReport:
         self.free_chest_items.clear()
         self.card_multibuys.clear()
         self.delusion_loot.clear()
+        self.last_portals = set()
+        self._isc_counter.clear()
+        self._equipment_counter.clear()
+        self._portal_count = [0, 0, 0]
+        self._free_chest_item_tiers = [0, 0, 0]
+        self._at_least_once = [0] * len(self._AT_LEAST_ONCE)
+        self._family_events = 0
+        self._drones = 0
+        self._card_stage = -1
+        self._card_multishops = [0] * len(self._TERMINALS)
+        self._delusion_bonus.clear()
+
+    def snapshot(self):
+        """
+        Copy the logger data so far.
+
+        The data of each stage is shared, since it isn't modified once logged.
+
+        Returns
+        -------
+        dict
+        """
+        return {name: copy.copy(getattr(self, name)) for name in self._STATE}
+
+    def restore(self, snapshot):
+        """
+        Set the logger data to a snapshot, which is not modified.
+
+        Parameters
+        ----------
+        snapshot : dict
+            The result of `snapshot`.
+
+        Returns
+        -------
+        None
+        """
+        for name in self._STATE:
+            setattr(self, name, copy.copy(snapshot[name]))
 
     def update_data(self, scene_name, spawned_portals, dccs, interactables,
                     loot, free_chest_items, card_multibuys, delusion_loot):
@@ -96,19 +207,44 @@ class LootReport:
         -------
         None
         """
+        stage = len(self.scenes)
         self.scenes.append(scene_name)
-        self.portals.append(spawned_portals)
-        self.dccs.append(dccs.name)
-        self.interactables.append(interactables)
-        self.loot.append(loot)
-        item_count = [self._inventory.count(item) for item in
-            (Items.TreasureCache, Items.TreasureCacheVoid, Items.FreeChest, Items.RegeneratingScrap)
-        ]
+        self.last_portals = spawned_portals
+        item_count = self._inventory.counts[_STAGE_END_ITEM_IDS].tolist()
         item_count.append(item_count[-1] * ('iscDuplicatorLarge' in interactables))
         self.item_count.append(item_count)
-        self.free_chest_items.append(free_chest_items)
-        self.card_multibuys.append(card_multibuys)
-        self.delusion_loot.append(delusion_loot)
+        if not self.lite:
+            self.portals.append(spawned_portals)
+            self.dccs.append(dccs.name)
+            self.interactables.append(interactables)
+            self.loot.append(loot)
+            self.free_chest_items.append(free_chest_items)
+            self.card_multibuys.append(card_multibuys)
+            self.delusion_loot.append(delusion_loot)
+
+        for i, portal in enumerate((Portal.B, Portal.G, Portal.V)):
+            self._portal_count[i] += portal in spawned_portals
+        self._isc_counter.update(interactables)
+        for i, (isc_name, _) in enumerate(self._AT_LEAST_ONCE):
+            self._at_least_once[i] += isc_name in interactables
+        self._drones += sum('Drone' in isc_name for isc_name in interactables)
+        self._family_events += bool(dccs.name and 'Family' in dccs.name)
+        equipment = loot[EquipmentDef]
+        self._equipment_counter.update(equipment)
+        if self._card_stage == -1 and Equipment.MultiShopCard in equipment:
+            # This isn't necessary the number of cleared stages if Hidden
+            # Realms have been visited. Use the result from `out['scenes']`
+            # to deduce that.
+            self._card_stage = stage
+        for item in free_chest_items:
+            self._free_chest_item_tiers[item.tier._tier] += 1
+        for i, terminal in enumerate(self._TERMINALS):
+            self._card_multishops[i] += card_multibuys.count(terminal)
+        delusion_bonus = [0, 0, 0]
+        for item in delusion_loot:
+            if item.tier._tier < 3:
+                delusion_bonus[item.tier._tier] += 1
+        self._delusion_bonus.append(delusion_bonus)
 
     def consolidate_data(self):
         """
@@ -148,34 +284,19 @@ class LootReport:
                 artifact. For each stage it is a list of 3 values, one for each
                 tier.
         """
+        isc_counter = Counter(self._isc_counter)
+        equipment_counter = Counter(self._equipment_counter)
         out = {
-            'scenes': self.scenes,
-            'portals': [sum(portal in stage_portals for stage_portals in self.portals)
-                        for portal in (Portal.B, Portal.G, Portal.V)],
+            'scenes': list(self.scenes),
+            'portals': list(self._portal_count),
+            'interactables': isc_counter,
         }
-        isc_counter = Counter()
-        for interactables in self.interactables:
-            isc_counter.update(interactables)
-        out['interactables'] = isc_counter
-        out['items'] = dict(self._inventory.items)
-        equipment_counter = Counter()
-        for loot in self.loot:
-            equipment_counter.update(loot[EquipmentDef])
+        items = self._inventory.items
+        out['items'] = items
         out['equipment'] = equipment_counter
-        item_tiers = [0] * len(self._tier_droplists)
-        tier_lookup = {
-            ItemTiers.Tier1: 0,
-            ItemTiers.Tier2: 1,
-            ItemTiers.Tier3: 2,
-            ItemTiers.BossTier: 3,
-            ItemTiers.LunarTier: 5,
-            ItemTiers.VoidTier1: 8,
-            ItemTiers.VoidTier2: 9,
-            ItemTiers.VoidTier3: 10,
-            ItemTiers.VoidBoss: 11,
-        }
-        for item, count in self._inventory.items.items():
-            item_tiers[tier_lookup[item.tier]] += count
+        is_tiered = _ITEM_TIER_COLUMNS >= 0
+        item_tiers = np.bincount(_ITEM_TIER_COLUMNS[is_tiered], weights=self._inventory.counts[is_tiered],
+                                 minlength=len(self._tier_droplists)).astype(int).tolist()
         for item, count in equipment_counter.items():
             if item.is_lunar:
                 item_tiers[4] += count
@@ -183,17 +304,8 @@ class LootReport:
                 item_tiers[7] += count
         item_tiers[6] = item_tiers[4] + item_tiers[5]
         out['tiers'] = item_tiers
-        free_chest_item_tiers = [item.tier._tier for stage_items in self.free_chest_items for item in stage_items]
-        free_chest_item_tiers = [free_chest_item_tiers.count(i) for i in range(3)]
-        out['free_chest_item_tiers'] = free_chest_item_tiers
-        at_least_once = {}
-        for isc_name, name in (
-            ('iscScrapper', 'scrapper'),
-            ('iscShrineCleanse', 'cleansing_pool'),
-            ('iscVoidCamp', 'void_seed'),
-        ):
-            at_least_once[name] = sum(any(isc_name in isc for isc in stage_isc) for stage_isc in self.interactables)
-        out['at_least_once'] = at_least_once
+        out['free_chest_item_tiers'] = list(self._free_chest_item_tiers)
+        out['at_least_once'] = {name: value for (_, name), value in zip(self._AT_LEAST_ONCE, self._at_least_once)}
         item_count = zip(*self.item_count)
         out['at_stage_end'] = {
             name: value
@@ -202,65 +314,44 @@ class LootReport:
                 item_count
             )
         }
-        total = {'family_event': sum(dccs and 'Family' in dccs for dccs in self.dccs)}
-        for isc_name, name in (
-            ('iscShrineBoss', 'mountain_shrine'),
-            ('iscChest1Stealthed', 'cloaked_chect'),
-            ('iscLockbox', 'rusted_lockbox'),
-            ('iscLockboxVoid', 'encrusted_lockbox'),
-            ('iscCasinoChest', 'adaptive_chest'),
-            ('iscVoidCamp', 'void_seed'),
-            ('iscVoidChest', 'void_cradle'),
-        ):
+        total = {'family_event': self._family_events}
+        for isc_name, name in self._TOTAL:
             total[name] = isc_counter.get(isc_name, 0)
         total['mountain_shrine'] += isc_counter.get('iscShrineBossSandy', 0)
         total['mountain_shrine'] += isc_counter.get('iscShrineBossSnowy', 0)
         total['void_cradle'] += isc_counter.get('iscVoidChestSacrificeOn', 0)
-        total['drones'] = sum(count for isc, count in isc_counter.items() if 'Drone' in isc)
+        total['drones'] = self._drones
         total['tricorn'] = equipment_counter.get(Equipment.BossHunter, 0)
         out['total'] = total
-        stage_card_found = -1
-        for stage, loot in enumerate(self.loot):
-            if Equipment.MultiShopCard in loot[EquipmentDef]:
-                # This isn't necessary the number of cleared stages if Hidden
-                # Realms have been visited. Use the result from `out['scenes']`
-                # to deduce that.
-                stage_card_found = stage
-                break
-        terminals = (
-            'iscTripleShop',
-            'iscTripleShopLarge',
-            'iscTripleShopEquipment',
-            'iscFreeChest',
-        )
-        multishops = []
-        for terminal in terminals:
-            multishops.append(isc_counter.get(terminal, 0))
-        card_multishops = [0, 0, 0, 0]
-        for card_multibuys in self.card_multibuys:
-            if card_multibuys:
-                for i, terminal in enumerate(terminals):
-                    card_multishops[i] += card_multibuys.count(terminal)
         out['card'] = {
-            'stage': stage_card_found,
-            'multishops': multishops,
-            'card_multishops': card_multishops,
+            'stage': self._card_stage,
+            'multishops': [isc_counter.get(terminal, 0) for terminal in self._TERMINALS],
+            'card_multishops': list(self._card_multishops),
         }
-        delusion = [Counter([item.tier._tier for item in loot]) for loot in self.delusion_loot]
-        out['delusion_bonus'] = [[d.get(i, 0) for i in range(3)] for d in delusion]
+        out['delusion_bonus'] = [list(bonus) for bonus in self._delusion_bonus]
         return out
 
 
 class Inventory:
-    """Storage for the items and equipments acquired during a run."""
+    """
+    Storage for the items and equipments acquired during a run.
+
+    The items are counted in a fixed-size array indexed by the dense id of
+    each item, i.e., `ItemDef.index`.
+    """
     def __init__(self):
         """Create an inventory."""
-        self.items = defaultdict(int)
+        self.counts = np.zeros(len(Items._items), dtype=np.int64)
         self.equipment = []
         self.has_recycler = False
         self.can_recycle = False
         self.has_card = False
-        
+
+    @property
+    def items(self):
+        """dict: The count of each item in the inventory."""
+        return {Items._items[i]: int(self.counts[i]) for i in np.flatnonzero(self.counts)}
+
     def give_item(self, item, count=1):
         """
         Grant an item to the player.
@@ -276,8 +367,27 @@ class Inventory:
         -------
         None
         """
-        self.items[item] += count
-        
+        self.counts[item.index] += count
+
+    def give_item_by_id(self, index, count=1):
+        """
+        Grant an item to the player.
+
+        This uses the dense id of the item.
+
+        Parameters
+        ----------
+        index : int
+            The id of the picked up item.
+        count : int, optional
+            The number of copies to grant.
+
+        Returns
+        -------
+        None
+        """
+        self.counts[index] += count
+
     def remove_item(self, item, count=1):
         """
         Take away an amount from an item.
@@ -294,10 +404,27 @@ class Inventory:
         -------
         None
         """
-        if isinstance(item, ItemDef) and item in self.items:
-            self.items[item] -= count
-            if self.items[item] <= 0:
-                del self.items[item]
+        if isinstance(item, ItemDef):
+            self.remove_item_by_id(item.index, count)
+
+    def remove_item_by_id(self, index, count=1):
+        """
+        Take away an amount from an item.
+
+        This uses the dense id of the item.
+
+        Parameters
+        ----------
+        index : int
+            The id of the item to remove.
+        count : int, optional
+            The number of copies to remove. The count will not go below zero.
+
+        Returns
+        -------
+        None
+        """
+        self.counts[index] = max(self.counts[index] - count, 0)
 
     def count(self, item):
         """
@@ -313,7 +440,25 @@ class Inventory:
         int
             The number of copies. If the item doesn't exist, it will be zero.
         """
-        return self.items.get(item, 0)
+        return int(self.counts[item.index])
+
+    def count_by_id(self, index):
+        """
+        Count how many copies of an item exist in the inventory.
+
+        This uses the dense id of the item.
+
+        Parameters
+        ----------
+        index : int
+            The id of the item.
+
+        Returns
+        -------
+        int
+            The number of copies. If the item doesn't exist, it will be zero.
+        """
+        return int(self.counts[index])
 
     def count_by_name(self, item_name):
         """
@@ -331,21 +476,89 @@ class Inventory:
         int
             The number of copies. If the item doesn't exist, it will be zero.
         """
-        item = getattr(Items, item_name)
-        return self.count(item)
+        return int(self.counts[_ITEM_IDS[item_name]])
+
+    def copy(self):
+        """
+        Create an independent snapshot of the inventory.
+
+        Returns
+        -------
+        Inventory
+        """
+        inventory = Inventory.__new__(Inventory)
+        inventory.counts = self.counts.copy()
+        inventory.equipment = self.equipment.copy()
+        inventory.has_recycler = self.has_recycler
+        inventory.can_recycle = self.can_recycle
+        inventory.has_card = self.has_card
+        return inventory
+
+    def restore(self, inventory):
+        """
+        Set the state to that of another inventory, e.g., a snapshot.
+
+        Parameters
+        ----------
+        inventory : Inventory
+            The inventory to copy, which is not modified.
+
+        Returns
+        -------
+        None
+        """
+        self.counts[:] = inventory.counts
+        self.equipment[:] = inventory.equipment
+        self.has_recycler = inventory.has_recycler
+        self.can_recycle = inventory.can_recycle
+        self.has_card = inventory.has_card
 
     def reset(self):
         """Reset the Inventory state."""
-        self.items.clear()
+        self.counts.fill(0)
         self.equipment.clear()
         self.has_card = False
         self.has_recycler = False
         self.can_recycle = False
 
 
+class RunSnapshot:
+    """
+    The state of a run between two stages, from which it can be resumed.
+
+    This is created with `Run.snapshot`. It doesn't change when the run
+    continues, so it can be resumed any number of times.
+    """
+    def __init__(self, run):
+        """
+        Take a snapshot of a run.
+
+        Parameters
+        ----------
+        run : Run
+            The run session.
+
+        Returns
+        -------
+        None
+        """
+        self.scene_name = run._scene_name
+        self.next_scene_name = run._next_scene_name
+        self.explicit_next_scene_name = run._explicit_next_scene_name
+        self.stages_cleared = run._stages_cleared
+        self.blue_portals_opened = run._blue_portals_opened
+        self.void_fields_visited = run._void_fields_visited
+        self.inventory = run._inventory.copy()
+        self.stats = run.stats.snapshot()
+
+    def __repr__(self):
+        return f'RunSnapshot({self.scene_name}, {self.stages_cleared} stages cleared)'
+
+
 class Run:
     """Simulates a run by full looting a number of stages."""
-    def __init__(self, num_players=1, expansions=ALL_EXPANSIONS, is_delusion_enabled=False):
+    def __init__(self, num_players=1, expansions=ALL_EXPANSIONS, is_delusion_enabled=False,
+                 lite_report=False):
         """
         Initialise the run session.
 
@@ -363,6 +576,10 @@ class Run:
             the Teleporter Event or Artifact Trial. Assumes that all
             such chests have been looted before the reset and that they
             are all then guessed correctly. Disabled by default.
+        lite_report : bool, optional
+            Whether the `LootReport` only keeps the consolidated stats, and not
+            the interactables, loot, etc. of each stage. This is for bulk
+            simulations.
 
         Returns
         -------
@@ -393,7 +610,9 @@ class Run:
         # implementation doesn't support the Encrusted Cache.
         self._inventory = Inventory()
         self._actions = self._generate_drop_actions()
-        self.stats = LootReport(self._tier_droplists, self._inventory)
+        self.stats = LootReport(self._tier_droplists, self._inventory, lite_report)
+        # The consolidated data at the end of each horizon of `loot_stages`
+        self.horizon_data = {}
         self._restart()
 
     def _restart(self):
@@ -449,8 +668,8 @@ class Run:
                 droptables[f'dtTier{tier}Item'], self._tier_droplists, 3
             )
         # Boss drops
-        actions['teleporter_drop'] = lambda: random.choice(self._tier_droplists[1])
-        actions['AWU_drop'] = lambda: random.choice(self._tier_droplists[2])
+        actions['teleporter_drop'] = DropSampler(self._tier_droplists[1])
+        actions['AWU_drop'] = DropSampler(self._tier_droplists[2])
         return actions
 
     def _pick_next_stage_scene(self, destination_group=None):
@@ -642,7 +861,7 @@ class Run:
         """
         total_drops = self._num_players * (shrines_activated + 1)
         boss = Run.spawn_teleporter_boss(dccs, self._stages_cleared, self._expansions)
-        if boss.body.item_drop:
+        if boss and boss.body.item_drop:
             green_item_count = sum(random.random() > BOSS_DROP_CHANCE for _ in range(total_drops))
         else:
             green_item_count = total_drops
@@ -694,13 +913,13 @@ class Run:
                         # I imagine it is an unlikely behaviour that someone
                         # would recycle a Trophy Hunter's Tricon for the small
                         # chance of getting an Executive Card, so it is skipped.
-                        if item != Equipment.BossHunter:
-                            item = self._reroll_item(equipment)
+                        if equipment != Equipment.BossHunter:
+                            equipment = self._reroll_item(equipment)
                             if equipment == Equipment.MultiShopCard:
-                                self.has_recycler = False
-                                self.can_recycle = False
+                                inventory.has_recycler = False
+                                inventory.can_recycle = False
                     else:
-                        self.can_recycle = True
+                        inventory.can_recycle = True
         if equipment == Equipment.MultiShopCard and not inventory.has_card:
             inventory.has_card = True
         inventory.equipment.append(equipment)
@@ -759,7 +978,7 @@ class Run:
                         loot[type(item)].append(item)
                     if isc_name == 'iscFreeChest':
                         free_chest_items.extend(collected_loot)
-                elif isc == 'iscVoidTriple':
+                elif isc_name == 'iscVoidTriple':
                     drops = self._actions[isc_name]()
                     item = max(drops, key=lambda x: x.tier._tier)
                     self._inventory.give_item(item)
@@ -891,7 +1110,7 @@ class Run:
         -------
         None
         """
-        portals = self.stats.portals[-1]
+        portals = self.stats.last_portals
         blue = Portal.B in portals
         self._explicit_next_scene_name = None
         if blue and self._stages_cleared + 1 == void_fields and not self._void_fields_visited:
@@ -1045,8 +1264,9 @@ class Run:
 
         Returns
         -------
-        CharacterSpawnCard
-            The spawn card of the selected monster.
+        CharacterSpawnCard or None
+            The spawn card of the selected monster, or None if no monster is
+            available for the stages cleared.
 
         Notes
         -----
@@ -1066,17 +1286,58 @@ class Run:
                 weights.append(weight)
         if filtered:
             return random.choices(filtered, weights)[0]
+        if not monsters:
+            return None
         filtered, weights = zip(*monsters)
         return random.choices(filtered, weights)[0].spawn_card
 
-    def loot_stages(self, num_stages=5, void_fields=-1, stage_preferences=dict()):
+    def snapshot(self):
+        """
+        Take a snapshot of the current state of the run.
+
+        Returns
+        -------
+        RunSnapshot
+            The scene, stages cleared, inventory, portal and Void Fields
+            progress, and loot stats so far.
+        """
+        return RunSnapshot(self)
+
+    def restore(self, snapshot):
+        """
+        Set the state of the run to a snapshot.
+
+        Parameters
+        ----------
+        snapshot : RunSnapshot
+            The state to resume from, which is not modified.
+
+        Returns
+        -------
+        None
+        """
+        self._stages_cleared = snapshot.stages_cleared
+        self._scene_name = snapshot.scene_name
+        self._scene_data = scenes[self._scene_name]
+        self._scene_director.change_scene(self._scene_name)
+        self._next_scene_name = snapshot.next_scene_name
+        self._explicit_next_scene_name = snapshot.explicit_next_scene_name
+        self._blue_portals_opened = snapshot.blue_portals_opened
+        self._void_fields_visited = snapshot.void_fields_visited
+        self._inventory.restore(snapshot.inventory)
+        self.stats.restore(snapshot.stats)
+
+    def loot_stages(self, num_stages=5, void_fields=-1, stage_preferences=dict(), snapshot=None):
         """
         Simulate a run by full looting a number of stages.
 
         Parameters
         ----------
-        num_stages : int, optional
-            The number of normal stages to loot.
+        num_stages : int or list, optional
+            The number of normal stages to loot. If it's a list of horizons, the
+            run loots up to the deepest one, and `horizon_data` also keeps the
+            `LootReport.consolidate_data` result at the end of each of them,
+            which is the same as looting that many stages.
         void_fields : int, optional
             After what stage to visit the Void Fields. It is assumed it will be
             completed and looted fully. If on the same stage a Gold Portal
@@ -1089,12 +1350,24 @@ class Run:
             destination "stage_order" is not found, or none of the preferred
             scenes have spawned for the Lunar Seer, there will be no overrides
             and the next scene will be chosen at random as normal.
+        snapshot : RunSnapshot, optional
+            The state to resume the run from instead of starting a new one. The
+            number of stages is still counted from the start of the run.
 
         Returns
         -------
         None
         """
-        self._restart()
+        if snapshot is None:
+            self._restart()
+        else:
+            self.restore(snapshot)
+        horizons = []
+        if isinstance(num_stages, (list, tuple, range)):
+            horizons = sorted(set(num_stages))
+            num_stages = horizons[-1] if horizons else 0
+        self.horizon_data = {}
+        self._record_horizons(horizons)
         if num_stages <= 0:
             return
         if void_fields == 0:
@@ -1103,3 +1376,1161 @@ class Run:
             self._loot_stage(void_fields, stage_preferences)
             self._choose_next_destination(void_fields, stage_preferences)
             self._advance_stage()
+            self._record_horizons(horizons)
+
+    def _record_horizons(self, horizons):
+        """Keep the consolidated data if the run has just reached a horizon."""
+        if self._stages_cleared in horizons and self._stages_cleared not in self.horizon_data:
+            self.horizon_data[self._stages_cleared] = self.stats.consolidate_data()
+
+    def fan_out(self, snapshot, num_stages, continuations, void_fields=-1, stage_preferences=dict(),
+                workers=1, seed=None):
+        """
+        Continue a run from the same state many times.
+
+        This avoids looting the shared stages again for every continuation,
+        e.g., for the items after 10 stages given the state after 5 stages.
+
+        Parameters
+        ----------
+        snapshot : RunSnapshot
+            The state to resume every continuation from.
+        num_stages : int
+            The number of normal stages to loot, counted from the start of the
+            run.
+        continuations : int
+            The number of continuations.
+        void_fields, stage_preferences : optional
+            See `loot_stages`.
+        workers : int, optional
+            The number of processes to split the continuations over. On
+            platforms that spawn new processes, e.g., Windows, the calling
+            script must be guarded by `if __name__ == '__main__'`.
+        seed : int, optional
+            The master seed, from which each continuation derives its own seed
+            for the `random` module. By default fresh entropy is used.
+
+        Returns
+        -------
+        list
+            The `LootReport.consolidate_data` result of each continuation.
+        """
+        seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(continuations)]
+        if workers <= 1:
+            # Seeding the continuations shouldn't change the caller's stream
+            state = random.getstate()
+            try:
+                return self._loot_continuations(snapshot, num_stages, void_fields, stage_preferences, seeds)
+            finally:
+                random.setstate(state)
+        config = (self._num_players, self._expansions, self._is_delusion_enabled, self.stats.lite)
+        chunks = [chunk.tolist() for chunk in np.array_split(np.array(seeds, dtype=np.int64), workers)]
+        args = (snapshot, num_stages, void_fields, stage_preferences)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_loot_continuations, itertools.repeat(config),
+                                   *map(itertools.repeat, args), chunks)
+            return [out for chunk in results for out in chunk]
+
+    def _loot_continuations(self, snapshot, num_stages, void_fields, stage_preferences, seeds):
+        """Loot a continuation of a snapshot for each seed."""
+        out = []
+        for seed in seeds:
+            random.seed(seed)
+            self.loot_stages(num_stages, void_fields, stage_preferences, snapshot)
+            out.append(self.stats.consolidate_data())
+        return out
+
+
+def _loot_continuations(config, snapshot, num_stages, void_fields, stage_preferences, seeds):
+    """
+    Loot a continuation of a snapshot for each seed with a new run.
+
+    This is run by every worker process, so it has to be importable.
+    """
+    num_players, expansions, is_delusion_enabled, lite_report = config
+    run = Run(num_players, expansions, is_delusion_enabled, lite_report)
+    return run._loot_continuations(snapshot, num_stages, void_fields, stage_preferences, seeds)
+
+
+def _compile_pickups(sampler, pickup_ids):
+    """Pair a droptable sampler with the id of each of its pickups."""
+    return sampler, np.array([pickup_ids[pickup] for pickup in sampler.pickups], dtype=np.int64)
+
+
+def _draw_pickups(sampler, size, rng):
+    """Draw pickup ids with replacement from a compiled droptable."""
+    sampler, ids = sampler
+    return ids[sampler.draw(size, rng)]
+
+
+def _draw_unique_pickups(sampler, size, k, rng):
+    """
+    Draw `k` distinct pickup ids `size` times, in the order they are drawn.
+
+    Sequentially drawing without replacement is the same as sorting the log
+    weights perturbed by Gumbel noise, which is done for all rows at once.
+    """
+    sampler, ids = sampler
+    keys = np.log(sampler.probabilities) - np.log(-np.log(rng.random((size, len(ids)))))
+    return ids[np.argsort(-keys, axis=1)[:, :k]]
+
+
+class RunBatch:
+    """
+    Simulates many independent runs together by full looting a number of stages.
+
+    All runs are advanced one stage at a time in lockstep, with their state
+    kept in arrays, e.g., the inventories are a matrix of item counts with a
+    row for each run. The runs on the same scene and stage are populated with
+    the vectorised engine of the `SceneDirector` and their drops are drawn in
+    bulk. Only the interactions whose outcome depends on the order of looting,
+    i.e., equipment that is affected by the Executive Card and the Recycler,
+    multishops, and Shipping Request Forms, are resolved per run in a random
+    order. The result follows the same distribution as running `Run` as many
+    times, with the same simplifications described there.
+    """
+    # The keys of `get_totals`
+    _TOTALS = ('family_event', *(name for _, name in LootReport._TOTAL), 'drones', 'tricorn')
+    # The interactables whose looting depends on the order they're looted in
+    _MULTISHOPS = ('iscTripleShop', 'iscTripleShopLarge', 'iscTripleShopEquipment', 'iscFreeChest')
+
+    def __init__(self, runs, num_players=1, expansions=ALL_EXPANSIONS, is_delusion_enabled=False,
+                 seed=None):
+        """
+        Initialise the run sessions.
+
+        Parameters
+        ----------
+        runs : int
+            The number of independent runs. It can be changed before any call
+            of `loot_stages`.
+        num_players : int, optional
+            The number of players. This affects the available amount of
+            interactable credits for scene population.
+        expansions : set, optional
+            The list of enabled expansions, which adds new scenes and
+            interactables. By default they are all enabled.
+        is_delusion_enabled : bool, optional
+            Whether the Artifact of Delusion is enabled. See `Run`.
+        seed : int, optional
+            The seed of the random number generator. By default fresh entropy
+            is used.
+
+        Returns
+        -------
+        None
+        """
+        self.runs = runs
+        self._num_players = num_players
+        self._expansions = set(expansions)
+        self._is_sotv_enabled = Expansion.SOTV in self._expansions
+        self._is_delusion_enabled = is_delusion_enabled
+        self._rng = np.random.default_rng(seed)
+        self._scene_director = SceneDirector(SceneName.DR, num_players=num_players,
+                                             expansions=self._expansions)
+        self._camp_director = CampDirector()
+        self._tier_droplists = Run.build_tier_droplists(self._expansions)
+
+        self._items = Items._items
+        self._equipment = Equipment._items
+        self._item_ids = {item: i for i, item in enumerate(self._items)}
+        self._equipment_ids = {e: i for i, e in enumerate(self._equipment)}
+        # Items and equipment share one id space for the droptables, with the
+        # equipment after the items.
+        self._pickup_ids = dict(self._item_ids)
+        self._pickup_ids.update((e, len(self._items) + i) for i, e in enumerate(self._equipment))
+        self._item_tiers = np.array([item.tier._tier for item in self._items], dtype=np.int64)
+        self._item_tier_columns = _ITEM_TIER_COLUMNS
+        self._is_lunar_equipment = np.array([e.is_lunar for e in self._equipment], dtype=bool)
+        self._interactable_names = list(isc)
+        self._interactable_ids = {name: i for i, name in enumerate(self._interactable_names)}
+        self._is_drone = np.array(['Drone' in name for name in self._interactable_names], dtype=bool)
+        self._scene_names = list(scenes)
+        self._scene_ids = {name: i for i, name in enumerate(self._scene_names)}
+        self._has_teleporter = np.array(
+            [bool(data.scene_director.teleporter) for data in scenes.values()], dtype=bool
+        )
+        self._stage_orders = np.array([data.stage_order for data in scenes.values()], dtype=np.int64)
+        self._is_stage = np.array([data.scene_type == 1 for data in scenes.values()], dtype=bool)
+        # The name of each scene in the stats, with Abyssal Depths marking
+        # whether the cave was open
+        self._labels = self._scene_names + [SceneName.AD + '-open', SceneName.AD + '-closed']
+
+        self._samplers = self._compile_samplers()
+        self._reroll_choices = self._compile_reroll_choices()
+        self._monster_tables = {}
+        self._boss_tables = {}
+        self._restart()
+
+    def _compile_samplers(self):
+        """Compile the droptables of every looted interactable and reward."""
+        tier_droplists = self._tier_droplists
+        samplers = {}
+        chests = [name for name, controller in (
+            (name, isc[name].controller) for name in (
+                'iscChest1', 'iscChest2', 'iscEquipmentBarrel', 'iscLunarChest',
+                'iscCategoryChestDamage', 'iscCategoryChestHealing', 'iscCategoryChestUtility',
+                'iscCategoryChest2Damage', 'iscCategoryChest2Healing', 'iscCategoryChest2Utility',
+                'iscGoldChest', 'iscChest1Stealthed', 'iscShrineChance', 'iscShrineChanceSandy',
+                'iscShrineChanceSnowy', 'iscVoidChest', 'iscVoidChestSacrificeOn', 'iscLockbox',
+                'iscTripleShop', 'iscTripleShopLarge', 'iscTripleShopEquipment',
+            )
+        )]
+        for name in chests:
+            sampler = isc[name].drop_table.compile_sampler(tier_droplists)
+            samplers[name] = _compile_pickups(sampler, self._pickup_ids)
+        sampler = isc['iscDuplicatorLarge'].drop_table.compile_sampler(tier_droplists)
+        samplers['green_printer'] = _compile_pickups(sampler, self._pickup_ids)
+        # The option chests draw distinct items with the weight of their tier
+        items, weights = _filter_tier_items(droptables['dtVoidTriple'], tier_droplists)
+        samplers['iscVoidTriple'] = _compile_pickups(DropSampler.from_tiers(items, weights), self._pickup_ids)
+        for tier in range(1, 4):
+            items, weights = _filter_tier_items(droptables[f'dtTier{tier}Item'], tier_droplists)
+            samplers[f'cell{tier}_drop'] = _compile_pickups(DropSampler.from_tiers(items, weights),
+                                                            self._pickup_ids)
+        samplers['teleporter_drop'] = _compile_pickups(DropSampler(tier_droplists[1]), self._pickup_ids)
+        samplers['AWU_drop'] = _compile_pickups(DropSampler(tier_droplists[2]), self._pickup_ids)
+        free_chest_weights = isc['iscFreeChest'].drop_table.weights[:3]
+        samplers['iscFreeChest'] = (
+            [[self._pickup_ids[item] for item in tier_items] for tier_items in tier_droplists[:3]],
+            free_chest_weights,
+        )
+        return samplers
+
+    def _compile_reroll_choices(self):
+        """Find the equipment that each equipment can be rerolled into."""
+        choices = {}
+        for equipment in self._equipment:
+            for tier in self._tier_droplists:
+                if equipment in tier:
+                    choices[self._equipment_ids[equipment]] = [
+                        self._equipment_ids[e] for e in tier if e != equipment
+                    ]
+                    break
+        return choices
+
+    def _restart(self):
+        """Initialise the arrays for a new batch of sessions."""
+        runs = self.runs
+        self._stages_cleared = np.zeros(runs, dtype=np.int64)
+        self._scene = np.zeros(runs, dtype=np.int64)
+        self._next_scene = np.full(runs, -1, dtype=np.int64)
+        self._explicit_next_scene = np.full(runs, -1, dtype=np.int64)
+        self._blue_portals_opened = np.zeros(runs, dtype=np.int64)
+        self._void_fields_visited = np.zeros(runs, dtype=bool)
+        self._has_card = [False] * runs
+        self._has_recycler = [False] * runs
+        self._can_recycle = [False] * runs
+        # The consolidated data of each run
+        self.items = np.zeros((runs, len(self._items)), dtype=np.int64)
+        self.equipment = np.zeros((runs, len(self._equipment)), dtype=np.int64)
+        self.interactables = np.zeros((runs, len(self._interactable_names)), dtype=np.int64)
+        self.portals = np.zeros((runs, 3), dtype=np.int64)
+        self.at_least_once = np.zeros((runs, 3), dtype=np.int64)
+        self.family_events = np.zeros(runs, dtype=np.int64)
+        self.free_chest_item_tiers = np.zeros((runs, 3), dtype=np.int64)
+        self.card_multishops = np.zeros((runs, 4), dtype=np.int64)
+        self.card_stage = np.full(runs, -1, dtype=np.int64)
+        self.stages = np.zeros(runs, dtype=np.int64)
+        # The per-stage data, with the runs that looted each stage
+        self._stage_rows = []
+        self._stage_labels = []
+        self._stage_item_count = []
+        self._stage_delusion = []
+        self._last_portals = None
+        # The records at the end of each horizon of `loot_stages`
+        self._horizons = {}
+        self._scene[:] = self._pick_destinations(scenes[SceneName.SM].destinations, runs)
+
+    def _can_pick_stage(self, scene_name):
+        """Whether a scene is available for selection. See `Run._can_pick_stage`."""
+        required_dlc = scenes[scene_name].required_dlc
+        return not required_dlc or required_dlc in self._expansions
+
+    def _pick_destinations(self, destination_group, size):
+        """
+        Select the next scene of many runs from the same destination group.
+
+        Returns
+        -------
+        array
+            The scene id for each run.
+        """
+        destinations = [d for d in destination_group if self._can_pick_stage(d[0])]
+        names, weights = zip(*destinations)
+        weights = np.array(weights, dtype=np.float64)
+        ids = np.array([self._scene_ids[name] for name in names], dtype=np.int64)
+        return ids[self._rng.choice(len(ids), size=size, p=weights / weights.sum())]
+
+    def _get_monster_table(self, scene, stages_cleared):
+        """
+        Find the distribution of the monster DCCS and its teleporter boss drop.
+
+        Returns
+        -------
+        probabilities : array
+            The probability of each DCCS.
+        is_family : array
+            Whether each DCCS is a family event.
+        boss_tables : list
+            For each DCCS, the item id dropped by each possible boss, which is
+            -1 for none, and their probabilities.
+        """
+        key = (scene, stages_cleared)
+        if key not in self._monster_tables:
+            stage_info = scenes[self._scene_names[scene]].stage_info
+            if not stage_info or not stage_info.monsters:
+                self._monster_tables[key] = None
+                return None
+            values, weights = stage_info.monsters.get_weighted_selection(self._expansions, stages_cleared)
+            weights = np.array(weights, dtype=np.float64)
+            is_family = np.array([bool(dccs.name) and 'Family' in dccs.name for dccs in values],
+                                 dtype=bool)
+            boss_tables = [self._get_boss_table(dccs, stages_cleared) for dccs in values]
+            self._monster_tables[key] = (weights / weights.sum(), is_family, boss_tables)
+        return self._monster_tables[key]
+
+    def _get_boss_table(self, dccs, stages_cleared):
+        """The boss drop distribution of a DCCS. See `Run.spawn_teleporter_boss`."""
+        monsters = dccs.generate_card_weighted_selection(stages_cleared, self._expansions)
+        bosses = [(card.spawn_card, weight) for card, weight in monsters
+                  if card.spawn_card.body.is_champion and not card.spawn_card.forbidden_as_boss]
+        if not bosses:
+            bosses = [(card.spawn_card, weight) for card, weight in monsters]
+        if not bosses:
+            return np.array([-1], dtype=np.int64), np.ones(1)
+        drops = np.array([self._item_ids[spawn_card.body.item_drop] if spawn_card.body.item_drop else -1
+                          for spawn_card, _ in bosses], dtype=np.int64)
+        weights = np.array([weight for _, weight in bosses], dtype=np.float64)
+        return drops, weights / weights.sum()
+
+    def _draw_monsters(self, scene, stages_cleared):
+        """
+        Select the monster DCCS and the teleporter boss drop of many runs.
+
+        Returns
+        -------
+        is_family : array
+            Whether each run got a family event.
+        boss_drop : array
+            The item id of the boss drop of each run, which is -1 for none.
+        """
+        rng = self._rng
+        is_family = np.zeros(scene.size, dtype=bool)
+        boss_drop = np.full(scene.size, -1, dtype=np.int64)
+        groups = np.unique(np.stack([scene, stages_cleared]), axis=1).T
+        for group_scene, group_stages in groups:
+            rows = np.flatnonzero((scene == group_scene) & (stages_cleared == group_stages))
+            table = self._get_monster_table(group_scene, group_stages)
+            if table is None:
+                continue
+            probabilities, family, boss_tables = table
+            choice = rng.choice(len(probabilities), size=rows.size, p=probabilities)
+            is_family[rows] = family[choice]
+            for dccs in np.unique(choice):
+                dccs_rows = rows[choice == dccs]
+                drops, drop_probabilities = boss_tables[dccs]
+                boss_drop[dccs_rows] = drops[rng.choice(len(drops), size=dccs_rows.size,
+                                                        p=drop_probabilities)]
+        return is_family, boss_drop
+
+    def _generate_interactables(self, active, scene, stages_cleared):
+        """
+        Generate the interactables of a stage for many runs.
+
+        Parameters
+        ----------
+        active : array
+            The runs that loot this stage.
+        scene, stages_cleared : array
+            The scene id and the number of stages cleared of each of them.
+
+        Returns
+        -------
+        counts : array
+            The spawn count of each interactable for each run.
+        is_bonus_credits_available : array
+            Whether the cave was open on Abyssal Depths.
+
+        Notes
+        -----
+        See `Run._generate_interactables`. The shuffled order of the
+        interactables is instead drawn in `_loot_interactables` only for the
+        interactions that depend on it.
+        """
+        rng = self._rng
+        director = self._scene_director
+        size = active.size
+        counts = np.zeros((size, len(self._interactable_names)), dtype=np.int64)
+        is_bonus = np.zeros(size, dtype=bool)
+        is_ad = scene == self._scene_ids[SceneName.AD]
+        is_bonus[is_ad] = rng.random(np.count_nonzero(is_ad)) > .5
+        groups = np.unique(np.stack([scene, stages_cleared, is_bonus]), axis=1).T
+        for group_scene, group_stages, group_bonus in groups:
+            rows = np.flatnonzero(
+                (scene == group_scene) & (stages_cleared == group_stages) & (is_bonus == group_bonus)
+            )
+            scene_name = self._scene_names[group_scene]
+            director.change_scene(scene_name)
+            director.is_command_enabled = scene_name == SceneName.BA
+            director.is_bonus_credits_available = bool(group_bonus)
+            interactable_credit = director._get_interactable_credit()
+            outcomes, probabilities = director._get_blend_outcomes(int(group_stages))
+            choice = rng.choice(len(outcomes), size=rows.size, p=probabilities)
+            for outcome in np.unique(choice):
+                outcome_rows = rows[choice == outcome]
+                interactables, deck, item_num = outcomes[outcome]
+                item_counter = np.zeros((outcome_rows.size, item_num), dtype=np.int64)
+                director._populate_batch(interactable_credit, deck, item_counter, rng)
+                columns = self._get_columns(interactables, item_num)
+                np.add.at(counts, (outcome_rows[:, None], columns[None, :]), item_counter)
+        director.is_command_enabled = False
+        director.is_bonus_credits_available = False
+
+        seeds = counts[:, self._interactable_ids['iscVoidCamp']]
+        if seeds.any():
+            interactables, populations, threshold, alias = self._camp_director._get_population_table()
+            total = int(seeds.sum())
+            index = (rng.random(total) * len(populations)).astype(np.int64)
+            index = np.where(rng.random(total) >= np.asarray(threshold)[index], np.asarray(alias)[index], index)
+            rows = np.repeat(np.arange(size), seeds)
+            columns = self._get_columns(interactables, len(populations[0]))
+            np.add.at(counts, (rows[:, None], columns[None, :]), np.asarray(populations)[index])
+
+        gold_chest = self._interactable_ids['iscGoldChest']
+        for scene_name in (SceneName.AD, SceneName.SG):
+            counts[scene == self._scene_ids[scene_name], gold_chest] += 1
+        counts[scene == self._scene_ids[SceneName.GC], self._interactable_ids['iscChest1']] += 4
+        is_vf2 = np.flatnonzero(scene == self._scene_ids[SceneName.VF2])
+        is_chest = rng.random(is_vf2.size) < .5
+        counts[is_vf2[is_chest], self._interactable_ids['iscChest2']] += 1
+        counts[is_vf2[~is_chest], self._interactable_ids['iscScrapper']] += 1
+        is_stage = np.flatnonzero(self._is_stage[scene])
+        if LOCKBOX_ALLOWED:
+            keys = self._item_ids[Items.TreasureCache]
+            lockboxes = np.minimum(self.items[active[is_stage], keys], self._num_players)
+            counts[is_stage, self._interactable_ids['iscLockbox']] += lockboxes
+            self.items[active[is_stage], keys] -= lockboxes
+        if FREE_CHEST_ALLOWED:
+            forms = np.minimum(self.items[active[is_stage], self._item_ids[Items.FreeChest]],
+                               self._num_players)
+            counts[is_stage, self._interactable_ids['iscFreeChest']] += forms
+        return counts, is_bonus
+
+    def _get_columns(self, interactables, item_num):
+        """Map the interactables of a DCCS to their columns in the counts."""
+        columns = np.zeros(item_num, dtype=np.int64)
+        for category in interactables.categories:
+            for card in category.cards:
+                columns[card.index] = self._interactable_ids[card._name]
+        return columns
+
+    def _give_items(self, runs, item_ids, counts=1):
+        """Add items to the inventories of some runs, which can repeat."""
+        np.add.at(self.items, (runs, item_ids), counts)
+
+    def _loot_interactables(self, active, counts, step_delusion):
+        """
+        Interact and loot the interactables of a stage for many runs.
+
+        Parameters
+        ----------
+        active : array
+            The runs that loot this stage.
+        counts : array
+            The spawn count of each interactable for each run.
+        step_delusion : array
+            The number of items of the tiers 1-3 that can be collected again
+            with the Artifact of Delusion for each run, which is incremented.
+            This is a mutable operation.
+
+        Returns
+        -------
+        delusion_rows, delusion_items : array
+            The runs and the extra stack of items for the Artifact of Delusion.
+
+        Notes
+        -----
+        See `Run._loot_interactables`. Every interactable gets a random key
+        for the order it is looted in, which is the same as shuffling them.
+        Items are added to the inventories in bulk. The equipment is collected
+        per run in order, but only for runs without an Executive Card, which
+        gives the key at which each run finds one. The multishops are then
+        looted in bulk, and only the Shipping Request Form chests are looted
+        per run in order, as their drops depend on the forms held.
+        """
+        rng = self._rng
+        size = active.size
+        num_items = len(self._items)
+        form = self._item_ids[Items.FreeChest]
+        free_chests = counts[:, self._interactable_ids['iscFreeChest']]
+        forms_before = self.items[active, form].copy()
+        has_card = np.array(self._has_card, dtype=bool)[active]
+        equipment_events = []
+        form_events = []
+        delusion_rows = []
+        delusion_items = []
+
+        def collect(rows, keys, subindex, pickups):
+            is_item = pickups < num_items
+            self._give_items(active[rows[is_item]], pickups[is_item])
+            is_equipment = ~is_item
+            equipment_rows = rows[is_equipment]
+            equipment = pickups[is_equipment] - num_items
+            np.add.at(self.equipment, (active[equipment_rows[has_card[equipment_rows]]],
+                                       equipment[has_card[equipment_rows]]), 1)
+            is_ordered = ~has_card[equipment_rows]
+            equipment_events.extend(zip(
+                equipment_rows[is_ordered].tolist(), keys[is_equipment][is_ordered].tolist(),
+                itertools.repeat(subindex), equipment[is_ordered].tolist(), itertools.repeat(None)
+            ))
+            is_form = is_item & (pickups == form)
+            is_tracked = is_form & (free_chests[rows] > 0)
+            form_events.extend(zip(rows[is_tracked].tolist(), keys[is_tracked].tolist(),
+                                   itertools.repeat(subindex)))
+
+        for name, drops_per_chest in (
+            ('iscChest1', 1), ('iscChest2', 1), ('iscEquipmentBarrel', 1), ('iscLunarChest', 1),
+            ('iscCategoryChestDamage', 1), ('iscCategoryChestHealing', 1),
+            ('iscCategoryChestUtility', 1), ('iscCategoryChest2Damage', 1),
+            ('iscCategoryChest2Healing', 1), ('iscCategoryChest2Utility', 1),
+            ('iscGoldChest', 1), ('iscChest1Stealthed', 1),
+            ('iscShrineChance', 2), ('iscShrineChanceSandy', 2), ('iscShrineChanceSnowy', 2),
+            ('iscVoidChest', 1), ('iscVoidChestSacrificeOn', 1), ('iscLockbox', 1),
+        ):
+            column = counts[:, self._interactable_ids[name]]
+            if not column.any():
+                continue
+            rows = np.repeat(np.arange(size), column)
+            keys = rng.random(rows.size)
+            for subindex in range(drops_per_chest):
+                pickups = _draw_pickups(self._samplers[name], rows.size, rng)
+                collect(rows, keys, subindex, pickups)
+                if isc[name].can_reset and self._is_delusion_enabled:
+                    is_item = pickups < num_items
+                    tiers = self._item_tiers[pickups[is_item]]
+                    is_counted = tiers < 3
+                    np.add.at(step_delusion, (rows[is_item][is_counted], tiers[is_counted]), 1)
+                    delusion_rows.append(active[rows[is_item]])
+                    delusion_items.append(pickups[is_item])
+
+        column = counts[:, self._interactable_ids['iscVoidTriple']]
+        if column.any():
+            rows = np.repeat(np.arange(size), column)
+            drops = _draw_unique_pickups(self._samplers['iscVoidTriple'], rows.size, 3, rng)
+            # The first of the highest tier drops
+            best = np.argmax(self._item_tiers[drops], axis=1)
+            collect(rows, rng.random(rows.size), 0, drops[np.arange(rows.size), best])
+
+        shops = {}
+        for terminal, name in enumerate(self._MULTISHOPS):
+            column = counts[:, self._interactable_ids[name]]
+            rows = np.repeat(np.arange(size), column)
+            shops[name] = (terminal, rows, rng.random(rows.size))
+
+        # The equipment multishops and all equipment in order for the runs
+        # without an Executive Card, which gives the key of finding one
+        terminal, rows, keys = shops['iscTripleShopEquipment']
+        if rows.size:
+            drops = _draw_pickups(self._samplers['iscTripleShopEquipment'], (rows.size, 3), rng) - num_items
+            visible = rng.random((rows.size, 3)) > _TRIPLE_SHOP_HIDDEN_CHANCE
+            visible[:, 0] = True
+            is_card = has_card[rows]
+            np.add.at(self.card_multishops, (active[rows[is_card]], terminal), 1)
+            np.add.at(self.equipment, (np.repeat(active[rows[is_card]], 3), drops[is_card].ravel()), 1)
+            equipment_events.extend(zip(
+                rows[~is_card].tolist(), keys[~is_card].tolist(), itertools.repeat(0),
+                drops[~is_card].tolist(), visible[~is_card].tolist()
+            ))
+        card_keys = np.where(has_card, -np.inf, np.inf)
+        equipment_events.sort(key=lambda event: event[:3])
+        for row, key, _, equipment, visible in equipment_events:
+            run = int(active[row])
+            if visible is None:
+                self._collect_equipment(run, equipment)
+            else:
+                self._loot_equipment_shop(run, equipment, visible)
+            if self._has_card[run] and card_keys[row] == np.inf:
+                card_keys[row] = key
+
+        for name in ('iscTripleShop', 'iscTripleShopLarge'):
+            terminal, rows, keys = shops[name]
+            if not rows.size:
+                continue
+            drops = _draw_pickups(self._samplers[name], (rows.size, 3), rng)
+            is_card = keys > card_keys[rows]
+            np.add.at(self.card_multishops, (active[rows[is_card]], terminal), 1)
+            collected = np.where(is_card[:, None], drops, -1)
+            picked = rng.integers(3, size=rows.size)
+            collected[~is_card, picked[~is_card]] = drops[~is_card, picked[~is_card]]
+            is_collected = collected >= 0
+            item_rows = np.repeat(rows, 3).reshape(-1, 3)
+            self._give_items(active[item_rows[is_collected]], collected[is_collected])
+            is_tracked = (collected == form) & (free_chests[rows] > 0)[:, None]
+            form_events.extend(zip(item_rows[is_tracked].tolist(),
+                                   np.repeat(keys, 3).reshape(-1, 3)[is_tracked].tolist(),
+                                   itertools.repeat(0)))
+
+        # The Shipping Request Form chests in order with the forms
+        terminal, rows, keys = shops['iscFreeChest']
+        if rows.size:
+            events = form_events + list(zip(rows.tolist(), keys.tolist(), itertools.repeat(1)))
+            events.sort()
+            forms_seen = forms_before.tolist()
+            for row, key, is_chest in events:
+                if not is_chest:
+                    forms_seen[row] += 1
+                    continue
+                for item in self._loot_free_chest(int(active[row]), forms_seen[row], key > card_keys[row]):
+                    if item == form:
+                        forms_seen[row] += 1
+
+        if delusion_rows:
+            return np.concatenate(delusion_rows), np.concatenate(delusion_items)
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    def _collect_equipment(self, run, equipment):
+        """
+        Add an equipment to the equipment encountered by a run.
+
+        See `Run._collect_equipment`.
+
+        Parameters
+        ----------
+        run : int
+            The index of the run.
+        equipment : int
+            The equipment id.
+
+        Returns
+        -------
+        int
+            The id of the equipment that is eventually collected.
+        """
+        card = self._equipment_ids[Equipment.MultiShopCard]
+        if CARD_BIAS_ENABLED and not self._has_card[run]:
+            if equipment == card:
+                self._has_recycler[run] = False
+                self._can_recycle[run] = False
+            elif not self._has_recycler[run] and equipment == self._equipment_ids[Equipment.Recycle]:
+                self._has_recycler[run] = True
+            if self._has_recycler[run]:
+                if self._can_recycle[run]:
+                    if equipment != self._equipment_ids[Equipment.BossHunter]:
+                        choices = self._reroll_choices[equipment]
+                        equipment = choices[int(self._rng.random() * len(choices))]
+                        if equipment == card:
+                            self._has_recycler[run] = False
+                            self._can_recycle[run] = False
+                else:
+                    self._can_recycle[run] = True
+        if equipment == card:
+            self._has_card[run] = True
+            if self.card_stage[run] < 0:
+                self.card_stage[run] = self.stages[run]
+        self.equipment[run, equipment] += 1
+        return equipment
+
+    def _loot_equipment_shop(self, run, drops, visible):
+        """
+        Collect the equipment from an equipment multishop of a run.
+
+        See `Run._loot_multishop`.
+
+        Parameters
+        ----------
+        run : int
+            The index of the run.
+        drops : list
+            The equipment ids of the drops.
+        visible : list
+            Whether each drop is visible.
+
+        Returns
+        -------
+        None
+        """
+        if self._has_card[run]:
+            self.card_multishops[run, self._MULTISHOPS.index('iscTripleShopEquipment')] += 1
+            for equipment in drops:
+                self._collect_equipment(run, equipment)
+            return
+        visible_drops = [e for e, is_visible in zip(drops, visible) if is_visible]
+        hidden_drops = [e for e, is_visible in zip(drops, visible) if not is_visible]
+        for equipment in (Equipment.MultiShopCard, Equipment.Recycle, Equipment.BossHunter):
+            equipment = self._equipment_ids[equipment]
+            if equipment in visible_drops and (equipment != self._equipment_ids[Equipment.Recycle] or
+                                               not self._has_recycler[run]):
+                break
+        else:
+            equipment = hidden_drops[0] if hidden_drops else visible_drops[0]
+        self._collect_equipment(run, equipment)
+
+    def _loot_free_chest(self, run, forms, has_card):
+        """
+        Collect the loot from a Shipping Request Form chest of a run.
+
+        See `Run._loot_multishop` and `MultiShopController`.
+
+        Parameters
+        ----------
+        run : int
+            The index of the run.
+        forms : int
+            The number of Shipping Request Forms the run holds.
+        has_card : bool
+            Whether the run holds an Executive Card.
+
+        Returns
+        -------
+        list
+            The ids of the collected items.
+        """
+        rng = self._rng
+        if has_card:
+            self.card_multishops[run, self._MULTISHOPS.index('iscFreeChest')] += 1
+        tiers, weights = self._samplers['iscFreeChest']
+        weights = np.array([weights[0], weights[1] * forms, weights[2] * forms**2])
+        drop_tiers = rng.choice(3, size=2, p=weights / weights.sum())
+        drops = [tiers[tier][int(rng.random() * len(tiers[tier]))] for tier in drop_tiers.tolist()]
+        if not has_card:
+            # The first of the highest tier drops
+            drops = [drops[int(np.argmax(drop_tiers))]]
+        for item in drops:
+            self.items[run, item] += 1
+            self.free_chest_item_tiers[run, self._item_tiers[item]] += 1
+        return drops
+
+    def _setup_seer_stations(self, scene, stages_cleared):
+        """Generate the override scenes of the Lunar Seer. See `Run._setup_seer_stations`."""
+        rng = self._rng
+        stage_order = self._stage_orders[scene]
+        destinations = [self._scene_ids[name] for name, data in scenes.items()
+                        if stage_order == data.stage_order and self._can_pick_stage(name)]
+        replacements = [self._scene_ids[SceneName.GC]]
+        if self._is_sotv_enabled and stages_cleared >= 4:
+            replacements.append(self._scene_ids[SceneName.VL])
+        replacement_chance = .05 * len(replacements)
+        stations = []
+        for _ in range(2):
+            if not destinations:
+                break
+            target_scene = destinations.pop(int(rng.random() * len(destinations)))
+            if rng.random() < replacement_chance:
+                target_scene = replacements[int(rng.random() * len(replacements))]
+            stations.append(target_scene)
+        return stations
+
+    def _loot_stage(self, active, void_fields, stage_preferences):
+        """Fully loot a normal stage for many runs. See `Run._loot_stage`."""
+        rng = self._rng
+        size = active.size
+        num_players = self._num_players
+        scene = self._scene[active]
+        stages_cleared = self._stages_cleared[active]
+
+        def is_scene(name):
+            return scene == self._scene_ids[name]
+
+        self._void_fields_visited[active[is_scene(SceneName.VF)]] = True
+        is_family, boss_drop = self._draw_monsters(scene, stages_cleared)
+        self.family_events[active] += is_family
+
+        # The Blue, Gold, Void, and Artifact portals
+        portals = np.zeros((size, 4), dtype=bool)
+        teleporter = self._has_teleporter[scene]
+        for group_scene in np.unique(scene[teleporter]):
+            rows = np.flatnonzero(teleporter & (scene == group_scene))
+            destinations = scenes[self._scene_names[group_scene]].destinations
+            self._next_scene[active[rows]] = self._pick_destinations(destinations, rows.size)
+        blue_chance = BLUE_PORTAL_CHANCE / (self._blue_portals_opened[active] + 1)
+        portals[:, 0] = teleporter & (rng.random(size) <= blue_chance)
+        if self._is_sotv_enabled:
+            portals[:, 2] = teleporter & (rng.random(size) <= PURPLE_PORTAL_CHANCE) & (stages_cleared >= 6)
+
+        counts, is_bonus = self._generate_interactables(active, scene, stages_cleared)
+        step_delusion = np.zeros((size, 3), dtype=np.int64)
+        delusion_rows, delusion_items = self._loot_interactables(active, counts, step_delusion)
+        is_boss_shrine = np.array(['ShrineBoss' in name for name in self._interactable_names])
+        is_gold_shrine = np.array(['Goldshores' in name for name in self._interactable_names])
+        boss_shrines = counts[:, is_boss_shrine].sum(axis=1)
+        gold_shrines = counts[:, is_gold_shrine].sum(axis=1)
+
+        # The Newt Altars
+        candidates = np.flatnonzero(teleporter & ~portals[:, 0])
+        is_void_fields_next = stages_cleared[candidates] + 1 == void_fields
+        portals[candidates[is_void_fields_next], 0] = True
+        candidates = candidates[~is_void_fields_next]
+        candidates = candidates[np.isin(self._stage_orders[scene[candidates]], list(stage_preferences))]
+        for group_scene in np.unique(scene[candidates]):
+            rows = candidates[scene[candidates] == group_scene]
+            scene_name = self._scene_names[group_scene]
+            newt = scenes[scene_name].newt
+            if newt:
+                newt = rng.integers(newt[0], newt[1] + 1, size=rows.size)
+                if scene_name in (SceneName.AA, SceneName.RD, SceneName.SA):
+                    newt += 1
+                portals[rows[newt > 0], 0] = True
+
+        # The teleporter boss drops
+        rows = np.flatnonzero(teleporter)
+        total_drops = num_players * (boss_shrines[rows] + 1)
+        has_boss_drop = boss_drop[rows] >= 0
+        green_drops = np.where(has_boss_drop, rng.binomial(total_drops, 1 - BOSS_DROP_CHANCE), total_drops)
+        boss_drops = total_drops - green_drops
+        has_green = green_drops > 0
+        greens = _draw_pickups(self._samplers['teleporter_drop'], np.count_nonzero(has_green), rng)
+        self._give_items(active[rows[has_green]], greens, green_drops[has_green])
+        has_boss = boss_drops > 0
+        self._give_items(active[rows[has_boss]], boss_drop[rows[has_boss]], boss_drops[has_boss])
+        self._blue_portals_opened[active] += teleporter & portals[:, 0]
+        portals[:, 1] = teleporter & (gold_shrines > 0)
+
+        if self._is_delusion_enabled and delusion_rows.size:
+            is_reset = self._has_teleporter | (np.arange(len(self._scene_names)) == self._scene_ids[SceneName.BA])
+            is_given = is_reset[self._scene[delusion_rows]]
+            self._give_items(delusion_rows[is_given], delusion_items[is_given])
+
+        rows = np.flatnonzero(is_scene(SceneName.VF))
+        if rows.size:
+            for cell in range(9):
+                tier = cell // 4 + 1
+                potential = _draw_unique_pickups(self._samplers[f'cell{tier}_drop'], rows.size, 3, rng)
+                picks = rng.integers(3, size=(rows.size, num_players))
+                items = np.take_along_axis(potential, picks, axis=1)
+                self._give_items(np.repeat(active[rows], num_players), items.ravel())
+            if self._is_sotv_enabled:
+                portals[rows, 2] = True
+        portals[is_scene(SceneName.SM), 3] = True
+
+        scrap = self._item_ids[Items.RegeneratingScrap]
+        has_printer = counts[:, self._interactable_ids['iscDuplicatorLarge']] > 0
+        if TRADE_REGEN_SCRAP:
+            rows = np.flatnonzero(has_printer & (self.items[active, scrap] > 0))
+            items = _draw_pickups(self._samplers['green_printer'], rows.size, rng)
+            self._give_items(active[rows], items, self.items[active[rows], scrap])
+        rows = active[is_scene(SceneName.AA)]
+        self.items[rows, self._item_ids[Items.IceRing]] += 1
+        self.items[rows, self._item_ids[Items.FireRing]] += 1
+        rows = active[is_scene(SceneName.SC)]
+        self._give_items(rows, _draw_pickups(self._samplers['AWU_drop'], rows.size, rng), num_players)
+        self.items[active[is_scene(SceneName.GC)], self._item_ids[Items.TitanGoldDuringTP]] += num_players
+
+        labels = scene.copy()
+        labels[is_scene(SceneName.AD)] = np.where(is_bonus[is_scene(SceneName.AD)],
+                                                  len(self._scene_names), len(self._scene_names) + 1)
+        item_count = self.items[active][:, [
+            self._item_ids[item] for item in
+            (Items.TreasureCache, Items.TreasureCacheVoid, Items.FreeChest, Items.RegeneratingScrap)
+        ]]
+        item_count = np.column_stack([item_count, item_count[:, -1] * has_printer])
+        self._stage_rows.append(active)
+        self._stage_labels.append(labels)
+        self._stage_item_count.append(item_count)
+        self._stage_delusion.append(step_delusion)
+        self.interactables[active] += counts
+        self.portals[active] += portals[:, :3]
+        self.at_least_once[active] += np.stack([
+            counts[:, [isc_name in name for name in self._interactable_names]].any(axis=1)
+            for isc_name in ('iscScrapper', 'iscShrineCleanse', 'iscVoidCamp')
+        ], axis=1)
+        self.stages[active] += 1
+        self._last_portals = portals
+
+    def _choose_next_destination(self, active, void_fields, stage_preferences):
+        """
+        Choose whether to use a portal or advance to the next stage naturally.
+
+        See `Run._choose_next_destination`.
+        """
+        portals = self._last_portals
+        scene = self._scene[active]
+        stages_cleared = self._stages_cleared[active]
+        explicit = np.full(active.size, -1, dtype=np.int64)
+        blue = portals[:, 0]
+        is_void_fields = blue & (stages_cleared + 1 == void_fields) & ~self._void_fields_visited[active]
+        explicit[is_void_fields] = self._scene_ids[SceneName.VF]
+        undecided = ~is_void_fields
+        if USE_ARTIFACT_PORTAL:
+            is_artifact = undecided & portals[:, 3]
+            explicit[is_artifact] = self._scene_ids[SceneName.BA]
+            undecided &= ~is_artifact
+        if USE_GOLD_PORTAL:
+            is_gold = undecided & portals[:, 1]
+            explicit[is_gold] = self._scene_ids[SceneName.GC]
+            undecided &= ~is_gold
+        rows = np.flatnonzero(undecided & blue)
+        for row in rows.tolist():
+            preferences = stage_preferences.get(int(self._stage_orders[scene[row]]))
+            if not preferences or self._next_scene[active[row]] < 0:
+                continue
+            stations = self._setup_seer_stations(scene[row], stages_cleared[row])
+            for preference in preferences:
+                if self._scene_ids[preference] in stations:
+                    explicit[row] = self._scene_ids[preference]
+                    break
+        self._explicit_next_scene[active] = explicit
+
+    def _advance_stage(self, active):
+        """Advance many runs to their next stage. See `Run._advance_stage`."""
+        self._stages_cleared[active] += self._is_stage[self._scene[active]]
+        explicit = self._explicit_next_scene[active]
+        is_explicit = explicit >= 0
+        self._scene[active[is_explicit]] = explicit[is_explicit]
+        natural = active[~is_explicit]
+        self._scene[natural] = self._next_scene[natural]
+        self._next_scene[natural] = -1
+        for scene_name in (SceneName.MW, SceneName.CO, SceneName.VL, SceneName.PL):
+            if np.any(self._scene[active] == self._scene_ids[scene_name]):
+                raise ValueError(f'Cannot go to {scene_name} as this will end the run.')
+
+    def loot_stages(self, num_stages=5, void_fields=-1, stage_preferences=dict()):
+        """
+        Simulate all the runs by full looting a number of stages.
+
+        Parameters
+        ----------
+        num_stages : int or list, optional
+            The number of normal stages to loot. If it's a list of horizons, the
+            runs loot up to the deepest one, and the tiers, totals, Executive
+            Card data, and stages of each run are also recorded at the end of
+            every other horizon. These are the same as looting that many stages
+            and are accessed with the `horizon` option of the getters.
+        void_fields : int, optional
+            After what stage to visit the Void Fields. See `Run.loot_stages`.
+        stage_preferences : dict, optional
+            The preferred destinations for the Lunar Seer by "stage_order". See
+            `Run.loot_stages`.
+
+        Returns
+        -------
+        None
+        """
+        self._restart()
+        horizons = sorted(set(num_stages)) if isinstance(num_stages, (list, tuple, range)) else [num_stages]
+        num_stages = horizons[-1] if horizons else 0
+        for horizon in horizons:
+            self._horizons[horizon] = {
+                'tiers': np.zeros((self.runs, 12), dtype=np.int64),
+                'total': {key: np.zeros(self.runs, dtype=np.int64) for key in self._TOTALS},
+                'card_stage': np.full(self.runs, -1, dtype=np.int64),
+                'card_multishops': np.zeros((self.runs, 4), dtype=np.int64),
+                'stages': np.zeros(self.runs, dtype=np.int64),
+            }
+        self._record_horizons(np.arange(self.runs))
+        if num_stages <= 0:
+            return
+        if void_fields == 0:
+            void_fields = -1
+        while True:
+            active = np.flatnonzero(self._stages_cleared < num_stages)
+            if not active.size:
+                break
+            self._loot_stage(active, void_fields, stage_preferences)
+            self._choose_next_destination(active, void_fields, stage_preferences)
+            stages_cleared = self._stages_cleared[active]
+            self._advance_stage(active)
+            self._record_horizons(active[self._stages_cleared[active] > stages_cleared])
+
+    def _record_horizons(self, rows):
+        """Record the data of the runs that have just looted as many stages as a horizon."""
+        for horizon, record in self._horizons.items():
+            reached = rows[self._stages_cleared[rows] == horizon]
+            if not reached.size:
+                continue
+            record['tiers'][reached] = self._get_tiers(reached)
+            for key, values in self._get_totals(reached).items():
+                record['total'][key][reached] = values
+            record['card_stage'][reached] = self.card_stage[reached]
+            record['card_multishops'][reached] = self.card_multishops[reached]
+            record['stages'][reached] = self.stages[reached]
+
+    def _get_horizon(self, horizon):
+        """
+        Get the records of a horizon of `loot_stages`.
+
+        Raises
+        ------
+        KeyError
+            If the horizon wasn't requested.
+        """
+        if horizon not in self._horizons:
+            raise KeyError(f'No records for {horizon} stages; the horizons are {list(self._horizons)}.')
+        return self._horizons[horizon]
+
+    def get_tiers(self, horizon=None):
+        """
+        Count the items of each tier of every run.
+
+        Parameters
+        ----------
+        horizon : int, optional
+            The number of stages of a horizon of `loot_stages`. By default it's
+            the end of the runs.
+
+        Returns
+        -------
+        array
+            The counts for each run in the order of `LootReport.consolidate_data`.
+        """
+        if horizon is not None:
+            return self._get_horizon(horizon)['tiers'].copy()
+        return self._get_tiers(np.arange(self.runs))
+
+    def _get_tiers(self, rows):
+        """Count the items of each tier of some runs."""
+        tiers = np.zeros((rows.size, 12), dtype=np.int64)
+        items = self.items[rows]
+        has_tier = self._item_tier_columns >= 0
+        for column in np.unique(self._item_tier_columns[has_tier]):
+            tiers[:, column] = items[:, self._item_tier_columns == column].sum(axis=1)
+        equipment = self.equipment[rows]
+        tiers[:, 4] = equipment[:, self._is_lunar_equipment].sum(axis=1)
+        tiers[:, 7] = equipment[:, ~self._is_lunar_equipment].sum(axis=1)
+        tiers[:, 6] = tiers[:, 4] + tiers[:, 5]
+        return tiers
+
+    def get_totals(self, horizon=None):
+        """
+        Count the various interactables and items encountered in every run.
+
+        Parameters
+        ----------
+        horizon : int, optional
+            The number of stages of a horizon of `loot_stages`. By default it's
+            the end of the runs.
+
+        Returns
+        -------
+        dict
+            An array with a value for each run for every key of the 'total' of
+            `LootReport.consolidate_data`.
+        """
+        if horizon is not None:
+            return {key: values.copy() for key, values in self._get_horizon(horizon)['total'].items()}
+        return self._get_totals(np.arange(self.runs))
+
+    def _get_totals(self, rows):
+        """Count the various interactables and items encountered in some runs."""
+        ids = self._interactable_ids
+        counts = self.interactables[rows]
+        total = {'family_event': self.family_events[rows]}
+        for isc_name, name in LootReport._TOTAL:
+            total[name] = counts[:, ids[isc_name]] if isc_name in ids else np.zeros(rows.size, dtype=np.int64)
+        for isc_name in ('iscShrineBossSandy', 'iscShrineBossSnowy'):
+            if isc_name in ids:
+                total['mountain_shrine'] += counts[:, ids[isc_name]]
+        if 'iscVoidChestSacrificeOn' in ids:
+            total['void_cradle'] += counts[:, ids['iscVoidChestSacrificeOn']]
+        total['drones'] = counts[:, self._is_drone].sum(axis=1)
+        total['tricorn'] = self.equipment[rows, self._equipment_ids[Equipment.BossHunter]]
+        return total
+
+    def get_card_data(self, horizon=None):
+        """
+        Get the Executive Card data of every run.
+
+        Parameters
+        ----------
+        horizon : int, optional
+            The number of stages of a horizon of `loot_stages`. By default it's
+            the end of the runs.
+
+        Returns
+        -------
+        stage : array
+            The stage on which the card was first found for each run, or -1.
+        card_multishops : array
+            The number of each Multishop Terminal purchased with the card for
+            each run. See `LootReport.consolidate_data`.
+        """
+        if horizon is not None:
+            record = self._get_horizon(horizon)
+            return record['card_stage'].copy(), record['card_multishops'].copy()
+        return self.card_stage.copy(), self.card_multishops.copy()
+
+    def get_stage_data(self, name, horizon=None):
+        """
+        Gather a per-stage array of every run.
+
+        Parameters
+        ----------
+        name : {'labels', 'item_count', 'delusion'}
+            The scene label, the items at the end of the stage as in
+            'at_stage_end', or the 'delusion_bonus' of each stage.
+        horizon : int, optional
+            The number of stages of a horizon of `loot_stages`, for which only
+            the stages looted up to it are included. By default it's the end of
+            the runs.
+
+        Returns
+        -------
+        array
+            The values with shape (runs, stages, ...), where the runs that
+            looted fewer stages are padded with zeroes.
+        """
+        stage_data = {
+            'labels': self._stage_labels,
+            'item_count': self._stage_item_count,
+            'delusion': self._stage_delusion,
+        }[name]
+        shape = stage_data[0].shape[1:] if stage_data else ()
+        out = np.zeros((self.runs, len(stage_data), *shape), dtype=np.int64)
+        for stage, (rows, values) in enumerate(zip(self._stage_rows, stage_data)):
+            out[rows, stage] = values
+        if horizon is not None:
+            stages = self._get_horizon(horizon)['stages']
+            out[np.arange(out.shape[1]) >= stages[:, None]] = 0
+            out = out[:, :stages.max(initial=0)]
+        return out
+
+    def consolidate_data(self):
+        """
+        Consolidate and report the results of every run.
+
+        Returns
+        -------
+        list
+            A dictionary for each run in the same format as
+            `LootReport.consolidate_data`.
+        """
+        tiers = self.get_tiers()
+        totals = self.get_totals()
+        labels = self.get_stage_data('labels')
+        item_counts = self.get_stage_data('item_count')
+        delusion = self.get_stage_data('delusion')
+        terminals = [self._interactable_ids[name] for name in self._MULTISHOPS]
+        out = []
+        for run in range(self.runs):
+            stages = self.stages[run]
+            interactables = Counter({
+                self._interactable_names[i]: int(self.interactables[run, i])
+                for i in np.flatnonzero(self.interactables[run])
+            })
+            item_count = item_counts[run, :stages].T.tolist()
+            out.append({
+                'scenes': [self._labels[label] for label in labels[run, :stages].tolist()],
+                'portals': self.portals[run].tolist(),
+                'interactables': interactables,
+                'items': {self._items[i]: int(self.items[run, i]) for i in np.flatnonzero(self.items[run])},
+                'equipment': Counter({
+                    self._equipment[i]: int(self.equipment[run, i])
+                    for i in np.flatnonzero(self.equipment[run])
+                }),
+                'tiers': tiers[run].tolist(),
+                'free_chest_item_tiers': self.free_chest_item_tiers[run].tolist(),
+                'at_least_once': dict(zip(('scrapper', 'cleansing_pool', 'void_seed'),
+                                          self.at_least_once[run].tolist())),
+                'at_stage_end': dict(zip(
+                    ('rusted_key', 'encrusted_key', 'SRF', 'regen_scrap', 'regen_scrap_used'),
+                    map(tuple, item_count)
+                )),
+                'total': {name: int(values[run]) for name, values in totals.items()},
+                'card': {
+                    'stage': int(self.card_stage[run]),
+                    'multishops': self.interactables[run, terminals].tolist(),
+                    'card_multishops': self.card_multishops[run].tolist(),
+                },
+                'delusion_bonus': delusion[run, :stages].tolist(),
+            })
+        return out
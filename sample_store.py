@@ -0,0 +1,260 @@
+import json
+import struct
+
+import numpy as np
+
+
+MAGIC = b'RORSAMPLES\x00\x01'
+# The data starts at a multiple of this many bytes after the header
+ALIGNMENT = 64
+# The number of rows evaluated together by a query
+QUERY_BLOCK_SIZE = 2**16
+MAX_COUNT = np.iinfo(np.uint8).max
+
+
+def create_store(path, metadata, interactables, rows):
+    """
+    Create a sample store file and open its rows for writing.
+
+    The file starts with a header of the metadata, followed by a row of uint8
+    spawn counts for each sample with a column for each interactable.
+
+    Parameters
+    ----------
+    path : str
+        The file path.
+    metadata : dict
+        JSON serialisable information about the samples, e.g., the scene and
+        the settings of the director.
+    interactables : list
+        The name of the interactable of each column.
+    rows : int
+        The number of samples.
+
+    Returns
+    -------
+    numpy.memmap
+        The writable rows of the store, which are initialised to zero.
+    """
+    header = dict(metadata, interactables=list(interactables), rows=rows)
+    encoded = json.dumps(header).encode('utf-8')
+    prefix = len(MAGIC) + struct.calcsize('<Q')
+    padding = -(prefix + len(encoded)) % ALIGNMENT
+    encoded += b' ' * padding
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(encoded)))
+        f.write(encoded)
+        f.truncate(prefix + len(encoded) + rows * len(interactables))
+    if not rows or not interactables:
+        return np.zeros((rows, len(interactables)), dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r+', offset=prefix + len(encoded),
+                     shape=(rows, len(interactables)))
+
+
+def _read_header(path):
+    """
+    Read the metadata header of a sample store file.
+
+    Returns
+    -------
+    header : dict
+        The metadata, including the 'interactables' and the number of 'rows'.
+    offset : int
+        The position of the first row in the file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a sample store.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a sample store.')
+        length, = struct.unpack('<Q', f.read(struct.calcsize('<Q')))
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, len(MAGIC) + struct.calcsize('<Q') + length
+
+
+class SampleBlock:
+    """A block of samples, whose columns are looked up by interactable name."""
+    def __init__(self, rows, columns):
+        self._rows = rows
+        self._columns = columns
+
+    def __len__(self):
+        return self._rows.shape[0]
+
+    def __getitem__(self, names):
+        """
+        Get the spawn counts of one or more interactables.
+
+        Parameters
+        ----------
+        names : str or list
+            The internal name of an interactable, or a list of them whose
+            counts are summed.
+
+        Returns
+        -------
+        array
+            The count of each sample of the block.
+
+        Raises
+        ------
+        KeyError
+            If an interactable is not in the store.
+        """
+        if isinstance(names, str):
+            names = [names]
+        counts = np.zeros(len(self), dtype=np.int64)
+        for name in names:
+            if name not in self._columns:
+                raise KeyError(f'Unknown interactable: {name}.')
+            counts += self._rows[:, self._columns[name]]
+        return counts
+
+
+class SampleStore:
+    """
+    Query populated scene samples stored on disk.
+
+    The samples are memory-mapped and evaluated in blocks, so the file is never
+    loaded in memory as a whole.
+
+    Examples
+    --------
+    >>> store = SampleStore('sundered_grove.samples')
+    >>> drones = ['iscBrokenDrone1', 'iscBrokenDrone2', 'iscBrokenTurret1']
+    >>> store.probability(lambda s: (s[drones] >= 3) & (s['iscScrapper'] == 0))
+    """
+    def __init__(self, path):
+        """
+        Open a sample store.
+
+        Parameters
+        ----------
+        path : str
+            The file path.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a sample store.
+        """
+        self.path = path
+        self.metadata, offset = _read_header(path)
+        self.interactables = self.metadata['interactables']
+        self._columns = {name: i for i, name in enumerate(self.interactables)}
+        shape = (self.metadata['rows'], len(self.interactables))
+        if all(shape):
+            self._rows = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=shape)
+        else:
+            self._rows = np.zeros(shape, dtype=np.uint8)
+
+    def __len__(self):
+        return self._rows.shape[0]
+
+    def __repr__(self):
+        return f'SampleStore({self.path!r}, {len(self)} samples)'
+
+    def blocks(self, block_size=QUERY_BLOCK_SIZE):
+        """
+        Iterate over the samples in blocks.
+
+        Parameters
+        ----------
+        block_size : int, optional
+            The number of samples in each block.
+
+        Yields
+        ------
+        SampleBlock
+        """
+        for i in range(0, len(self), block_size):
+            yield SampleBlock(np.asarray(self._rows[i:i+block_size]), self._columns)
+
+    def count(self, predicate):
+        """
+        Count the samples that satisfy a condition.
+
+        Parameters
+        ----------
+        predicate : callable
+            Given a `SampleBlock`, it returns a boolean array for its samples.
+
+        Returns
+        -------
+        int
+        """
+        return sum(int(np.count_nonzero(predicate(block))) for block in self.blocks())
+
+    def probability(self, predicate):
+        """
+        Estimate the probability of a condition.
+
+        Parameters
+        ----------
+        predicate : callable
+            Given a `SampleBlock`, it returns a boolean array for its samples.
+
+        Returns
+        -------
+        p : float
+            The fraction of the samples that satisfy the condition.
+        se : float
+            The standard error of the estimate.
+        """
+        n = max(len(self), 1)
+        p = self.count(predicate) / n
+        return p, float(np.sqrt(p * (1 - p) / n))
+
+    def mean(self, function):
+        """
+        Estimate the expected value of a quantity.
+
+        Parameters
+        ----------
+        function : callable
+            Given a `SampleBlock`, it returns a numeric array for its samples,
+            e.g., the total count of a few interactables.
+
+        Returns
+        -------
+        mean : float
+            The average over all samples.
+        se : float
+            The standard error of the estimate.
+        """
+        total = 0.
+        total_sq = 0.
+        for block in self.blocks():
+            values = np.asarray(function(block), dtype=np.float64)
+            total += values.sum()
+            total_sq += (values * values).sum()
+        n = max(len(self), 1)
+        mean = float(total / n)
+        return mean, float(np.sqrt(max(total_sq / n - mean**2, 0) / n))
+
+    def histogram(self, names):
+        """
+        Count the samples for each spawn count of one or more interactables.
+
+        Parameters
+        ----------
+        names : str or list
+            The internal name of an interactable, or a list of them whose
+            counts are summed.
+
+        Returns
+        -------
+        array
+            The number of samples with 0, 1, 2, etc. spawns.
+        """
+        histogram = np.zeros(1, dtype=np.int64)
+        for block in self.blocks():
+            counts = np.bincount(block[names])
+            if counts.size > histogram.size:
+                histogram = np.pad(histogram, (0, counts.size - histogram.size))
+            histogram[:counts.size] += counts
+        return histogram
@@ -1,7 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
 import numpy as np
 
 from constants import ALL_EXPANSIONS, NO_EXPANSIONS
-from run import Run
+from run import Run, RunBatch
 
 
 def _print_results(data, headers, fmt):
@@ -56,7 +59,127 @@ def _print_results(data, headers, fmt):
         print(row)
 
 
-def simulate_run(stages, void_fields=-1, num_players=1, iterations=40000, is_delusion_enabled=False):
+class _HorizonResult:
+    """
+    The accumulated stats of `simulate_run` for a number of stages.
+
+    Only integer sums and counts are kept, so the results of separate shards of
+    the iterations can be merged exactly.
+    """
+    NO_CARD = '-'
+    NO_DLC = 'NO DLC'
+
+    def __init__(self, stages, void_fields, num_tiers):
+        self.num_tiers = num_tiers
+        self.iterations = 0
+        self.tiers = {str(i): [np.zeros(num_tiers, dtype=np.int64), 0]
+                      for i in range(1, stages+1+(void_fields>0))}
+        self.delusion_extra = {i: np.zeros(6, dtype=np.int64) for i in self.tiers.keys()}
+        self.tiers[self.NO_CARD] = [np.zeros(num_tiers, dtype=np.int64), 0]
+        self.tiers[self.NO_DLC] = [np.zeros(num_tiers, dtype=np.int64), 0]
+        self.total = {key: np.zeros(2, dtype=np.int64) for key in RunBatch._TOTALS}
+
+    def update(self, r, horizon, is_dlc):
+        """Add the runs of a batch."""
+        i = 0 if is_dlc else 1
+        if is_dlc:
+            self.iterations += r.runs
+        for key, values in r.get_totals(horizon).items():
+            self.total[key][i] += values.sum()
+        if is_dlc:
+            card_stage, _ = r.get_card_data(horizon)
+            cards = [str(card + 1) if card >= 0 else self.NO_CARD for card in card_stage.tolist()]
+        else:
+            cards = [self.NO_DLC] * r.runs
+        offset = 0 if is_dlc else 3
+        delusion_bonus = r.get_stage_data('delusion', horizon).sum(axis=0)
+        for j in range(len(delusion_bonus)):
+            self.delusion_extra[str(j+1)][offset:offset+3] += delusion_bonus[j]
+        run_tiers = r.get_tiers(horizon)
+        cards = np.array(cards)
+        for card in np.unique(cards).tolist():
+            is_card = cards == card
+            self.tiers[card][0] += run_tiers[is_card].sum(axis=0)
+            self.tiers[card][1] += int(np.count_nonzero(is_card))
+
+    def merge(self, other):
+        """Add the stats of another shard of iterations."""
+        self.iterations += other.iterations
+        for key, (values, iters) in other.tiers.items():
+            self.tiers[key][0] += values
+            self.tiers[key][1] += iters
+        for key, values in other.delusion_extra.items():
+            self.delusion_extra[key] += values
+        for key, values in other.total.items():
+            self.total[key] += values
+
+    def print(self, is_delusion_enabled):
+        """Print the tables."""
+        tiers = {}
+        for key, (values, iters) in self.tiers.items():
+            values = values / iters if iters else np.zeros(self.num_tiers)
+            # Remove the 'Lunar Combined' tier
+            values = np.delete(values, 6)
+            # Not counting equipment for the total
+            total_value = values.sum() - (values[4] + values[6])
+            tiers[key] = [*values, total_value, iters]
+        iterations = max(self.iterations, 1)
+        total = [[key, *(values / iterations)] for key, values in self.total.items()]
+        tiers = [[key, *values] for key, values in tiers.items()]
+        delusion_extra = {key: values / iterations for key, values in self.delusion_extra.items()}
+        delusion_extra['TOTAL'] = np.array(tuple(delusion_extra.values())).sum(axis=0)
+        delusion_extra = [[key, *values] for key, values in delusion_extra.items()]
+
+        tier_names = (
+            'T1', 'T2', 'T3', 'BOSS', 'L EQ', 'L ITEM', 'EQ', 'V T1', 'V T2', 'V T3', 'V BOSS', 'TOTAL',
+        )
+        tier_fmt = [('^', (6, 2), float)] * len(tier_names)
+        # The Void Boss tier occurs so rarely that we need higher decimal precision
+        tier_fmt[-2] = ('^', (6, 4), float)
+        _print_results(tiers, ('CARD', *tier_names, 'ITERS'), [('<', 6, str), *tier_fmt, ('>', 6, int)])
+        print()
+        if is_delusion_enabled:
+            col_fmt = ('^', (9, 2), float)
+            _print_results(
+                delusion_extra,
+                ('STAGE', 'DLC T1', 'DLC T2', 'DLC T3', 'NO DLC T1', 'NO DLC T2', 'NO DLC T3'),
+                [('<', 7, str), col_fmt, col_fmt, col_fmt, col_fmt, col_fmt, col_fmt]
+            )
+            print()
+        col_fmt = ('^', (10, 2), float)
+        _print_results(total, ('ENCOUNTERED', 'DLC', 'NO DLC'), [('<', 20, str), col_fmt, col_fmt])
+
+
+def _simulate_shard(config, iterations, seed):
+    """
+    Simulate a shard of the iterations of `simulate_run`.
+
+    This is run by every worker process, so it has to be importable.
+
+    Returns
+    -------
+    dict
+        The `_HorizonResult` of each horizon.
+    """
+    horizons, void_fields, num_players, is_delusion_enabled, batch_size = config
+    num_tiers = len(Run.build_tier_droplists())
+    seeds = seed.spawn(2)
+    r_dlc = RunBatch(batch_size, num_players=num_players, expansions=ALL_EXPANSIONS,
+                     is_delusion_enabled=is_delusion_enabled, seed=seeds[0])
+    r_no_dlc = RunBatch(batch_size, num_players=num_players, expansions=NO_EXPANSIONS,
+                        is_delusion_enabled=is_delusion_enabled, seed=seeds[1])
+    results = {horizon: _HorizonResult(horizon, void_fields, num_tiers) for horizon in horizons}
+    for start in range(0, iterations, batch_size):
+        for r in (r_dlc, r_no_dlc):
+            r.runs = min(batch_size, iterations - start)
+            r.loot_stages(horizons, void_fields)
+            for horizon, result in results.items():
+                result.update(r, horizon, r == r_dlc)
+    return results
+
+
+def simulate_run(stages, void_fields=-1, num_players=1, iterations=40000, is_delusion_enabled=False,
+                 batch_size=10000, workers=1, seed=None):
     """
     Print a table with the number of items per tier that can be found in a run.
 
@@ -67,8 +190,10 @@ def simulate_run(stages, void_fields=-1, num_players=1, iterations=40000, is_del
 
     Parameters
     ----------
-    stages : int
-        The number of normal stages to loot.
+    stages : int or list
+        The number of normal stages to loot. If it's a list of horizons, the
+        runs are only simulated once up to the deepest one, and the tables are
+        printed for each of them.
     void_fields : int, optional
         After which normal stage to visit and completely loot the Void Fields.
         If it is not a positive integer, it will not be visited. This is the
@@ -85,67 +210,40 @@ def simulate_run(stages, void_fields=-1, num_players=1, iterations=40000, is_del
     is_delusion_enabled : bool, optional
         Whether the Artifact of Delusion is enabled. This can heavily affect the
         accumulated loot.
+    batch_size : int, optional
+        The number of runs simulated together by `RunBatch`. This only bounds
+        the memory use and doesn't affect the result.
+    workers : int, optional
+        The number of processes to split the iterations over. Each of them
+        simulates its share with an independent seed and only returns the
+        summed stats. On platforms that spawn new processes, e.g., Windows,
+        the calling script must be guarded by `if __name__ == '__main__'`.
+    seed : int, optional
+        The seed of the random number generators. By default fresh entropy is
+        used.
 
     Returns
     -------
     None
     """
-    NO_CARD = '-'
-    NO_DLC = 'NO DLC'
-    tiers = {str(i): [] for i in range(1, stages+1+(void_fields>0))}
-    delusion_extra = {i: [0] * 6 for i in tiers.keys()}
-    tiers[NO_CARD] = []
-    tiers[NO_DLC] = []
-    r_dlc = Run(num_players=num_players, expansions=ALL_EXPANSIONS,
-                is_delusion_enabled=is_delusion_enabled)
-    r_no_dlc = Run(num_players=num_players, expansions=NO_EXPANSIONS,
-                   is_delusion_enabled=is_delusion_enabled)
-    total = {key: [.0, .0] for key in r_dlc.stats.consolidate_data()['total']}
-    for _ in range(iterations):
-        for i, r in enumerate((r_dlc, r_no_dlc)):
-            r.loot_stages(stages, void_fields)
-            data = r.stats.consolidate_data()
-            for key, value in data['total'].items():
-                total[key][i] += value / iterations
-            if r == r_dlc:
-                card = data['card']['stage']
-                card = str(card + 1) if card >= 0 else NO_CARD
-            else:
-                card = NO_DLC
-            offset = 0 if r == r_dlc else 3
-            for j in range(len(data['delusion_bonus'])):
-                for k in range(3):
-                    delusion_extra[str(j+1)][offset+k] += data['delusion_bonus'][j][k] / iterations
-            tiers[card].append(data['tiers'])
-    num_tiers = len(Run.build_tier_droplists())
-    for key, values in tiers.items():
-        iters = len(values)
-        values = np.mean(values, axis=0) if values else np.zeros(num_tiers)
-        # Remove the 'Lunar Combined' tier
-        values = np.delete(values, 6)
-        # Not counting equipment for the total
-        total_value = values.sum() - (values[4] + values[6])
-        tiers[key] = [*values, total_value, iters]
-    total = [[key, *values] for key, values in total.items()]
-    tiers = [[key, *values] for key, values in tiers.items()]
-    delusion_extra['TOTAL'] = np.array(tuple(delusion_extra.values())).sum(axis=0)
-    delusion_extra = [[key, *values] for key, values in delusion_extra.items()]
-
-    tier_names = (
-        'T1', 'T2', 'T3', 'BOSS', 'L EQ', 'L ITEM', 'EQ', 'V T1', 'V T2', 'V T3', 'V BOSS', 'TOTAL',
-    )
-    tier_fmt = [('^', (6, 2), float)] * len(tier_names)
-    # The Void Boss tier occurs so rarely that we need higher decimal precision
-    tier_fmt[-2] = ('^', (6, 4), float)
-    _print_results(tiers, ('CARD', *tier_names, 'ITERS'), [('<', 6, str), *tier_fmt, ('>', 6, int)])
-    print()
-    if is_delusion_enabled:
-        col_fmt = ('^', (9, 2), float)
-        _print_results(
-            delusion_extra,
-            ('STAGE', 'DLC T1', 'DLC T2', 'DLC T3', 'NO DLC T1', 'NO DLC T2', 'NO DLC T3'),
-            [('<', 7, str), col_fmt, col_fmt, col_fmt, col_fmt, col_fmt, col_fmt]
-        )
-        print()
-    col_fmt = ('^', (10, 2), float)
-    _print_results(total, ('ENCOUNTERED', 'DLC', 'NO DLC'), [('<', 20, str), col_fmt, col_fmt])
+    is_multi_horizon = isinstance(stages, (list, tuple, range))
+    horizons = sorted(set(stages)) if is_multi_horizon else [stages]
+    config = (horizons, void_fields, num_players, is_delusion_enabled, batch_size)
+    seed = np.random.SeedSequence(seed)
+    if workers > 1:
+        shards = [len(shard) for shard in np.array_split(np.arange(iterations), workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(_simulate_shard, itertools.repeat(config), shards, seed.spawn(workers)))
+    else:
+        partials = [_simulate_shard(config, iterations, seed)]
+    results = partials[0]
+    for partial in partials[1:]:
+        for horizon, result in partial.items():
+            results[horizon].merge(result)
+    for horizon, result in results.items():
+        if is_multi_horizon:
+            print(f'STAGES: {horizon}')
+            print()
+        result.print(is_delusion_enabled)
+        if is_multi_horizon:
+            print()
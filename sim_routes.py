@@ -0,0 +1,292 @@
+import itertools
+
+import numpy as np
+
+import run
+from constants import SceneName, Expansion, ALL_EXPANSIONS
+from data_loader import scenes
+from directors import SceneDirector
+
+
+# The scenes that end the run, after which nothing is looted
+END_SCENES = (SceneName.MW, SceneName.CO, SceneName.VL, SceneName.PL)
+
+
+class _RouteModel:
+    """
+    The transitions between the stages of a `Run`.
+
+    A state is the current scene, the natural destination picked on the last
+    stage with a Teleporter, the number of stages cleared, the number of Blue
+    Portals opened, and whether the Void Fields have been visited. These are
+    everything the choice of the next scene depends on in `Run`.
+    """
+    def __init__(self, void_fields, stage_preferences, expansions, num_players,
+                 use_gold_portal, use_artifact_portal):
+        self.void_fields = void_fields
+        self.stage_preferences = stage_preferences
+        self.expansions = set(expansions)
+        self.num_players = num_players
+        self.use_gold_portal = use_gold_portal
+        self.use_artifact_portal = use_artifact_portal
+        self._gold_shrine_chances = {}
+        self._director = None
+
+    def can_pick_stage(self, scene_name):
+        """See `Run._can_pick_stage`."""
+        required_dlc = scenes[scene_name].required_dlc
+        return not required_dlc or required_dlc in self.expansions
+
+    def destinations(self, scene_name):
+        """The probability of each natural destination of a scene."""
+        destinations = [(d, w) for d, w in scenes[scene_name].destinations if w > 0 and self.can_pick_stage(d)]
+        total = sum(w for _, w in destinations)
+        return [(d, w / total) for d, w in destinations]
+
+    def start(self):
+        """The probability of each starting state."""
+        return [((scene, None, 0, 0, False), p) for scene, p in self.destinations(SceneName.SM)]
+
+    def newt_chance(self, scene_name):
+        """The chance that a Newt Altar spawns. See `Run._loot_stage`."""
+        newt = scenes[scene_name].newt
+        if not newt:
+            return 0.
+        if scene_name in (SceneName.AA, SceneName.RD, SceneName.SA):
+            return 1.
+        low, high = newt
+        return max(high - max(low, 1) + 1, 0) / (high - low + 1)
+
+    def gold_shrine_chance(self, scene_name, stages_cleared):
+        """
+        The chance that an Altar of Gold spawns, from the exact spawn
+        statistics of the `SceneDirector`.
+        """
+        key = (scene_name, stages_cleared)
+        if key not in self._gold_shrine_chances:
+            if self._director is None:
+                self._director = SceneDirector(scene_name, num_players=self.num_players,
+                                               expansions=self.expansions)
+            else:
+                self._director.change_scene(scene_name)
+            # The cave of Abyssal Depths is open for half of the runs
+            bonus_credits = (False, True) if scene_name == SceneName.AD else (False,)
+            chance = 0.
+            for is_bonus_credits_available in bonus_credits:
+                self._director.is_bonus_credits_available = is_bonus_credits_available
+                result = self._director.exact_statistics(stages_cleared, print_result=False)
+                chance += sum(once for name, _, _, once in result if 'Goldshores' in name)
+            self._gold_shrine_chances[key] = min(chance / len(bonus_credits), 1.)
+        return self._gold_shrine_chances[key]
+
+    def seer_chances(self, scene_name, stages_cleared, preferences):
+        """
+        The chance that each preferred scene is offered first by the Lunar Seer.
+
+        See `Run._setup_seer_stations`. Every ordered pair of the candidate
+        scenes and every replacement of each station is enumerated.
+        """
+        stage_order = scenes[scene_name].stage_order
+        candidates = [name for name, data in scenes.items()
+                      if stage_order == data.stage_order and self.can_pick_stage(name)]
+        replacements = [SceneName.GC]
+        if Expansion.SOTV in self.expansions and stages_cleared >= 4:
+            replacements.append(SceneName.VL)
+        replacement_chance = .05 * len(replacements)
+        chances = {}
+        picks = list(itertools.permutations(candidates, min(len(candidates), 2)))
+        for pick in picks:
+            outcomes = [[(target, 1 - replacement_chance)] +
+                        [(r, replacement_chance / len(replacements)) for r in replacements]
+                        for target in pick]
+            for stations in itertools.product(*outcomes):
+                p = np.prod([p for _, p in stations]) / len(picks)
+                names = [name for name, _ in stations]
+                for preference in preferences:
+                    if preference in names:
+                        chances[preference] = chances.get(preference, 0.) + p
+                        break
+        return chances
+
+    def transitions(self, state):
+        """
+        The probability of each next state.
+
+        See `Run._loot_stage`, `Run._choose_next_destination`, and
+        `Run._advance_stage`.
+        """
+        scene_name, pending, stages_cleared, blue_portals_opened, void_fields_visited = state
+        scene_data = scenes[scene_name]
+        if scene_name == SceneName.VF:
+            void_fields_visited = True
+        stage_order = scene_data.stage_order
+        preferences = self.stage_preferences.get(stage_order)
+        teleporter_exists = scene_data.scene_director.teleporter
+        # Each branch is (probability, natural destination, Blue Portal, Gold Portal)
+        branches = []
+        if teleporter_exists:
+            blue_chance = run.BLUE_PORTAL_CHANCE / (blue_portals_opened + 1)
+            if stages_cleared + 1 == self.void_fields:
+                blue_chance = 1.
+            elif stage_order in self.stage_preferences:
+                blue_chance += (1 - blue_chance) * self.newt_chance(scene_name)
+            gold_chance = self.gold_shrine_chance(scene_name, stages_cleared) if self.use_gold_portal else 0.
+            for destination, p in self.destinations(scene_name):
+                for blue, p_blue in ((True, blue_chance), (False, 1 - blue_chance)):
+                    for gold, p_gold in ((True, gold_chance), (False, 1 - gold_chance)):
+                        if p * p_blue * p_gold > 0:
+                            branches.append((p * p_blue * p_gold, destination, blue, gold))
+        else:
+            branches.append((1., pending, False, False))
+
+        next_stages_cleared = stages_cleared + (scene_data.scene_type == 1)
+        out = {}
+        for p, destination, blue, gold in branches:
+            opened = blue_portals_opened + blue
+            explicit = []
+            if blue and stages_cleared + 1 == self.void_fields and not void_fields_visited:
+                explicit.append((SceneName.VF, 1.))
+            elif self.use_artifact_portal and scene_name == SceneName.SM:
+                explicit.append((SceneName.BA, 1.))
+            elif self.use_gold_portal and gold:
+                explicit.append((SceneName.GC, 1.))
+            elif blue and preferences and destination:
+                explicit.extend(self.seer_chances(scene_name, stages_cleared, preferences).items())
+            natural = 1 - sum(q for _, q in explicit)
+            for next_scene, q in explicit:
+                key = (next_scene, destination, next_stages_cleared, opened, void_fields_visited)
+                out[key] = out.get(key, 0.) + p * q
+            if natural > 1e-15:
+                key = (destination, None, next_stages_cleared, opened, void_fields_visited)
+                out[key] = out.get(key, 0.) + p * natural
+        return out
+
+
+def compute_scene_visits(num_stages=5, void_fields=-1, stage_preferences=dict(), num_players=1,
+                         expansions=ALL_EXPANSIONS, use_gold_portal=None, use_artifact_portal=None):
+    """
+    Compute the exact probability of each scene being looted on each stage.
+
+    The reachable states of a `Run` are enumerated from the destinations of the
+    scenes and the portal policies, and their transition matrix propagates the
+    starting distribution stage by stage. The result follows the same rules as
+    `Run.loot_stages`.
+
+    Parameters
+    ----------
+    num_stages : int, optional
+        The number of normal stages to loot.
+    void_fields : int, optional
+        After what stage to visit the Void Fields. See `Run.loot_stages`.
+    stage_preferences : dict, optional
+        The preferred destinations for the Lunar Seer by "stage_order". See
+        `Run.loot_stages`.
+    num_players : int, optional
+        The number of players, which only affects the chance of an Altar of
+        Gold for the Gold Portal.
+    expansions : set, optional
+        The enabled expansions, which restrict the available scenes.
+    use_gold_portal, use_artifact_portal : bool, optional
+        Whether the respective portal is used when it spawns. By default the
+        settings of `run`, i.e., `USE_GOLD_PORTAL` and `USE_ARTIFACT_PORTAL`.
+
+    Returns
+    -------
+    out : dict
+        - 'scenes': The internal name of the scene of each column.
+        - 'visits': A 2D array with the probability of each scene being the
+            one looted on each stage, including Hidden Realms. A row sums to
+            the probability that the run loots that many stages.
+        - 'stages': A 2D array with the probability of each scene being looted
+            after each number of normal stages cleared, e.g., `[4]` for the
+            fifth stage. A Hidden Realm is counted with the stage after it.
+        - 'ended': The probability that the run ends early by going to a scene
+            such as the Void Locus, which `Run` doesn't support. This is only
+            possible if the scene is a preference for the Lunar Seer.
+
+    Notes
+    -----
+    The chance of an Altar of Gold comes from `SceneDirector.exact_statistics`
+    and is only computed if the Gold Portal is used.
+    """
+    if use_gold_portal is None:
+        use_gold_portal = run.USE_GOLD_PORTAL
+    if use_artifact_portal is None:
+        use_artifact_portal = run.USE_ARTIFACT_PORTAL
+    if void_fields == 0:
+        void_fields = -1
+    model = _RouteModel(void_fields, stage_preferences, expansions, num_players,
+                        use_gold_portal, use_artifact_portal)
+
+    # Enumerate the reachable states and build the sparse transition matrix
+    states = []
+    index = {}
+    rows, columns, weights = [], [], []
+    ended = []
+
+    def add_state(state):
+        if state not in index:
+            index[state] = len(states)
+            states.append(state)
+            ended.append(state[0] in END_SCENES)
+        return index[state]
+
+    start_states = [(add_state(state), p) for state, p in model.start()]
+    position = 0
+    while position < len(states):
+        state = states[position]
+        if state[2] < num_stages and not ended[position]:
+            for next_state, p in model.transitions(state).items():
+                rows.append(position)
+                columns.append(add_state(next_state))
+                weights.append(p)
+        position += 1
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    weights = np.array(weights, dtype=np.float64)
+    num_states = len(states)
+    start = np.zeros(num_states)
+    for i, p in start_states:
+        start[i] += p
+
+    names = sorted({state[0] for state in states if state[0] not in END_SCENES})
+    columns_of = {name: i for i, name in enumerate(names)}
+    state_scene = np.array([columns_of.get(state[0], -1) for state in states], dtype=np.int64)
+    state_stage = np.array([state[2] for state in states], dtype=np.int64)
+    is_active = (state_stage < num_stages) & ~np.array(ended, dtype=bool)
+
+    visits = []
+    stages = np.zeros((max(num_stages, 0), len(names)))
+    probabilities = start
+    ended_chance = 0.
+    while True:
+        active = probabilities * is_active
+        ended_chance += probabilities[np.array(ended, dtype=bool)].sum()
+        if active.sum() <= 1e-15:
+            break
+        visit = np.bincount(state_scene[is_active], weights=active[is_active], minlength=len(names))
+        visits.append(visit)
+        np.add.at(stages, (state_stage[is_active], state_scene[is_active]), active[is_active])
+        probabilities = np.bincount(columns, weights=active[rows] * weights, minlength=num_states)
+    return {
+        'scenes': names,
+        'visits': np.array(visits).reshape(-1, len(names)),
+        'stages': stages,
+        'ended': ended_chance,
+    }
+
+
+def print_scene_visits(num_stages=5, void_fields=-1, stage_preferences=dict(), num_players=1,
+                       expansions=ALL_EXPANSIONS):
+    """Print the chance of each scene on each stage. See `compute_scene_visits`."""
+    result = compute_scene_visits(num_stages, void_fields, stage_preferences, num_players, expansions)
+    names = result['scenes']
+    header = f'{"Scene":20s}' + ''.join(f'{f"Stage {i+1}":>9s}' for i in range(result['stages'].shape[0]))
+    print(header)
+    print('-' * len(header))
+    for column, name in enumerate(names):
+        chances = result['stages'][:, column]
+        if chances.any():
+            print(f'{name:20s}' + ''.join(f'{100*p:8.2f}%' for p in chances))
+    if result['ended']:
+        print(f'Ended early: {100*result["ended"]:.2f}%')
@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
+import numpy as np
+
+from constants import SceneName, Expansion, ALL_EXPANSIONS, NO_EXPANSIONS
+from data_loader import scenes
+from directors import SceneDirector
+
+
+ALL_SCENES = tuple(value for key, value in vars(SceneName).items() if not key.startswith('_'))
+EXPANSION_SETS = (NO_EXPANSIONS, {Expansion.SOTV}, {Expansion.SOTS}, ALL_EXPANSIONS)
+
+
+def _expansions_key(expansions):
+    """A stable name for a set of expansions, e.g., 'DLC1+DLC2'."""
+    return '+'.join(sorted(expansions))
+
+
+def _configuration_signature(director, stages_cleared):
+    """
+    Describe everything the spawn statistics of a configuration depend on.
+
+    Two configurations with the same signature have the same interactable
+    credits, blend outcomes, compiled decks, and output layout, so their
+    statistics are identical.
+    """
+    outcomes, probabilities = director._get_blend_outcomes(stages_cleared)
+    signature = [director._get_interactable_credit()]
+    for (interactables, deck, _), probability in zip(outcomes, probabilities):
+        layout = tuple((category.name, card._name) for category in interactables.categories
+                       for card in category.cards)
+        cards = tuple(zip(deck.indices.tolist(), deck.weights.tolist(), deck.costs.tolist(),
+                          deck.limits.tolist(), deck.skips.tolist()))
+        signature.append((round(probability, 12), layout, cards))
+    return tuple(signature)
+
+
+def _column_names(result):
+    """Name each interactable, numbering any repeats of the same card."""
+    names = []
+    seen = {}
+    for name, *_ in result:
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f'{name}#{seen[name]}')
+    return names
+
+
+def _run_configuration(config, iterations, exact, seed):
+    """
+    Compute the statistics of a single configuration.
+
+    This is run by every worker process, so it has to be importable.
+    """
+    scene_name, stages_cleared, num_players, expansions, is_sacrifice_enabled, is_command_enabled = config
+    director = SceneDirector(
+        scene_name,
+        num_players=num_players,
+        is_command_enabled=is_command_enabled,
+        is_sacrifice_enabled=is_sacrifice_enabled,
+        expansions=set(expansions),
+    )
+    if exact:
+        return director.exact_statistics(stages_cleared, print_result=False)
+    return director.collect_statistics(stages_cleared, iterations, print_result=False, seed=seed)
+
+
+def sweep_statistics(path=None,
+                     scene_names=ALL_SCENES,
+                     stages_cleared=range(11),
+                     num_players=range(1, 5),
+                     expansions=EXPANSION_SETS,
+                     is_sacrifice_enabled=(False, True),
+                     is_command_enabled=(False, True),
+                     iterations=10000,
+                     exact=False,
+                     workers=1,
+                     seed=None):
+    """
+    Gather interactable spawn statistics for a whole grid of configurations.
+
+    Every combination of the grid values is a configuration. Configurations
+    that result in the same credits and decks are only computed once, and the
+    unique ones are run in parallel.
+
+    Parameters
+    ----------
+    path : str, optional
+        Where to save the result as a NumPy `.npz` file. By default nothing is
+        saved.
+    scene_names : iterable, optional
+        The internal names of the scenes. By default all scenes in `SceneName`.
+        Scenes without interactables are skipped.
+    stages_cleared : iterable, optional
+        The numbers of stages cleared. By default 0-10.
+    num_players : iterable, optional
+        The numbers of players. By default 1-4.
+    expansions : iterable, optional
+        The sets of enabled expansions. By default vanilla, each expansion on
+        its own, and all of them. Configurations with a scene that requires a
+        disabled expansion are skipped.
+    is_sacrifice_enabled, is_command_enabled : iterable, optional
+        Whether the respective artifacts are enabled. By default both options.
+    iterations : int, optional
+        The number of iterations for each unique configuration.
+    exact : bool, optional
+        Whether to compute the exact statistics instead of sampling them.
+    workers : int, optional
+        The number of processes to split the unique configurations over. On
+        platforms that spawn new processes, e.g., Windows, the calling script
+        must be guarded by `if __name__ == '__main__'`.
+    seed : int, optional
+        The master seed, from which each unique configuration derives its own
+        seed. By default fresh entropy is used.
+
+    Returns
+    -------
+    out : dict
+        Columnar arrays with a row for each configuration:
+        - 'scene', 'stages_cleared', 'num_players', 'expansions',
+            'is_sacrifice_enabled', 'is_command_enabled': The configuration.
+        - 'group': The index of the unique configuration it is equivalent to.
+        - 'mean', 'std', 'once': 2D arrays of the spawn statistics with a
+            column for each interactable. Interactables that aren't part of a
+            configuration have NaN values.
+        and
+        - 'interactables': The internal name of the interactable for each
+            column. Repeats of a card in the same configuration are suffixed
+            with their occurrence, e.g., 'iscChest1#2'.
+    """
+    configs = []
+    group_of = []
+    signatures = {}
+    for scene_name in scene_names:
+        stage_info = scenes[scene_name].stage_info
+        if not stage_info or not stage_info.interactables:
+            continue
+        required_dlc = scenes[scene_name].required_dlc
+        for expansion_set, sacrifice, command in itertools.product(
+            expansions, is_sacrifice_enabled, is_command_enabled
+        ):
+            if required_dlc and required_dlc not in expansion_set:
+                continue
+            # One director per deck configuration shares the compiled blend
+            # outcomes across all the player counts.
+            director = SceneDirector(
+                scene_name,
+                is_command_enabled=command,
+                is_sacrifice_enabled=sacrifice,
+                expansions=set(expansion_set),
+            )
+            for stages, players in itertools.product(stages_cleared, num_players):
+                director.num_players = players
+                config = (scene_name, stages, players, tuple(sorted(expansion_set)), sacrifice, command)
+                signature = _configuration_signature(director, stages)
+                if signature not in signatures:
+                    signatures[signature] = config
+                configs.append(config)
+                group_of.append(signature)
+    unique = list(signatures.values())
+    index_of = {signature: i for i, signature in enumerate(signatures)}
+    groups = np.array([index_of[signature] for signature in group_of], dtype=np.int64)
+
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(unique))]
+    args = (itertools.repeat(iterations), itertools.repeat(exact))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_configuration, unique, *args, seeds, chunksize=4))
+    else:
+        results = list(map(_run_configuration, unique, *args, seeds))
+
+    columns = {}
+    result_columns = []
+    for result in results:
+        names = _column_names(result)
+        for name in names:
+            columns.setdefault(name, len(columns))
+        result_columns.append([columns[name] for name in names])
+    unique_stats = np.full((3, len(unique), len(columns)), np.nan)
+    for i, (result, result_column) in enumerate(zip(results, result_columns)):
+        if result:
+            unique_stats[:, i, result_column] = np.array([r[1:] for r in result]).T
+    scene_column, stages_column, players_column, expansions_column, sacrifice_column, command_column = (
+        zip(*configs) if configs else ([],) * 6
+    )
+    out = {
+        'scene': np.array(scene_column, dtype=str),
+        'stages_cleared': np.array(stages_column, dtype=np.int64),
+        'num_players': np.array(players_column, dtype=np.int64),
+        'expansions': np.array([_expansions_key(e) for e in expansions_column], dtype=str),
+        'is_sacrifice_enabled': np.array(sacrifice_column, dtype=bool),
+        'is_command_enabled': np.array(command_column, dtype=bool),
+        'group': groups,
+        'interactables': np.array(list(columns), dtype=str),
+        'mean': unique_stats[0][groups],
+        'std': unique_stats[1][groups],
+        'once': unique_stats[2][groups],
+    }
+    if path:
+        np.savez_compressed(path, **out)
+    return out